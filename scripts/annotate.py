@@ -6,60 +6,61 @@ Sends garden space photos to Gemini nano-banana-pro-preview and asks it
 to return annotated versions with labels for dimensions, features, sun
 direction, boundaries, etc.
 
+Annotation is incremental: generated/annotated/manifest.json maps each
+source photo's content hash to the outputs it produced, so only new or
+changed photos are sent. Pending photos are annotated concurrently, or with
+--batch submitted together as a Gemini Batch API job (see batch.py).
+--enqueue adds a job per pending photo to the job queue for worker.py.
+
 Usage:
     python scripts/annotate.py
+    python scripts/annotate.py --workers 8
+    python scripts/annotate.py --force
+    python scripts/annotate.py --batch
+    python scripts/annotate.py --enqueue
     python scripts/annotate.py --photo ref/space/garden_north.jpg
 """
 
+from __future__ import annotations
+
 import argparse
-import io
+import json
 import re
+import threading
 import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from pathlib import Path
+from typing import TYPE_CHECKING
 from datetime import datetime
 
-from google import genai
-from google.genai import types
-from PIL import Image
+if TYPE_CHECKING:
+    from google import genai
+    from google.genai import types
+
+from core import genai_types, get_client, load_env
+from apicall import generate_content
+from batch import BatchError, run_batch
+from fileio import atomic_write_bytes, file_hash
+from images import save_model_image
+import jobqueue
+import tracing
+from payload import encode_request, inline_part
 
 # Project paths
 PROJECT_ROOT = Path(__file__).parent.parent
 
-try:
-    from dotenv import load_dotenv
-    load_dotenv(PROJECT_ROOT / ".env", override=True)
-except ImportError:
-    pass
-
-import os
-
-API_KEY = os.getenv("GEMINI_API_KEY")
-if not API_KEY:
-    raise ValueError(
-        "GEMINI_API_KEY not set. Copy .env.example to .env and add your key."
-    )
+load_env()
 
 MODEL = "nano-banana-pro-preview"
 SPACE_DIR = PROJECT_ROOT / "ref" / "space"
 OUTPUT_DIR = PROJECT_ROOT / "generated" / "annotated"
 ANNOTATED_DIR = OUTPUT_DIR  # alias used by pipeline.py
+MANIFEST_PATH = OUTPUT_DIR / "manifest.json"
 
+PHOTO_GLOBS = ["*.jpg", "*.jpeg", "*.png", "*.heif", "*.heic"]
+DEFAULT_WORKERS = 4
 
-def load_image(path: Path) -> Image.Image:
-    img = Image.open(str(path))
-    if img.mode in ("RGBA", "P"):
-        img = img.convert("RGB")
-    return img
-
-
-def image_to_bytes(img: Image.Image, max_size: int = 1500) -> bytes:
-    if max(img.size) > max_size:
-        ratio = max_size / max(img.size)
-        new_size = (int(img.width * ratio), int(img.height * ratio))
-        img = img.resize(new_size, Image.Resampling.LANCZOS)
-    buf = io.BytesIO()
-    img.save(buf, format="JPEG", quality=90)
-    return buf.getvalue()
+_manifest_lock = threading.Lock()
 
 
 def load_prompt(name: str) -> str:
@@ -69,82 +70,268 @@ def load_prompt(name: str) -> str:
     return ""
 
 
-def annotate_photo(client: genai.Client, photo_path: Path) -> Path | None:
-    """Send a space photo to Gemini for annotation."""
-    print(f"\n[*] Annotating: {photo_path.name}")
-
-    img = load_image(photo_path)
+def annotation_request(photo_path: Path) -> tuple[list, types.GenerateContentConfig] | None:
+    """(contents, config) asking Gemini to annotate a space photo."""
     prompt = load_prompt("annotate_prompt")
     if not prompt:
         print("[ERROR] No annotate_prompt.md found in generated/prompts/")
         return None
 
     contents = [
-        types.Part.from_bytes(
-            data=image_to_bytes(img),
-            mime_type="image/jpeg",
-        ),
+        inline_part(encode_request([(photo_path, "annotate")])[0]),
         prompt,
     ]
+    config = genai_types().GenerateContentConfig(
+        response_modalities=["TEXT", "IMAGE"],
+        temperature=0.4,
+    )
+    return contents, config
 
+
+def save_annotation(photo_path: Path, response) -> Path | None:
+    """Write the annotated image (or text notes) from a Gemini response.
+
+    Returns the file written, or None if the response held nothing usable.
+    """
+    # Safe access to response
     try:
-        response = client.models.generate_content(
-            model=MODEL,
-            contents=contents,
-            config=types.GenerateContentConfig(
-                response_modalities=["TEXT", "IMAGE"],
-                temperature=0.4,
-            ),
+        parts = response.candidates[0].content.parts
+    except (IndexError, AttributeError):
+        text = getattr(response, 'text', '') or str(response)
+        print(f"[WARN] No valid response from Gemini. Response: {text[:300]}")
+        return None
+
+    OUTPUT_DIR.mkdir(parents=True, exist_ok=True)
+    stem = photo_path.stem
+    text_parts = []
+
+    for part in parts:
+        if part.inline_data and part.inline_data.mime_type.startswith("image/"):
+            output_path = OUTPUT_DIR / f"{stem}_annotated.jpg"
+            save_model_image(part.inline_data.data, part.inline_data.mime_type, output_path)
+            print(f"[OK] Saved annotated image: {output_path.name}")
+            return output_path
+        elif part.text:
+            text_parts.append(part.text)
+
+    # If no image returned, save text response as notes
+    if text_parts:
+        notes_path = OUTPUT_DIR / f"{stem}_notes.md"
+        notes_path.write_text(
+            f"# Annotation Notes: {photo_path.name}\n\n"
+            f"Generated: {datetime.now().isoformat()}\n\n"
+            + "\n".join(text_parts),
+            encoding="utf-8",
         )
+        print(f"[INFO] No image returned, saved text notes: {notes_path.name}")
+        return notes_path
 
-        # Safe access to response
-        try:
-            parts = response.candidates[0].content.parts
-        except (IndexError, AttributeError):
-            text = getattr(response, 'text', '') or str(response)
-            print(f"[WARN] No valid response from Gemini. Response: {text[:300]}")
-            return None
-
-        OUTPUT_DIR.mkdir(parents=True, exist_ok=True)
-        stem = photo_path.stem
-        text_parts = []
-
-        for part in parts:
-            if part.inline_data and part.inline_data.mime_type.startswith("image/"):
-                output_path = OUTPUT_DIR / f"{stem}_annotated.jpg"
-                out_img = Image.open(io.BytesIO(part.inline_data.data))
-                if out_img.mode in ("RGBA", "P"):
-                    out_img = out_img.convert("RGB")
-                out_img.save(str(output_path), "JPEG", quality=95)
-                print(f"[OK] Saved annotated image: {output_path.name}")
-                return output_path
-            elif part.text:
-                text_parts.append(part.text)
-
-        # If no image returned, save text response as notes
-        if text_parts:
-            notes_path = OUTPUT_DIR / f"{stem}_notes.md"
-            notes_path.write_text(
-                f"# Annotation Notes: {photo_path.name}\n\n"
-                f"Generated: {datetime.now().isoformat()}\n\n"
-                + "\n".join(text_parts),
-                encoding="utf-8",
-            )
-            print(f"[INFO] No image returned, saved text notes: {notes_path.name}")
+    return None
 
+
+@tracing.traced("annotate", "photo_path")
+def annotate_photo(client: genai.Client, photo_path: Path) -> Path | None:
+    """Send a space photo to Gemini for annotation. Returns the file written, None on failure."""
+    print(f"\n[*] Annotating: {photo_path.name}")
+
+    request = annotation_request(photo_path)
+    if request is None:
         return None
+    contents, config = request
 
+    try:
+        response = generate_content(client, model=MODEL, contents=contents, config=config)
+        return save_annotation(photo_path, response)
     except Exception as e:
         print(f"[ERROR] Annotation failed: {e}")
         return None
 
 
+def find_space_photos() -> list[Path]:
+    """All photos in ref/space/, sorted."""
+    if not SPACE_DIR.exists():
+        return []
+    photos = []
+    for glob in PHOTO_GLOBS:
+        photos.extend(SPACE_DIR.glob(glob))
+    return sorted(photos)
+
+
+def annotation_outputs(photo_path: Path) -> list[Path]:
+    """Annotation files that currently exist for a source photo."""
+    stem = photo_path.stem
+    candidates = [OUTPUT_DIR / f"{stem}_annotated.jpg", OUTPUT_DIR / f"{stem}_notes.md"]
+    return [p for p in candidates if p.exists()]
+
+
+def load_manifest() -> dict:
+    if not MANIFEST_PATH.exists():
+        return {"photos": {}}
+    try:
+        return json.loads(MANIFEST_PATH.read_text(encoding="utf-8"))
+    except (json.JSONDecodeError, OSError):
+        print(f"[WARN] Unreadable {MANIFEST_PATH.name}, rebuilding")
+        return {"photos": {}}
+
+
+def save_manifest(manifest: dict) -> None:
+    data = json.dumps(manifest, indent=2, sort_keys=True)
+    atomic_write_bytes(MANIFEST_PATH, data.encode("utf-8"))
+
+
+def record_annotation(manifest: dict, photo_path: Path, digest: str) -> bool:
+    """Record a photo's current outputs in the manifest. False if it produced none."""
+    outputs = annotation_outputs(photo_path)
+    if not outputs:
+        return False
+    with _manifest_lock:
+        manifest["photos"][photo_path.name] = {
+            "hash": digest,
+            "outputs": [p.name for p in outputs],
+            "annotated": datetime.now().isoformat(),
+        }
+        save_manifest(manifest)
+    return True
+
+
+def pending_photos(photos: list[Path], manifest: dict) -> list[Path]:
+    """Photos that are new, changed since annotation, or missing their outputs.
+
+    Photos annotated before the manifest existed (outputs on disk, no entry)
+    are adopted as-is rather than re-sent.
+    """
+    pending = []
+    adopted = False
+    for photo in photos:
+        entry = manifest["photos"].get(photo.name)
+        digest = file_hash(photo)
+        if entry is None:
+            outputs = annotation_outputs(photo)
+            if outputs:
+                manifest["photos"][photo.name] = {
+                    "hash": digest,
+                    "outputs": [p.name for p in outputs],
+                    "annotated": None,
+                }
+                adopted = True
+                continue
+            pending.append(photo)
+        elif entry["hash"] != digest:
+            pending.append(photo)
+        elif not all((OUTPUT_DIR / name).exists() for name in entry["outputs"]):
+            pending.append(photo)
+    if adopted:
+        with _manifest_lock:
+            save_manifest(manifest)
+    return pending
+
+
+def annotate_all(
+    client: genai.Client,
+    photos: list[Path],
+    workers: int = DEFAULT_WORKERS,
+    force: bool = False,
+    batch: bool = False,
+) -> list[Path]:
+    """Annotate new or changed photos concurrently (or as one batch job).
+
+    Returns photos annotated this run.
+    """
+    manifest = load_manifest()
+    todo = list(photos) if force else pending_photos(photos, manifest)
+    skipped = len(photos) - len(todo)
+    if skipped:
+        print(f"[OK] {skipped} photos already annotated and unchanged")
+    if not todo:
+        return []
+
+    def clear_stale(photo: Path) -> str:
+        digest = file_hash(photo)
+        # A changed photo must not keep outputs from its previous version
+        entry = manifest["photos"].get(photo.name)
+        if entry and entry["hash"] != digest:
+            for name in entry["outputs"]:
+                (OUTPUT_DIR / name).unlink(missing_ok=True)
+        return digest
+
+    if batch:
+        return annotate_batch(client, todo, manifest, clear_stale)
+
+    print(f"[*] Annotating {len(todo)} photos with {min(workers, len(todo))} workers")
+
+    def work(photo: Path) -> tuple[Path, str, Path | None]:
+        digest = clear_stale(photo)
+        return photo, digest, annotate_photo(client, photo)
+
+    done = []
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        futures = [pool.submit(work, photo) for photo in todo]
+        for future in as_completed(futures):
+            photo, digest, output = future.result()
+            # A failed re-annotation (--force) must not record the old outputs as this run's
+            if output and record_annotation(manifest, photo, digest):
+                done.append(photo)
+    return done
+
+
+def annotate_batch(client: genai.Client, photos: list[Path], manifest: dict, clear_stale) -> list[Path]:
+    """Annotate photos through the Batch API and record the results."""
+    requests = []
+    for photo in photos:
+        request = annotation_request(photo)
+        if request is None:
+            return []
+        requests.append((photo.name, *request))
+
+    print(f"[*] Annotating {len(photos)} photos as a batch job")
+    responses = run_batch(client, MODEL, requests, label="annotate")
+
+    done = []
+    for photo in photos:
+        response = responses[photo.name]
+        if isinstance(response, BatchError):
+            print(f"[ERROR] Annotation failed for {photo.name}: {response}")
+            continue
+        digest = clear_stale(photo)
+        if save_annotation(photo, response) and record_annotation(manifest, photo, digest):
+            done.append(photo)
+    return done
+
+
+def enqueue_photos(photos: list[Path], force: bool = False) -> int:
+    """Queue an annotate job per new or changed photo for worker.py. Returns jobs added."""
+    todo = list(photos) if force else pending_photos(photos, load_manifest())
+    active = jobqueue.active_keys()
+    added = 0
+    for photo in todo:
+        key = f"annotate:{photo.name}:{file_hash(photo)[:16]}"
+        added += jobqueue.enqueue("annotate", {"photo": jobqueue.relative(photo)}, key=key, active=active) is not None
+    return added
+
+
 def main():
     parser = argparse.ArgumentParser(description="Annotate garden space photos")
     parser.add_argument("--photo", type=str, help="Specific photo to annotate")
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=DEFAULT_WORKERS,
+        help=f"Photos annotated concurrently (default: {DEFAULT_WORKERS})",
+    )
+    parser.add_argument("--force", action="store_true", help="Re-annotate every photo, ignoring the manifest")
+    parser.add_argument("--batch", action="store_true", help="Submit all pending photos as one Batch API job (slower, cheaper)")
+    parser.add_argument("--enqueue", action="store_true", help="Queue annotate jobs for worker.py instead of running them now")
+    tracing.add_arguments(parser)
     args = parser.parse_args()
+    tracing.apply(args)
+
+    if args.enqueue:
+        photos = [Path(args.photo) if Path(args.photo).is_absolute() else PROJECT_ROOT / args.photo] if args.photo else find_space_photos()
+        added = enqueue_photos([p for p in photos if p.exists()], force=args.force or bool(args.photo))
+        print(f"[OK] Queued {added} annotate jobs - run: python scripts/worker.py")
+        return
 
-    client = genai.Client(api_key=API_KEY)
+    client = get_client()
 
     if args.photo:
         photo_path = Path(args.photo)
@@ -153,36 +340,27 @@ def main():
         if not photo_path.exists():
             print(f"[ERROR] Photo not found: {photo_path}")
             return
-        annotate_photo(client, photo_path)
+        if annotate_photo(client, photo_path):
+            record_annotation(load_manifest(), photo_path, file_hash(photo_path))
     else:
-        # Annotate all space photos
+        # Annotate all new or changed space photos
         if not SPACE_DIR.exists():
             print(f"[ERROR] No space photos directory: {SPACE_DIR}")
             print("Add garden photos to ref/space/ first.")
             return
 
-        photos = (
-            list(SPACE_DIR.glob("*.jpg"))
-            + list(SPACE_DIR.glob("*.jpeg"))
-            + list(SPACE_DIR.glob("*.png"))
-            + list(SPACE_DIR.glob("*.heif"))
-            + list(SPACE_DIR.glob("*.heic"))
-        )
+        photos = find_space_photos()
 
         if not photos:
             print("[ERROR] No photos found in ref/space/")
             print("Add garden photos (.jpg, .png, .heif) to ref/space/ first.")
             return
 
-        print(f"[*] Found {len(photos)} space photos to annotate")
-        results = []
-        for photo in sorted(photos):
-            result = annotate_photo(client, photo)
-            if result:
-                results.append(result)
+        print(f"[*] Found {len(photos)} space photos")
+        results = annotate_all(client, photos, workers=args.workers, force=args.force, batch=args.batch)
 
         print(f"\n{'='*50}")
-        print(f"Annotated {len(results)}/{len(photos)} photos")
+        print(f"Annotated {len(results)} new or changed photos ({len(photos)} total)")
         print(f"Output: {OUTPUT_DIR}")
 
 
@@ -0,0 +1,145 @@
+"""
+EVELIEN GARDEN - GEMINI CALL WRAPPER
+======================================
+
+Every model call goes through generate_content() (or call_with_retries()
+for other endpoints, such as batch jobs) here, which adds:
+- a client-side token bucket (GEMINI_RPM requests/minute, shared by all
+  threads in the process)
+- retries of transient failures (429, 5xx, timeouts, dropped connections)
+  with exponential backoff and full jitter, honouring Retry-After / RetryInfo
+- immediate failure on permanent errors (bad request, auth, not found)
+
+Transient failures are retried here, at the call level, so they never use
+up a pipeline --max-retries attempt.
+
+Environment:
+    GEMINI_RPM             requests per minute (default 60, 0 disables)
+    GEMINI_CALL_RETRIES    max attempts per call (default 6)
+"""
+
+import os
+import random
+import re
+import threading
+import time
+
+from core import genai_errors
+import tracing
+
+BACKOFF_BASE = 2.0  # seconds
+BACKOFF_CAP = 60.0
+
+TRANSIENT_CODES = {408, 429, 500, 502, 503, 504}
+
+
+class TokenBucket:
+    """Thread-safe token bucket: `rate` tokens per minute, up to `burst` saved."""
+
+    def __init__(self, rate: float, burst: float | None = None):
+        self.rate = rate / 60.0  # tokens per second
+        self.capacity = burst if burst is not None else max(1.0, rate / 10)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self) -> float:
+        """Block until a token is available. Returns seconds waited."""
+        if self.rate <= 0:
+            return 0.0
+        waited = 0.0
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return waited
+                delay = (1 - self.tokens) / self.rate
+            time.sleep(delay)
+            waited += delay
+
+
+_limiter: TokenBucket | None = None
+_limiter_lock = threading.Lock()
+
+
+def get_limiter() -> TokenBucket:
+    """Process-wide limiter, built on first use so .env settings are loaded."""
+    global _limiter
+    with _limiter_lock:
+        if _limiter is None:
+            _limiter = TokenBucket(float(os.getenv("GEMINI_RPM", "60")))
+        return _limiter
+
+
+def is_transient(exc: Exception) -> bool:
+    """True for errors worth retrying: rate limits, overload, network trouble."""
+    if isinstance(exc, genai_errors().APIError):
+        return exc.code in TRANSIENT_CODES
+    if isinstance(exc, (ConnectionError, TimeoutError)):
+        return True
+    # Connect/read timeouts and resets from the SDK's HTTP transport
+    try:
+        import httpx  # transport used by google-genai
+    except ImportError:
+        return False
+    return isinstance(exc, httpx.TransportError)
+
+
+def retry_after(exc: Exception) -> float | None:
+    """Server-requested delay in seconds, from Retry-After or a RetryInfo detail."""
+    response = getattr(exc, "response", None)
+    headers = getattr(response, "headers", None)
+    if headers:
+        value = headers.get("retry-after")
+        if value:
+            try:
+                return max(0.0, float(value))
+            except ValueError:
+                pass
+    match = re.search(r"retryDelay['\"]?\s*[:=]\s*['\"]?(\d+(?:\.\d+)?)s", str(getattr(exc, "details", "")))
+    if match:
+        return float(match.group(1))
+    return None
+
+
+def backoff_delay(attempt: int) -> float:
+    """Full-jitter exponential backoff for the given 1-based attempt."""
+    return random.uniform(0, min(BACKOFF_CAP, BACKOFF_BASE * 2 ** (attempt - 1)))
+
+
+def call_with_retries(fn, max_attempts: int | None = None, **kwargs):
+    """fn(**kwargs) with rate limiting and transient retries.
+
+    Permanent errors, and transient ones that outlast max_attempts, are raised.
+    """
+    if max_attempts is None:
+        max_attempts = int(os.getenv("GEMINI_CALL_RETRIES", "6"))
+    limiter = get_limiter()
+    for attempt in range(1, max_attempts + 1):
+        waited = limiter.acquire()
+        if waited:
+            tracing.add(throttled_ms=round(waited * 1000))
+        try:
+            return fn(**kwargs)
+        except Exception as e:
+            if not is_transient(e) or attempt == max_attempts:
+                raise
+            delay = retry_after(e)
+            if delay is None:
+                delay = backoff_delay(attempt)
+            tracing.add(retries=1)
+            print(f"    [RETRY] Transient error ({e.__class__.__name__}: {str(e)[:120]}), "
+                  f"retrying in {delay:.1f}s ({attempt}/{max_attempts - 1})")
+            time.sleep(delay)
+
+
+def generate_content(client, max_attempts: int | None = None, **kwargs):
+    """client.models.generate_content with rate limiting and transient retries."""
+    with tracing.span("model.call", model=kwargs.get("model")) as span:
+        span.set(bytes_sent=tracing.request_bytes(kwargs.get("contents") or []))
+        response = call_with_retries(client.models.generate_content, max_attempts, **kwargs)
+        span.set(**tracing.response_attrs(response))
+    return response
@@ -0,0 +1,42 @@
+"""
+EVELIEN GARDEN - MODEL BACKEND
+================================
+
+Chooses the client the scripts talk to. The scripts only use
+client.models.generate_content() (plus client.batches for --batch and
+client.files for --upload-refs), so anything with that shape works.
+
+    GARDEN_BACKEND=gemini   real Gemini API (default, needs GEMINI_API_KEY)
+    GARDEN_BACKEND=fake     local stand-in, see fake_backend.py
+
+The API key is checked here, when a client is created, not at import time -
+so --dry-run and tooling work without a key. Scripts get the client through
+core.get_client(), which builds it once per process.
+"""
+
+import os
+
+from core import load_env
+
+BACKENDS = ["gemini", "fake"]
+
+
+def create_client():
+    """Build the client for GARDEN_BACKEND."""
+    load_env()
+
+    backend = os.getenv("GARDEN_BACKEND", "gemini").lower()
+    if backend == "fake":
+        from fake_backend import FakeClient
+        return FakeClient.from_env()
+    if backend != "gemini":
+        raise ValueError(f"Unknown GARDEN_BACKEND '{backend}'. Choose from: {', '.join(BACKENDS)}")
+
+    api_key = os.getenv("GEMINI_API_KEY")
+    if not api_key:
+        raise ValueError(
+            "GEMINI_API_KEY not set. Copy .env.example to .env and add your key."
+        )
+
+    from google import genai
+    return genai.Client(api_key=api_key)
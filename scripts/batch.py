@@ -0,0 +1,214 @@
+"""
+EVELIEN GARDEN - GEMINI BATCH JOBS
+====================================
+
+Submits many generate_content requests as Gemini Batch API jobs instead of
+one interactive call each - for overnight re-verification or re-annotating
+a full photo shoot, where latency does not matter but per-request overhead
+and rate limits do.
+
+Requests are sent inline, split into jobs of at most BATCH_MAX_MB of
+payload. Submitted jobs are recorded in generated/feedback/batch_jobs.json
+until their results are collected, so an interrupted run picks up the same
+jobs on the next start instead of paying for them twice. Recorded jobs are
+matched by request key, not by the exact set of requests: if what is
+pending changed in between, a recorded job still answers the keys it has,
+and a finished one that answers none of them is dropped from the record.
+
+Used by annotate.py --batch and verify.py --all --batch. Works against the
+local stand-in too (GARDEN_BACKEND=fake).
+
+Environment:
+    GARDEN_BATCH_POLL      seconds between job status checks (default 30)
+    GARDEN_BATCH_MAX_MB    inline payload per job in MB (default 18)
+"""
+
+import hashlib
+import json
+import os
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+
+from apicall import call_with_retries
+from core import genai_errors
+from fileio import atomic_write_bytes
+import tracing
+
+PROJECT_ROOT = Path(__file__).parent.parent
+JOBS_PATH = PROJECT_ROOT / "generated" / "feedback" / "batch_jobs.json"
+
+DONE_STATES = {"JOB_STATE_SUCCEEDED", "JOB_STATE_PARTIALLY_SUCCEEDED"}
+FAILED_STATES = {"JOB_STATE_FAILED", "JOB_STATE_CANCELLED", "JOB_STATE_EXPIRED"}
+
+_jobs_lock = threading.Lock()
+
+
+class BatchError(RuntimeError):
+    """A request in a batch job failed or the job itself did not succeed."""
+
+
+def load_jobs() -> dict:
+    if not JOBS_PATH.exists():
+        return {}
+    try:
+        return json.loads(JOBS_PATH.read_text(encoding="utf-8"))
+    except (json.JSONDecodeError, OSError):
+        return {}
+
+
+def _save_job(chunk_id: str, entry: dict | None) -> None:
+    with _jobs_lock:
+        jobs = load_jobs()
+        if entry is None:
+            jobs.pop(chunk_id, None)
+        else:
+            jobs[chunk_id] = entry
+        atomic_write_bytes(JOBS_PATH, json.dumps(jobs, indent=2, sort_keys=True).encode("utf-8"))
+
+
+def payload_size(contents: list) -> int:
+    """Approximate inline bytes of a request (images dominate)."""
+    size = 0
+    for item in contents:
+        if isinstance(item, str):
+            size += len(item.encode("utf-8"))
+        else:
+            inline = getattr(item, "inline_data", None)
+            size += len(inline.data) * 4 // 3 if inline and inline.data else 0  # base64
+    return size
+
+
+def chunk_requests(requests: list[tuple], max_bytes: int) -> list[list[tuple]]:
+    chunks, current, current_size = [], [], 0
+    for request in requests:
+        size = payload_size(request[1])
+        if current and current_size + size > max_bytes:
+            chunks.append(current)
+            current, current_size = [], 0
+        current.append(request)
+        current_size += size
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+def _state(job) -> str:
+    state = job.state
+    return getattr(state, "value", None) or str(state)
+
+
+def recorded_jobs(client, model: str, label: str, wanted: set[str]) -> list[tuple[str, str, list[str]]]:
+    """Recorded jobs of this label and model that answer any wanted key.
+
+    Returns [(chunk id, job name, all keys of the job)]. Recorded jobs that
+    answer none of them were paid for by a run whose pending set has since
+    changed; once finished they are dropped from the record (one still
+    running may belong to another process and is left alone).
+    """
+    resumed = []
+    for chunk_id, recorded in load_jobs().items():
+        if recorded.get("label") != label or recorded.get("model", model) != model:
+            continue
+        try:
+            job = call_with_retries(client.batches.get, name=recorded["job"])
+        except genai_errors().APIError as e:
+            print(f"[WARN] Recorded batch job {recorded['job']} unavailable ({e.code}), dropping it")
+            _save_job(chunk_id, None)
+            continue
+        useful = wanted.intersection(recorded["keys"])
+        if useful:
+            print(f"[*] Resuming batch job {recorded['job']} ({len(useful)} of its {len(recorded['keys'])} requests still pending)")
+            resumed.append((chunk_id, recorded["job"], recorded["keys"]))
+        elif _state(job) in DONE_STATES or _state(job) in FAILED_STATES:
+            print(f"[*] Dropping batch job {recorded['job']}: none of its {len(recorded['keys'])} requests are pending")
+            _save_job(chunk_id, None)
+    return resumed
+
+
+def submit(client, model: str, label: str, chunk: list[tuple]) -> tuple[str, str]:
+    """Create and record a batch job for one chunk. Returns (chunk id, job name)."""
+    keys = [key for key, _, _ in chunk]
+    chunk_id = hashlib.sha256(f"{label}|{model}|{'|'.join(keys)}".encode("utf-8")).hexdigest()[:16]
+    src = [
+        {"contents": contents, "config": config, "metadata": {"key": key}}
+        for key, contents, config in chunk
+    ]
+    job = call_with_retries(
+        client.batches.create,
+        model=model,
+        src=src,
+        config={"display_name": f"garden-{label}-{chunk_id}"},
+    )
+    _save_job(chunk_id, {
+        "job": job.name,
+        "label": label,
+        "model": model,
+        "keys": keys,
+        "submitted": datetime.now().isoformat(),
+    })
+    print(f"[OK] Submitted batch job {job.name} ({len(keys)} requests)")
+    return chunk_id, job.name
+
+
+def wait(client, name: str, poll: float):
+    """Poll a job until it reaches a terminal state. Returns the final job."""
+    started = time.monotonic()
+    last_state = None
+    while True:
+        job = call_with_retries(client.batches.get, name=name)
+        state = _state(job)
+        if state != last_state:
+            print(f"    [BATCH] {name}: {state} ({time.monotonic() - started:.0f}s)")
+            last_state = state
+        if state in DONE_STATES or state in FAILED_STATES:
+            return job
+        time.sleep(poll)
+
+
+def collect(job, keys: list[str]) -> dict:
+    """Map a finished job's inline responses back to request keys."""
+    state = _state(job)
+    if state in FAILED_STATES:
+        error = getattr(job, "error", None)
+        return {key: BatchError(f"Batch job {job.name} ended {state}: {error}") for key in keys}
+
+    responses = list(getattr(getattr(job, "dest", None), "inlined_responses", None) or [])
+    results = {}
+    for i, item in enumerate(responses):
+        key = (getattr(item, "metadata", None) or {}).get("key")
+        if key is None and i < len(keys):
+            key = keys[i]  # responses come back in request order
+        if item.error or item.response is None:
+            results[key] = BatchError(f"Batch request failed: {item.error}")
+        else:
+            results[key] = item.response
+    for key in keys:
+        results.setdefault(key, BatchError("No response in batch output"))
+    return results
+
+
+@tracing.traced("batch", "label")
+def run_batch(client, model: str, requests: list[tuple], label: str) -> dict:
+    """Run (key, contents, config) requests as batch jobs and wait for them.
+
+    Returns {key: response} where a failed request maps to a BatchError
+    instead of a response.
+    """
+    poll = float(os.getenv("GARDEN_BATCH_POLL", "30"))
+    max_bytes = int(float(os.getenv("GARDEN_BATCH_MAX_MB", "18")) * 1024 * 1024)
+
+    wanted = {key for key, _, _ in requests}
+    jobs = recorded_jobs(client, model, label, wanted)
+    covered = wanted & {key for _, _, keys in jobs for key in keys}
+    fresh = [request for request in requests if request[0] not in covered]
+    for chunk in chunk_requests(fresh, max_bytes):
+        jobs.append((*submit(client, model, label, chunk), [key for key, _, _ in chunk]))
+
+    results = {}
+    for chunk_id, name, keys in jobs:
+        job = wait(client, name, poll)
+        results.update({key: value for key, value in collect(job, keys).items() if key in wanted})
+        _save_job(chunk_id, None)
+    return results
@@ -0,0 +1,243 @@
+"""
+EVELIEN GARDEN - OFFLINE PIPELINE BENCHMARK
+=============================================
+
+Runs pipeline.py, verify.py --all and annotate.py end to end against the
+local Gemini stand-in (fake_backend.py) and reports wall-clock, throughput,
+p50/p95 time-to-PASS and API calls per PASS. No API key needed.
+
+Each benchmark runs in a throwaway copy of the project (scripts + prompts,
+synthetic photos), so the real generated/ folders are never touched.
+
+Usage:
+    python scripts/benchmark.py pipeline --zone shade --runs 10
+    python scripts/benchmark.py pipeline --zone all --runs 3 --args="--concurrency 5"
+    python scripts/benchmark.py pipeline --zone shade --args="--candidates 3"
+    python scripts/benchmark.py verify --images 40 --args="--workers 8"
+    python scripts/benchmark.py annotate --photos 20 --latency 1.0 --error-rate 0.1
+"""
+
+import argparse
+import json
+import os
+import random
+import shlex
+import shutil
+import sqlite3
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from contextlib import closing
+from pathlib import Path
+
+from PIL import Image, ImageDraw
+
+from zones import ZONES
+
+PROJECT_ROOT = Path(__file__).parent.parent
+SCRIPTS_DIR = PROJECT_ROOT / "scripts"
+PROMPTS_DIR = PROJECT_ROOT / "generated" / "prompts"
+
+
+def synthetic_photo(path: Path, rng: random.Random, size: tuple[int, int] = (2400, 1800)) -> None:
+    img = Image.new("RGB", size, (90, 140, 80))
+    draw = ImageDraw.Draw(img)
+    for _ in range(20):
+        x0, y0 = rng.randint(0, size[0]), rng.randint(0, size[1])
+        x1, y1 = x0 + rng.randint(50, 600), y0 + rng.randint(50, 600)
+        draw.rectangle([x0, y0, x1, y1], fill=tuple(rng.randint(0, 255) for _ in range(3)))
+    path.parent.mkdir(parents=True, exist_ok=True)
+    img.save(path, "JPEG", quality=92)
+
+
+def make_sandbox(photos: int, seed: int) -> Path:
+    """Copy scripts + prompts into a temp project with synthetic references."""
+    root = Path(tempfile.mkdtemp(prefix="garden-bench-"))
+    shutil.copytree(SCRIPTS_DIR, root / "scripts", ignore=shutil.ignore_patterns("__pycache__"))
+    shutil.copytree(PROMPTS_DIR, root / "generated" / "prompts")
+    for sub in ["annotated", "visuals", "rejected", "feedback"]:
+        (root / "generated" / sub).mkdir(parents=True, exist_ok=True)
+
+    rng = random.Random(seed)
+    for i in range(photos):
+        synthetic_photo(root / "ref" / "space" / f"space_{i:02d}.jpg", rng)
+    for zone in ZONES:
+        if zone != "full":
+            for i in range(3):
+                synthetic_photo(root / "ref" / "inspiration" / zone / f"{zone}_{i}.jpg", rng, (1600, 1200))
+    return root
+
+
+def read_calls(log_path: Path, start: int) -> tuple[list[dict], int]:
+    """Calls appended to the fake backend's log since byte offset `start`."""
+    if not log_path.exists():
+        return [], start
+    with open(log_path, "rb") as f:
+        f.seek(start)
+        data = f.read()
+    calls = [json.loads(line) for line in data.decode("utf-8").splitlines() if line.strip()]
+    return calls, start + len(data)
+
+
+def run_script(root: Path, script: str, args: list[str], env: dict) -> tuple[float, str]:
+    cmd = [sys.executable, str(root / "scripts" / script)] + args
+    start = time.monotonic()
+    proc = subprocess.run(cmd, cwd=root, env=env, capture_output=True, text=True)
+    elapsed = time.monotonic() - start
+    if proc.returncode != 0:
+        print(proc.stdout[-2000:])
+        print(proc.stderr[-2000:])
+        raise SystemExit(f"[ERROR] {script} exited with {proc.returncode}")
+    return elapsed, proc.stdout
+
+
+def percentile(values: list[float], pct: float) -> float:
+    if not values:
+        return float("nan")
+    ordered = sorted(values)
+    k = (len(ordered) - 1) * pct / 100
+    lo, hi = int(k), min(int(k) + 1, len(ordered) - 1)
+    return ordered[lo] + (ordered[hi] - ordered[lo]) * (k - lo)
+
+
+def reset_outputs(root: Path) -> None:
+    for sub in ["visuals", "rejected", "feedback"]:
+        shutil.rmtree(root / "generated" / sub, ignore_errors=True)
+        (root / "generated" / sub).mkdir(parents=True)
+
+
+def count_passes(root: Path) -> int:
+    """PASS verdicts recorded in the sandbox's run database."""
+    db_path = root / "generated" / "feedback" / "runs.db"
+    if not db_path.exists():
+        return 0
+    with closing(sqlite3.connect(str(db_path))) as conn:
+        return conn.execute("SELECT COUNT(*) FROM verdicts WHERE verdict = 'PASS'").fetchone()[0]
+
+
+def seed_visuals(root: Path, count: int, rng: random.Random) -> None:
+    for i in range(count):
+        zone = ZONES[i % len(ZONES)]
+        synthetic_photo(root / "generated" / "visuals" / f"{zone}_v{i + 1}.jpg", rng, (1024, 768))
+
+
+def bench(args) -> dict:
+    root = make_sandbox(args.photos, args.seed)
+    log_path = root / "fake_calls.jsonl"
+    env = dict(os.environ)
+    env.update({
+        "GARDEN_BACKEND": "fake",
+        "GARDEN_FAKE_CALL_LOG": str(log_path),
+        "GARDEN_FAKE_LATENCY": str(args.latency),
+        "GARDEN_FAKE_VERIFY_LATENCY": str(args.verify_latency),
+        "GARDEN_FAKE_ERROR_RATE": str(args.error_rate),
+        "GARDEN_FAKE_SCORE_MEAN": str(args.score_mean),
+        "GARDEN_FAKE_SCORE_SD": str(args.score_sd),
+        "GEMINI_RPM": str(args.rpm),
+    })
+    extra = shlex.split(args.args)
+    rng = random.Random(args.seed)
+    offset = 0
+    runs = []
+
+    if args.mode == "pipeline":
+        # Annotate once up front so runs measure the generate/verify loop
+        run_script(root, "annotate.py", [], env)
+        _, offset = read_calls(log_path, 0)
+
+    print(f"[*] Sandbox: {root}")
+    for i in range(1, args.runs + 1):
+        env["GARDEN_FAKE_SEED"] = str(args.seed + i)
+        if args.mode == "pipeline":
+            reset_outputs(root)
+            elapsed, out = run_script(root, "pipeline.py", ["--zone", args.zone, "--skip-annotate"] + extra, env)
+            passes = out.count("PIPELINE COMPLETE")
+            items = len(args.zone.split(",")) if args.zone != "all" else len(ZONES)
+        elif args.mode == "verify":
+            reset_outputs(root)
+            seed_visuals(root, args.images, rng)
+            elapsed, out = run_script(root, "verify.py", ["--all"] + extra, env)
+            passes = count_passes(root)
+            items = args.images
+        else:
+            for path in (root / "generated" / "annotated").iterdir():
+                path.unlink()
+            elapsed, out = run_script(root, "annotate.py", extra, env)
+            passes = sum(1 for _ in (root / "generated" / "annotated").glob("*_annotated.jpg"))
+            items = args.photos
+
+        calls, offset = read_calls(log_path, offset)
+        runs.append({"elapsed": elapsed, "passes": passes, "items": items, "calls": calls})
+        print(f"    run {i}/{args.runs}: {elapsed:.2f}s, {len(calls)} calls, {passes} passed/done")
+
+    if not args.keep:
+        shutil.rmtree(root, ignore_errors=True)
+    return summarize(args, runs)
+
+
+def summarize(args, runs: list[dict]) -> dict:
+    total_time = sum(r["elapsed"] for r in runs)
+    total_items = sum(r["items"] for r in runs)
+    total_calls = sum(len(r["calls"]) for r in runs)
+    total_passes = sum(r["passes"] for r in runs)
+    errors = sum(1 for r in runs for c in r["calls"] if c["error"])
+    by_kind = {}
+    for r in runs:
+        for c in r["calls"]:
+            by_kind[c["kind"]] = by_kind.get(c["kind"], 0) + 1
+    pass_times = [r["elapsed"] for r in runs if r["passes"]]
+
+    return {
+        "mode": args.mode,
+        "args": args.args,
+        "runs": len(runs),
+        "wall_clock_s": round(total_time, 3),
+        "throughput_items_per_s": round(total_items / total_time, 3) if total_time else 0,
+        "time_to_pass_p50_s": round(percentile(pass_times, 50), 3) if pass_times else None,
+        "time_to_pass_p95_s": round(percentile(pass_times, 95), 3) if pass_times else None,
+        "mean_run_s": round(statistics.mean(r["elapsed"] for r in runs), 3) if runs else None,
+        "api_calls": total_calls,
+        "api_calls_by_kind": by_kind,
+        "api_errors": errors,
+        "passes": total_passes,
+        "api_calls_per_pass": round(total_calls / total_passes, 2) if total_passes else None,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the pipeline offline against a fake Gemini")
+    parser.add_argument("mode", choices=["pipeline", "verify", "annotate"])
+    parser.add_argument("--zone", default="shade", help="pipeline: zone(s) to run (default: shade)")
+    parser.add_argument("--runs", type=int, default=5, help="Repetitions (default: 5)")
+    parser.add_argument("--photos", type=int, default=6, help="Synthetic space photos (default: 6)")
+    parser.add_argument("--images", type=int, default=20, help="verify: synthetic visuals to judge (default: 20)")
+    parser.add_argument("--args", default="", help="Extra arguments passed to the script under test")
+    parser.add_argument("--latency", type=float, default=0.5, help="Mean seconds per image call (default: 0.5)")
+    parser.add_argument("--verify-latency", type=float, default=0.25, help="Mean seconds per verify call (default: 0.25)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of calls failing with 503")
+    parser.add_argument("--score-mean", type=float, default=36.0, help="Mean verdict total (default: 36)")
+    parser.add_argument("--score-sd", type=float, default=6.0, help="Verdict total std deviation (default: 6)")
+    parser.add_argument("--rpm", type=float, default=0, help="GEMINI_RPM for the run (default: 0, unlimited)")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--json", type=str, help="Also write the report to this file")
+    parser.add_argument("--keep", action="store_true", help="Keep the sandbox directory")
+    args = parser.parse_args()
+
+    report = bench(args)
+
+    print(f"\n{'='*55}")
+    print(f"  BENCHMARK - {args.mode} {args.args}".rstrip())
+    print(f"{'='*55}")
+    for key, value in report.items():
+        if key not in ("mode", "args"):
+            print(f"  {key:<24} {value}")
+    print(f"{'='*55}")
+
+    if args.json:
+        Path(args.json).write_text(json.dumps(report, indent=2), encoding="utf-8")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+"""
+EVELIEN GARDEN - SHARED CORE
+==============================
+
+Process-wide plumbing every script shares, kept cheap to import:
+- load_env(): reads .env once per process
+- genai_types() / genai_errors(): the google-genai SDK, imported on first
+  use - importing it costs more than half a second, so --dry-run, --help
+  and reporting commands never pay for it
+- get_client(): one client per process, built on first use (see backend.py)
+
+PIL and NumPy are likewise imported inside the functions that need them.
+
+Check the cold-start budget (each script's --help, which imports the whole
+module graph):
+    python scripts/core.py --startup
+"""
+
+import argparse
+import sys
+import threading
+import time
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).parent.parent
+SCRIPTS_DIR = Path(__file__).parent
+
+STARTUP_BUDGET_MS = 250  # wall clock for `python scripts/<name>.py --help`
+STARTUP_SCRIPTS = ["pipeline", "generate", "verify", "annotate", "worker", "jobqueue", "status", "rundb", "images"]
+
+_env_loaded = False
+_client = None
+_client_lock = threading.Lock()
+
+
+def load_env() -> None:
+    """Load PROJECT_ROOT/.env into the environment (once)."""
+    global _env_loaded
+    if _env_loaded:
+        return
+    try:
+        from dotenv import load_dotenv
+        load_dotenv(PROJECT_ROOT / ".env", override=True)
+    except ImportError:
+        pass
+    _env_loaded = True
+
+
+def genai_types():
+    """google.genai.types, imported on first use."""
+    from google.genai import types
+    return types
+
+
+def genai_errors():
+    """google.genai.errors, imported on first use."""
+    from google.genai import errors
+    return errors
+
+
+def get_client():
+    """The process-wide model client, created on first call."""
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                from backend import create_client
+                _client = create_client()
+    return _client
+
+
+def measure_startup(script: str, runs: int = 3) -> dict:
+    """Median wall time of `python scripts/<script>.py --help`, and whether the SDK got imported."""
+    import statistics
+    import subprocess
+
+    path = SCRIPTS_DIR / f"{script}.py"
+    times = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        subprocess.run([sys.executable, str(path), "--help"], capture_output=True, check=True)
+        times.append((time.perf_counter() - started) * 1000)
+
+    probe = f"import sys; sys.path.insert(0, {str(SCRIPTS_DIR)!r}); import {script}; print('google.genai' in sys.modules)"
+    sdk = subprocess.run([sys.executable, "-c", probe], capture_output=True, text=True, check=True)
+    return {"script": script, "ms": statistics.median(times), "sdk_loaded": sdk.stdout.strip() == "True"}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Shared core utilities")
+    parser.add_argument("--startup", action="store_true", help="Measure script cold start against the budget")
+    parser.add_argument("--budget", type=float, default=STARTUP_BUDGET_MS, help=f"Budget in ms (default: {STARTUP_BUDGET_MS})")
+    args = parser.parse_args()
+
+    if not args.startup:
+        parser.print_help()
+        return
+
+    over = 0
+    print(f"  {'script':<12} {'--help ms':>10}  sdk imported")
+    for script in STARTUP_SCRIPTS:
+        result = measure_startup(script)
+        flag = "" if result["ms"] <= args.budget and not result["sdk_loaded"] else "  [OVER]"
+        over += bool(flag)
+        print(f"  {script:<12} {result['ms']:>10.0f}  {'yes' if result['sdk_loaded'] else 'no'}{flag}")
+    print(f"\n  Budget: {args.budget:.0f} ms, SDK not imported")
+    if over:
+        print(f"[WARN] {over} scripts over budget")
+        sys.exit(1)
+    print("[OK] All scripts within budget")
+
+
+if __name__ == "__main__":
+    main()
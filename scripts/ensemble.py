@@ -0,0 +1,145 @@
+"""
+EVELIEN GARDEN - VERIFY JUDGE ENSEMBLE
+========================================
+
+A single verify call at temperature 0.3 decides PASS / MARGINAL / REJECT,
+and totals near the 30 and 40 thresholds flip between runs. In ensemble
+mode several judges vote, but only as many as it takes for the verdict to
+be settled:
+
+- the first judge runs alone; a total far from both thresholds settles
+  the verdict with that one call
+- otherwise more judges run, PARALLEL at a time, and after every vote the
+  mean total gets a confidence interval (Z standard errors, with the
+  spread never assumed below SD_FLOOR points - two identical votes are
+  not proof of certainty)
+- the verdict is settled once the whole interval falls on one side of each
+  threshold; at MAX_JUDGES the mean decides regardless
+
+Judges still in flight when the verdict settles are not waited for.
+
+The aggregate verdict carries the mean total, mean per-criterion scores,
+the union of issues and adjustments, and every vote.
+
+Enable with --judges [N] on verify.py, pipeline.py or worker.py.
+"""
+
+import math
+import statistics
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+DEFAULT_MAX_JUDGES = 5
+PARALLEL = 2  # judges in flight at once after the first
+SD_FLOOR = 3.0  # points; typical run-to-run spread of one judge's total
+Z = 1.645  # 90% two-sided interval
+
+# Set by enable(); None means one judge per image
+MAX_JUDGES: int | None = None
+
+
+def enable(max_judges: int = DEFAULT_MAX_JUDGES) -> None:
+    global MAX_JUDGES
+    MAX_JUDGES = max(1, max_judges)
+
+
+def verdict_for(total: float, thresholds: tuple[int, int]) -> str:
+    marginal, passing = thresholds
+    if total >= passing:
+        return "PASS"
+    if total >= marginal:
+        return "MARGINAL"
+    return "REJECT"
+
+
+def interval(totals: list[int]) -> tuple[float, float, float]:
+    """(mean, low, high) of the mean total's confidence interval."""
+    mean = statistics.fmean(totals)
+    sd = statistics.stdev(totals) if len(totals) > 1 else 0.0
+    half = Z * max(sd, SD_FLOOR) / math.sqrt(len(totals))
+    return mean, mean - half, mean + half
+
+
+def settled(totals: list[int], thresholds: tuple[int, int]) -> bool:
+    """True once the interval around the mean total no longer straddles a threshold."""
+    if not totals:
+        return False
+    _, low, high = interval(totals)
+    return verdict_for(low, thresholds) == verdict_for(high, thresholds)
+
+
+def _vote(call) -> dict | None:
+    """One judge; None if it failed or returned no verdict."""
+    try:
+        vote = call()
+    except Exception as e:
+        print(f"    [JUDGE] failed: {e}")
+        return None
+    return vote if vote.get("verdict", "UNKNOWN") != "UNKNOWN" else None
+
+
+def judge(call, thresholds: tuple[int, int], max_judges: int | None = None) -> list[dict]:
+    """Run call() (one judge, returning a parsed verdict) until the verdict is settled.
+
+    Returns the valid votes in the order they arrived; empty if every
+    judge failed.
+    """
+    max_judges = max_judges or MAX_JUDGES or 1
+    votes = []
+    pool = ThreadPoolExecutor(max_workers=PARALLEL)
+    try:
+        in_flight = {pool.submit(_vote, call)}
+        launched = 1
+        while in_flight:
+            done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in done:
+                vote = future.result()
+                if vote is not None:
+                    votes.append(vote)
+                    print(f"    [JUDGE {len(votes)}] {vote['total']}/50 {vote['verdict']}")
+
+            totals = [v["total"] for v in votes]
+            if settled(totals, thresholds):
+                if len(votes) > 1 or in_flight:
+                    mean, low, high = interval(totals)
+                    print(f"    [SETTLED] after {len(votes)} judges: {mean:.1f} ({low:.1f}-{high:.1f})")
+                break
+            while launched < max_judges and len(in_flight) < PARALLEL:
+                in_flight.add(pool.submit(_vote, call))
+                launched += 1
+    finally:
+        pool.shutdown(wait=False, cancel_futures=True)
+    return votes
+
+
+def _union(lists: list[list[str]]) -> list[str]:
+    seen = []
+    for items in lists:
+        for item in items:
+            if item not in seen:
+                seen.append(item)
+    return seen
+
+
+def aggregate(votes: list[dict], thresholds: tuple[int, int]) -> dict:
+    """One verdict from several votes: mean total and per-criterion scores, merged issues."""
+    totals = [v["total"] for v in votes]
+    mean, low, high = interval(totals)
+    total = round(mean)
+
+    criteria = _union([list(v.get("scores", {})) for v in votes])
+    scores = {}
+    for name in criteria:
+        values = [v["scores"][name] for v in votes if name in v.get("scores", {})]
+        scores[name] = round(statistics.fmean(values), 1)
+
+    return {
+        "verdict": verdict_for(total, thresholds),
+        "total": total,
+        "scores": scores,
+        "issues": _union([v.get("issues", []) for v in votes]),
+        "prompt_adjustments": _union([v.get("prompt_adjustments", []) for v in votes]),
+        "raw": "\n\n".join(f"--- judge {i} ---\n{v.get('raw', '')}" for i, v in enumerate(votes, 1)),
+        "judges": len(votes),
+        "votes": [{"total": v["total"], "verdict": v["verdict"], "scores": v.get("scores", {})} for v in votes],
+        "interval": [round(low, 1), round(high, 1)],
+    }
@@ -0,0 +1,239 @@
+"""
+EVELIEN GARDEN - LOCAL GEMINI STAND-IN
+========================================
+
+An offline replacement for genai.Client used for benchmarks and dry
+end-to-end runs. It answers client.models.generate_content() with:
+- synthetic JPEG images for image calls (annotate, generate)
+- JSON verdicts in the verify_prompt.md format for text-only calls
+with configurable latency, transient error rate and score distribution.
+client.batches.create()/get() run inline batch jobs through the same
+responder in a background thread, for testing --batch modes, and
+client.files.upload() hands out fake file URIs for --upload-refs.
+
+Enable with GARDEN_BACKEND=fake. Settings (environment):
+    GARDEN_FAKE_LATENCY          mean seconds per image call (default 2.0)
+    GARDEN_FAKE_VERIFY_LATENCY   mean seconds per verify call (default 1.0)
+    GARDEN_FAKE_ERROR_RATE       fraction of calls failing with 503 (default 0)
+    GARDEN_FAKE_SCORE_MEAN       mean verdict total out of 50 (default 36)
+    GARDEN_FAKE_SCORE_SD         verdict total std deviation (default 6)
+    GARDEN_FAKE_SEED             RNG seed for reproducible runs
+    GARDEN_FAKE_CALL_LOG         JSONL file recording every call
+"""
+
+import io
+import json
+import os
+import random
+import itertools
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from types import SimpleNamespace
+
+from google.genai import errors
+from PIL import Image, ImageDraw
+
+from fileio import locked_append
+
+CRITERIA = ["space_match", "feature_preservation", "proportions", "feasibility", "style_consistency"]
+
+
+def _env_float(name: str, default: float) -> float:
+    return float(os.getenv(name, str(default)))
+
+
+class FakeModels:
+    """Implements models.generate_content() with synthetic responses."""
+
+    def __init__(self, client: "FakeClient"):
+        self.client = client
+
+    def generate_content(self, model: str, contents, config=None):
+        modalities = list(getattr(config, "response_modalities", None) or ["TEXT"])
+        prompt = "\n".join(c for c in contents if isinstance(c, str))
+        if "IMAGE" in modalities:
+            kind = "annotate" if "ANNOTATION TASK" in prompt else "generate"
+        else:
+            kind = "verify"
+        return self.client.respond(kind, model)
+
+
+class FakeBatches:
+    """Implements batches.create()/get() for inline requests.
+
+    Jobs only live as long as the client, so a job recorded by an earlier
+    process is reported as not found (and resubmitted by batch.py).
+    """
+
+    WORKERS = 16
+
+    def __init__(self, client: "FakeClient"):
+        self.client = client
+        self.jobs = {}
+        self.counter = itertools.count(1)
+
+    def create(self, model: str, src: list, config=None):
+        name = f"batches/fake-{next(self.counter)}"
+        job = SimpleNamespace(name=name, state="JOB_STATE_PENDING", error=None, dest=None)
+        self.jobs[name] = job
+        threading.Thread(target=self.run, args=(job, model, list(src)), daemon=True).start()
+        return job
+
+    def run(self, job: SimpleNamespace, model: str, src: list) -> None:
+        job.state = "JOB_STATE_RUNNING"
+
+        def one(request: dict):
+            metadata = request.get("metadata")
+            try:
+                response = self.client.models.generate_content(model, request["contents"], request.get("config"))
+                return SimpleNamespace(response=response, metadata=metadata, error=None)
+            except errors.APIError as e:
+                return SimpleNamespace(response=None, metadata=metadata, error={"code": e.code, "message": str(e)})
+
+        with ThreadPoolExecutor(max_workers=self.WORKERS) as pool:
+            responses = list(pool.map(one, src))
+        job.dest = SimpleNamespace(inlined_responses=responses)
+        job.state = "JOB_STATE_SUCCEEDED"
+
+    def get(self, name: str):
+        if name not in self.jobs:
+            raise errors.ClientError(404, {"error": {"code": 404, "message": f"{name} not found", "status": "NOT_FOUND"}})
+        return self.jobs[name]
+
+
+class FakeFiles:
+    """Implements files.upload() - returns a handle, keeps nothing."""
+
+    def __init__(self, client: "FakeClient"):
+        self.client = client
+        self.counter = itertools.count(1)
+
+    def upload(self, file, config=None):
+        name = f"files/fake-{next(self.counter)}"
+        mime_type = (config or {}).get("mime_type", "image/jpeg")
+        self.client.log({"kind": "upload", "model": None, "latency": 0, "error": False, "t": time.time()})
+        return SimpleNamespace(
+            name=name,
+            uri=f"https://fake.invalid/{name}",
+            mime_type=mime_type,
+            expiration_time=datetime.now(timezone.utc) + timedelta(hours=48),
+        )
+
+
+class FakeClient:
+    """Stand-in for genai.Client with the same models.generate_content() shape."""
+
+    def __init__(
+        self,
+        latency: float = 2.0,
+        verify_latency: float = 1.0,
+        error_rate: float = 0.0,
+        score_mean: float = 36.0,
+        score_sd: float = 6.0,
+        seed: int | None = None,
+        call_log: Path | None = None,
+    ):
+        self.latency = latency
+        self.verify_latency = verify_latency
+        self.error_rate = error_rate
+        self.score_mean = score_mean
+        self.score_sd = score_sd
+        self.call_log = call_log
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()
+        self.calls = 0
+        self.models = FakeModels(self)
+        self.batches = FakeBatches(self)
+        self.files = FakeFiles(self)
+
+    @classmethod
+    def from_env(cls) -> "FakeClient":
+        seed = os.getenv("GARDEN_FAKE_SEED")
+        call_log = os.getenv("GARDEN_FAKE_CALL_LOG")
+        return cls(
+            latency=_env_float("GARDEN_FAKE_LATENCY", 2.0),
+            verify_latency=_env_float("GARDEN_FAKE_VERIFY_LATENCY", 1.0),
+            error_rate=_env_float("GARDEN_FAKE_ERROR_RATE", 0.0),
+            score_mean=_env_float("GARDEN_FAKE_SCORE_MEAN", 36.0),
+            score_sd=_env_float("GARDEN_FAKE_SCORE_SD", 6.0),
+            seed=int(seed) if seed else None,
+            call_log=Path(call_log) if call_log else None,
+        )
+
+    def respond(self, kind: str, model: str):
+        with self.lock:
+            self.calls += 1
+            mean = self.verify_latency if kind == "verify" else self.latency
+            latency = self.rng.uniform(0.5, 1.5) * mean
+            failed = self.rng.random() < self.error_rate
+            seed = self.rng.getrandbits(32)
+
+        time.sleep(latency)
+        entry = {"kind": kind, "model": model, "latency": round(latency, 3), "error": failed, "t": time.time()}
+
+        if failed:
+            self.log(entry)
+            raise errors.ServerError(503, {"error": {"code": 503, "message": "fake overload", "status": "UNAVAILABLE"}})
+
+        if kind == "verify":
+            text, total = self.verdict(random.Random(seed))
+            entry["total"] = total
+            self.log(entry)
+            return self.response([SimpleNamespace(text=text, inline_data=None)], output_tokens=len(text) // 4)
+
+        self.log(entry)
+        data = self.image(random.Random(seed))
+        return self.response([
+            SimpleNamespace(text=None, inline_data=SimpleNamespace(mime_type="image/jpeg", data=data)),
+        ], output_tokens=1290)
+
+    def verdict(self, rng: random.Random) -> tuple[str, int]:
+        total = int(round(min(50, max(5, rng.gauss(self.score_mean, self.score_sd)))))
+        # Spread the total over the five criteria (each 1-10)
+        scores = [total // 5] * 5
+        for i in range(total - sum(scores)):
+            scores[i] += 1
+        if total >= 40:
+            verdict = "PASS"
+        elif total >= 30:
+            verdict = "MARGINAL"
+        else:
+            verdict = "REJECT"
+        data = {name: {"score": score, "notes": "synthetic"} for name, score in zip(CRITERIA, scores)}
+        data.update({
+            "total": total,
+            "verdict": verdict,
+            "issues": [] if verdict == "PASS" else ["Synthetic issue"],
+            "prompt_adjustments": [] if verdict == "PASS" else ["Synthetic adjustment"],
+        })
+        return "```json\n" + json.dumps(data, indent=2) + "\n```", total
+
+    def image(self, rng: random.Random, size: tuple[int, int] = (1024, 768)) -> bytes:
+        img = Image.new("RGB", size, tuple(rng.randint(60, 200) for _ in range(3)))
+        draw = ImageDraw.Draw(img)
+        for _ in range(12):
+            x0, y0 = rng.randint(0, size[0]), rng.randint(0, size[1])
+            x1, y1 = x0 + rng.randint(20, 300), y0 + rng.randint(20, 300)
+            draw.rectangle([x0, y0, x1, y1], fill=tuple(rng.randint(0, 255) for _ in range(3)))
+        buf = io.BytesIO()
+        img.save(buf, format="JPEG", quality=90)
+        return buf.getvalue()
+
+    def response(self, parts: list, output_tokens: int) -> SimpleNamespace:
+        prompt_tokens = 2000  # a handful of tiled images plus the prompt
+        return SimpleNamespace(
+            candidates=[SimpleNamespace(content=SimpleNamespace(parts=parts))],
+            text=None,
+            usage_metadata=SimpleNamespace(
+                prompt_token_count=prompt_tokens,
+                candidates_token_count=output_tokens,
+                total_token_count=prompt_tokens + output_tokens,
+            ),
+        )
+
+    def log(self, entry: dict) -> None:
+        if self.call_log:
+            locked_append(self.call_log, json.dumps(entry) + "\n")
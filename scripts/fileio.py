@@ -0,0 +1,178 @@
+"""
+EVELIEN GARDEN - FILE HELPERS
+===============================
+
+Small filesystem helpers shared by the pipeline scripts: content hashing,
+atomic writes (so concurrent readers never see a half-written file),
+append/move helpers that are safe to call from several workers at once, and
+a lock-file mutex that also works between hosts on a shared volume.
+"""
+
+import hashlib
+import os
+import shutil
+import socket
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+_HASH_CACHE: dict[tuple[str, int, int], str] = {}
+
+
+def file_hash(path: Path) -> str:
+    """SHA-256 of a file's contents, memoized on (path, size, mtime)."""
+    stat = path.stat()
+    key = (str(path.resolve()), stat.st_size, stat.st_mtime_ns)
+    digest = _HASH_CACHE.get(key)
+    if digest is None:
+        h = hashlib.sha256()
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(1 << 20), b""):
+                h.update(chunk)
+        digest = h.hexdigest()
+        _HASH_CACHE[key] = digest
+    return digest
+
+
+def atomic_write_bytes(path: Path, data: bytes) -> None:
+    """Write bytes to a temp file in the same directory, then rename over path."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=str(path.parent), prefix=f".{path.name}.", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp, path)
+    except BaseException:
+        try:
+            os.remove(tmp)
+        except FileNotFoundError:
+            pass
+        raise
+
+
+_append_lock = threading.Lock()
+
+
+def locked_append(path: Path, text: str) -> None:
+    """Append text as one write, serialised across threads and (where
+    supported) processes sharing the file."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with _append_lock, open(path, "a", encoding="utf-8") as f:
+        if fcntl is not None:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+        try:
+            f.write(text)
+            f.flush()
+        finally:
+            if fcntl is not None:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+
+_move_lock = threading.Lock()
+
+
+def move_unique(src: Path, dest_dir: Path) -> Path:
+    """Move src into dest_dir without overwriting; adds -1, -2... on name clashes."""
+    dest_dir.mkdir(parents=True, exist_ok=True)
+    with _move_lock:
+        dest = dest_dir / src.name
+        n = 1
+        while dest.exists():
+            dest = dest_dir / f"{src.stem}-{n}{src.suffix}"
+            n += 1
+        shutil.move(str(src), str(dest))
+    return dest
+
+
+LOCK_STALE_SECONDS = 60
+
+
+def _holder_alive(holder: str) -> bool | None:
+    """Whether the process named in a lock file ("host:pid:thread") is running.
+
+    None when that cannot be told from here: another host, an unreadable
+    or still empty lock file, or Windows (where os.kill would terminate).
+    """
+    host, _, rest = holder.partition(":")
+    pid = rest.partition(":")[0]
+    if host != socket.gethostname() or not pid.isdigit() or os.name == "nt":
+        return None
+    try:
+        os.kill(int(pid), 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def _break_stale(lock_path: Path, stale: float) -> bool:
+    """Move a dead holder's lock out of the way. True if the lock is worth retrying now.
+
+    The lock is renamed to a unique name rather than deleted, so two waiters
+    breaking it at once cannot remove a lock the other has just taken; a live
+    lock renamed by mistake in that race is linked back.
+    """
+    try:
+        age = time.time() - lock_path.stat().st_mtime
+        holder = lock_path.read_text(encoding="utf-8")
+    except FileNotFoundError:
+        return True
+    alive = _holder_alive(holder)
+    if alive or (alive is None and age <= stale):
+        return False
+
+    broken = lock_path.with_name(f"{lock_path.name}.{os.urandom(8).hex()}.stale")
+    try:
+        os.rename(lock_path, broken)
+    except FileNotFoundError:
+        return True
+    try:
+        if broken.read_text(encoding="utf-8") != holder:
+            try:
+                os.link(broken, lock_path)
+            except OSError:
+                pass
+    finally:
+        broken.unlink(missing_ok=True)
+    return True
+
+
+@contextmanager
+def file_lock(lock_path: Path, timeout: float = 30.0, stale: float = LOCK_STALE_SECONDS):
+    """Mutex on an O_EXCL lock file, safe across threads, processes and hosts.
+
+    The lock file holds its owner as host:pid:thread. It is broken when that
+    process is gone (same host) or, when that cannot be checked, once it is
+    older than `stale` seconds. On release it is only removed if still ours.
+    """
+    lock_path.parent.mkdir(parents=True, exist_ok=True)
+    deadline = time.monotonic() + timeout
+    owner = f"{socket.gethostname()}:{os.getpid()}:{threading.get_ident()}"
+    while True:
+        try:
+            fd = os.open(str(lock_path), os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+            break
+        except FileExistsError:
+            if _break_stale(lock_path, stale):
+                continue
+            if time.monotonic() > deadline:
+                raise TimeoutError(f"Timed out waiting for lock {lock_path}")
+            time.sleep(0.01)
+    try:
+        os.write(fd, owner.encode("utf-8"))
+        os.close(fd)
+        yield
+    finally:
+        try:
+            if lock_path.read_text(encoding="utf-8") == owner:
+                lock_path.unlink()
+        except FileNotFoundError:
+            pass
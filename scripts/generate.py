@@ -14,34 +14,37 @@ Usage:
     python scripts/generate.py --zone play-area
     python scripts/generate.py --zone plants
     python scripts/generate.py --zone full
+    python scripts/generate.py --zone shade --upload-refs
+    python scripts/generate.py --zone shade --count 3 --seed 7
 """
 
+from __future__ import annotations
+
 import argparse
-import io
-import os
+import hashlib
 import random
 import re
+import threading
 import time
-from datetime import datetime
 from pathlib import Path
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from google import genai
 
-from google import genai
-from google.genai import types
-from PIL import Image
+from core import genai_types, get_client, load_env
+from apicall import generate_content
+from fileio import atomic_write_bytes, file_lock
+from images import save_model_image
+import tracing
+import uploads
+from payload import describe, encode_request
+from uploads import reference_part
+from zones import ZONES
 
 PROJECT_ROOT = Path(__file__).parent.parent
 
-try:
-    from dotenv import load_dotenv
-    load_dotenv(PROJECT_ROOT / ".env", override=True)
-except ImportError:
-    pass
-
-API_KEY = os.getenv("GEMINI_API_KEY")
-if not API_KEY:
-    raise ValueError(
-        "GEMINI_API_KEY not set. Copy .env.example to .env and add your key."
-    )
+load_env()
 
 MODEL = "nano-banana-pro-preview"
 
@@ -52,26 +55,9 @@ DRAWINGS_DIR = PROJECT_ROOT / "drawings" / "layouts"
 ANNOTATED_DIR = PROJECT_ROOT / "generated" / "annotated"
 VISUALS_DIR = PROJECT_ROOT / "generated" / "visuals"
 PROMPTS_DIR = PROJECT_ROOT / "generated" / "prompts"
+REJECTED_DIR = PROJECT_ROOT / "generated" / "rejected"
 FEEDBACK_DIR = PROJECT_ROOT / "generated" / "feedback"
-
-ZONES = ["shade", "seating", "plants", "play-area", "full"]
-
-
-def load_image(path: Path) -> Image.Image:
-    img = Image.open(str(path))
-    if img.mode in ("RGBA", "P"):
-        img = img.convert("RGB")
-    return img
-
-
-def image_to_bytes(img: Image.Image, max_size: int = 1500) -> bytes:
-    if max(img.size) > max_size:
-        ratio = max_size / max(img.size)
-        new_size = (int(img.width * ratio), int(img.height * ratio))
-        img = img.resize(new_size, Image.Resampling.LANCZOS)
-    buf = io.BytesIO()
-    img.save(buf, format="JPEG", quality=90)
-    return buf.getvalue()
+VERSIONS_DIR = VISUALS_DIR / ".versions"
 
 
 def load_prompt(name: str) -> str:
@@ -81,64 +67,70 @@ def load_prompt(name: str) -> str:
     return ""
 
 
-def get_images(directory: Path, max_count: int = 3) -> list[Path]:
-    """Get image files from a directory."""
+def get_images(directory: Path, max_count: int = 3, rng: random.Random | None = None) -> list[Path]:
+    """Get image files from a directory (a random sample of max_count)."""
     if not directory.exists():
         return []
-    images = (
+    images = sorted(
         list(directory.glob("*.jpg"))
         + list(directory.glob("*.jpeg"))
         + list(directory.glob("*.png"))
     )
     if len(images) > max_count:
-        images = random.sample(images, max_count)
+        images = (rng or random).sample(images, max_count)
     return sorted(images)
 
 
-def get_next_version(zone: str) -> int:
-    """Get next version number for a zone."""
-    existing = list(VISUALS_DIR.glob(f"{zone}_v*.jpg"))
-    if not existing:
-        return 1
-    numbers = []
-    for f in existing:
-        match = re.search(r"_v(\d+)", f.stem)
-        if match:
-            numbers.append(int(match.group(1)))
-    return max(numbers) + 1 if numbers else 1
+def scan_max_version(zone: str) -> int:
+    """Highest version of a zone on disk, in visuals/ or rejected/."""
+    highest = 0
+    for directory in (VISUALS_DIR, REJECTED_DIR):
+        for f in directory.glob(f"{zone}_v*.*"):
+            match = re.search(r"_v(\d+)", f.stem)
+            if match:
+                highest = max(highest, int(match.group(1)))
+    return highest
+
+
+def allocate_version(zone: str) -> int:
+    """Hand out the next version number for a zone, never reusing one.
+
+    A per-zone counter file guarded by a lock file makes this atomic across
+    threads, processes and hosts sharing the volume. The directory scan only
+    runs once, to seed a missing counter.
+    """
+    counter = VERSIONS_DIR / zone
+    with file_lock(VERSIONS_DIR / f"{zone}.lock"):
+        if counter.exists():
+            last = int(counter.read_text(encoding="utf-8").strip() or 0)
+        else:
+            last = scan_max_version(zone)
+        version = last + 1
+        atomic_write_bytes(counter, str(version).encode("utf-8"))
+    return version
 
 
-def generate(client: genai.Client, zone: str, feedback: str = "", dry_run: bool = False) -> Path | None:
-    """Generate a design visual for a zone."""
-    if zone not in ZONES:
-        print(f"[ERROR] Unknown zone: {zone}. Choose from: {', '.join(ZONES)}")
-        return None
+def build_generation_context(client: genai.Client | None, zone: str, seed: int | None = None) -> dict | None:
+    """Reference choices, encoded image parts and base prompt for a zone.
 
-    print(f"\n{'='*60}")
-    print(f"  GENERATING: {zone}")
-    print(f"{'='*60}")
-
-    # Build contents list - images first, prompt last
-    contents = []
+    Built once per pipeline run and reused by every attempt, so only the
+    feedback section changes between attempts. A seed makes the reference
+    sample reproducible across runs. Pass client=None to keep every image
+    inline (no uploads), e.g. for --dry-run.
+    """
+    rng = random.Random(f"{seed}:{zone}") if seed is not None else None
 
     # 1. Annotated space photos (most important - grounds the design in reality)
-    annotated = get_images(ANNOTATED_DIR, max_count=3)
+    annotated = get_images(ANNOTATED_DIR, max_count=3, rng=rng)
     if not annotated:
         # Fall back to raw space photos
-        annotated = get_images(REF_SPACE, max_count=3)
+        annotated = get_images(REF_SPACE, max_count=3, rng=rng)
         if annotated:
             print(f"[WARN] No annotated photos found, using raw space photos")
         else:
             print(f"[WARN] No space photos at all - generation may not match your garden")
 
     for photo in annotated:
-        img = load_image(photo)
-        contents.append(
-            types.Part.from_bytes(
-                data=image_to_bytes(img, max_size=1200),
-                mime_type="image/jpeg",
-            )
-        )
         print(f"    [OK] Space: {photo.name}")
 
     # 2. Inspiration references for this zone
@@ -146,38 +138,32 @@ def generate(client: genai.Client, zone: str, feedback: str = "", dry_run: bool
     if zone == "full":
         # For full garden, sample from all inspiration subdirs
         all_inspiration = []
-        for subdir in REF_INSPIRATION.iterdir():
+        for subdir in sorted(REF_INSPIRATION.iterdir()):
             if subdir.is_dir():
-                all_inspiration.extend(get_images(subdir, max_count=1))
+                all_inspiration.extend(get_images(subdir, max_count=1, rng=rng))
         inspiration = all_inspiration[:4]
     else:
-        inspiration = get_images(inspiration_dir, max_count=3)
+        inspiration = get_images(inspiration_dir, max_count=3, rng=rng)
 
     for ref in inspiration:
-        img = load_image(ref)
-        contents.append(
-            types.Part.from_bytes(
-                data=image_to_bytes(img, max_size=1000),
-                mime_type="image/jpeg",
-            )
-        )
         print(f"    [OK] Inspiration: {ref.name}")
 
     if not inspiration:
         print(f"    [WARN] No inspiration images in ref/inspiration/{zone}/")
 
     # 3. Layout drawings (if available)
-    layouts = get_images(DRAWINGS_DIR, max_count=1)
+    layouts = get_images(DRAWINGS_DIR, max_count=1, rng=rng)
     for layout in layouts:
-        img = load_image(layout)
-        contents.append(
-            types.Part.from_bytes(
-                data=image_to_bytes(img, max_size=1200),
-                mime_type="image/jpeg",
-            )
-        )
         print(f"    [OK] Layout: {layout.name}")
 
+    # Images first, prompt last. Size, quality and format per image come
+    # from the request's payload budget by role.
+    encoded = encode_request(
+        [(p, "space") for p in annotated]
+        + [(p, "inspiration") for p in inspiration]
+        + [(p, "layout") for p in layouts]
+    )
+
     # 4. Build text prompt
     system = load_prompt("system_prompt")
     zone_prompt = load_prompt(zone)
@@ -187,7 +173,7 @@ def generate(client: genai.Client, zone: str, feedback: str = "", dry_run: bool
 
     # Also load annotation notes if they exist
     notes = []
-    for notes_file in ANNOTATED_DIR.glob("*_notes.md"):
+    for notes_file in sorted(ANNOTATED_DIR.glob("*_notes.md")):
         notes.append(notes_file.read_text(encoding="utf-8"))
 
     prompt_parts = []
@@ -197,30 +183,73 @@ def generate(client: genai.Client, zone: str, feedback: str = "", dry_run: bool
         prompt_parts.append("=== SPACE ANNOTATIONS ===\n" + "\n---\n".join(notes))
     prompt_parts.append("=== GENERATION TASK ===\n" + zone_prompt)
 
-    full_prompt = "\n\n".join(prompt_parts)
+    return {
+        "zone": zone,
+        "seed": seed,
+        "annotated": annotated,
+        "inspiration": inspiration,
+        "layouts": layouts,
+        "encoded": encoded,
+        "parts": [reference_part(client, e) for e in encoded],
+        "prompt": "\n\n".join(prompt_parts),
+    }
+
+
+@tracing.traced("generate", "zone")
+def generate(
+    client: genai.Client,
+    zone: str,
+    feedback: str = "",
+    dry_run: bool = False,
+    context: dict | None = None,
+    cancelled: threading.Event | None = None,
+) -> Path | None:
+    """Generate a design visual for a zone.
+
+    Pass a context from build_generation_context() to reuse references and
+    prompt across attempts; otherwise one is built for this call. If
+    `cancelled` is set by the time the model answers, the result is thrown
+    away unsaved (no version, visual or run database row) and None returned.
+    """
+    if zone not in ZONES:
+        print(f"[ERROR] Unknown zone: {zone}. Choose from: {', '.join(ZONES)}")
+        return None
+
+    print(f"\n{'='*60}")
+    print(f"  GENERATING: {zone}")
+    print(f"{'='*60}")
+
+    if context is None:
+        context = build_generation_context(None if dry_run else client, zone)  # --dry-run never uploads
+        if context is None:
+            return None
+    else:
+        print(f"    [OK] Reusing run context: {len(context['encoded'])} images, prompt {len(context['prompt'])} chars")
 
+    annotated, inspiration, layouts = context["annotated"], context["inspiration"], context["layouts"]
+    encoded = context["encoded"]
+
+    full_prompt = context["prompt"]
     if feedback:
         full_prompt += "\n\n## ADJUSTMENT BASED ON PREVIOUS FEEDBACK\n" + feedback
 
-    contents.append(full_prompt)
+    contents = [*context["parts"], full_prompt]
     print(f"    [OK] Prompt: {len(full_prompt)} chars")
 
-    if not any(
-        isinstance(c, types.Part) and c.inline_data for c in contents
-        if isinstance(c, types.Part)
-    ):
+    if not encoded:
         print("[WARN] No images being sent. Results will be generic.")
 
     if dry_run:
         print(f"\n{'='*60}")
         print(f"  DRY RUN - Would send to Gemini:")
         print(f"{'='*60}")
-        image_count = sum(1 for c in contents if isinstance(c, types.Part) and hasattr(c, 'inline_data') and c.inline_data)
-        print(f"  Images: {image_count}")
+        print(f"  Images: {len(encoded)}")
         print(f"    Space photos: {len(annotated)}")
         print(f"    Inspiration refs: {len(inspiration)}")
         print(f"    Layout drawings: {len(layouts)}")
         print(f"  Prompt length: {len(full_prompt)} chars")
+        print(f"\n--- PAYLOAD ---")
+        print("\n".join(describe(encoded)))
         print(f"\n--- PROMPT TEXT ---")
         print(full_prompt)
         print(f"--- END PROMPT ---")
@@ -229,14 +258,20 @@ def generate(client: genai.Client, zone: str, feedback: str = "", dry_run: bool
     # Generate
     print(f"\n[*] Calling nano-banana-pro-preview...")
     try:
-        response = client.models.generate_content(
+        started = time.monotonic()
+        response = generate_content(
+            client,
             model=MODEL,
             contents=contents,
-            config=types.GenerateContentConfig(
+            config=genai_types().GenerateContentConfig(
                 response_modalities=["TEXT", "IMAGE"],
                 temperature=0.7,
             ),
         )
+        latency = time.monotonic() - started
+        if cancelled is not None and cancelled.is_set():
+            print(f"    [DROP] {zone}: generation no longer needed, result not saved")
+            return None
 
         # Safe access to response
         try:
@@ -247,29 +282,31 @@ def generate(client: genai.Client, zone: str, feedback: str = "", dry_run: bool
             return None
 
         VISUALS_DIR.mkdir(parents=True, exist_ok=True)
-        version = get_next_version(zone)
         text_parts = []
 
         for part in parts:
             if part.inline_data and part.inline_data.mime_type.startswith("image/"):
+                version = allocate_version(zone)
                 output_path = VISUALS_DIR / f"{zone}_v{version}.jpg"
-                out_img = Image.open(io.BytesIO(part.inline_data.data))
-                if out_img.mode in ("RGBA", "P"):
-                    out_img = out_img.convert("RGB")
-                out_img.save(str(output_path), "JPEG", quality=95)
+                save_model_image(part.inline_data.data, part.inline_data.mime_type, output_path)
                 print(f"\n[OK] Saved: {output_path.name}")
+                # Imported here so --help and --dry-run skip them (and sqlite3)
+                import phash
+                from rundb import record_generation
+
+                phash.add(output_path)
 
                 # Log generation
-                FEEDBACK_DIR.mkdir(parents=True, exist_ok=True)
-                log_path = FEEDBACK_DIR / "generation_log.md"
-                with open(log_path, "a", encoding="utf-8") as f:
-                    f.write(
-                        f"\n## {zone}_v{version} - {datetime.now().isoformat()}\n"
-                        f"- Zone: {zone}\n"
-                        f"- Space photos: {len(annotated)}\n"
-                        f"- Inspiration refs: {len(inspiration)}\n"
-                        f"- Layout drawings: {len(layouts)}\n"
-                    )
+                record_generation(
+                    zone,
+                    version,
+                    output_path.name,
+                    model=MODEL,
+                    prompt_hash=hashlib.sha256(full_prompt.encode("utf-8")).hexdigest(),
+                    refs=[p.name for p in annotated + inspiration + layouts],
+                    feedback=feedback,
+                    latency=latency,
+                )
 
                 return output_path
             elif part.text:
@@ -300,16 +337,27 @@ def main():
         default=1,
         help="Number of variations to generate (default: 1)",
     )
+    parser.add_argument("--upload-refs", action="store_true", help="Send reference images once via the Files API, then by URI")
+    parser.add_argument("--seed", type=int, help="Seed for the reference sample, so variations are comparable")
     parser.add_argument("--dry-run", action="store_true", help="Show what would be sent without calling API")
+    tracing.add_arguments(parser)
     args = parser.parse_args()
+    tracing.apply(args)
+
+    client = None if args.dry_run else get_client()  # --dry-run needs no API key
+    if args.upload_refs:
+        uploads.enable()
 
-    client = genai.Client(api_key=API_KEY)
+    # One context for all variations: same references and prompt
+    context = build_generation_context(None if args.dry_run else client, args.zone, seed=args.seed)
+    if context is None:
+        return
 
     results = []
     for i in range(args.count):
         if args.count > 1:
             print(f"\n--- Variation {i + 1}/{args.count} ---")
-        result = generate(client, args.zone, dry_run=args.dry_run)
+        result = generate(client, args.zone, dry_run=args.dry_run, context=context)
         if result:
             results.append(result)
 
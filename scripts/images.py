@@ -0,0 +1,315 @@
+"""
+EVELIEN GARDEN - IMAGE PREPROCESSING
+======================================
+
+Shared image loading and encoding for annotate, generate and verify.
+
+Reference photos are decoded, resized and re-encoded as JPEG before being
+sent to Gemini. The encoded bytes are cached on disk in generated/cache/images,
+keyed by the source file's content hash, mtime, max_size and quality, so each
+photo pays the decode/resize cost once instead of on every attempt and zone.
+The cache is size-bounded and evicts least recently used entries first.
+
+JPEGs are decoded at the smallest DCT scale (1/2, 1/4 or 1/8) that still
+covers the target size (Image.draft) rather than at full resolution - an
+8000x6000 phone photo sent at 1536 px is decoded at 2000x1500 - and EXIF
+orientation is applied so rotated shots are sent upright. Other formats
+are decoded in full.
+
+Images returned by the model are written to disk as-is when they are already
+JPEG (transcoded once otherwise) and kept in memory for the rest of the
+process, so the verify stage of the pipeline does not read and decode the
+file it just wrote. A JPEG that is already within max_size is sent without
+being decoded or re-encoded at all, with its EXIF/XMP and IPTC segments
+(camera details, GPS position) cut from the header.
+
+Usage:
+    python scripts/images.py --stats
+    python scripts/images.py --clear
+"""
+
+from __future__ import annotations
+
+import argparse
+import hashlib
+import io
+import os
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from PIL import Image
+
+from fileio import atomic_write_bytes, file_hash
+import tracing
+
+PROJECT_ROOT = Path(__file__).parent.parent
+CACHE_DIR = PROJECT_ROOT / "generated" / "cache" / "images"
+
+# Size bound for the encoded image cache (override with GARDEN_IMAGE_CACHE_MB)
+CACHE_MAX_BYTES = int(os.getenv("GARDEN_IMAGE_CACHE_MB", "256")) * 1024 * 1024
+
+# Bump when the encoding pipeline changes so stale cache entries are not reused
+ENCODER_VERSION = 3
+
+# Recently saved model outputs kept in memory: path -> (jpeg bytes, decoded image or None)
+RECENT_MAX = 16
+_recent: OrderedDict[str, tuple[bytes, Image.Image | None]] = OrderedDict()
+_recent_lock = threading.Lock()
+
+
+def draft_box(size: tuple[int, int], max_size: int) -> tuple[int, int]:
+    """The size an image of `size` is resized to for max_size, as a box for Image.draft.
+
+    draft() only reduces while both sides stay within the box, so the box
+    must have the image's aspect ratio - a square one stops a 4:3 photo at
+    the first scale where its short side would drop below max_size.
+    """
+    width, height = size
+    if width >= height:
+        return max_size, max(1, -(-max_size * height // width))
+    return max(1, -(-max_size * width // height)), max_size
+
+
+def load_image(path: Path, max_size: int | None = None) -> Image.Image:
+    """Open an image upright and in RGB.
+
+    With max_size, JPEGs are decoded at the smallest DCT scale (1/2, 1/4,
+    1/8) that still covers max_size, which cuts decode time and peak memory
+    for large photos. The source file is closed before returning.
+    """
+    from PIL import Image, ImageOps
+
+    with tracing.span("image.load", image=path.name) as span, Image.open(str(path)) as src:
+        if max_size:
+            src.draft("RGB", draft_box(src.size, max_size))
+        img = ImageOps.exif_transpose(src)  # always a new image, detached from the file
+        if img.mode != "RGB":
+            img = img.convert("RGB")
+        span.set(size=f"{img.width}x{img.height}")
+    return img
+
+
+def image_to_bytes(img: Image.Image, max_size: int = 1500, quality: int = 90, fmt: str = "JPEG") -> bytes:
+    from PIL import Image
+
+    with tracing.span("image.encode", format=fmt, quality=quality) as span:
+        if max(img.size) > max_size:
+            ratio = max_size / max(img.size)
+            new_size = (max(1, round(img.width * ratio)), max(1, round(img.height * ratio)))
+            # reducing_gap: cheap integer box reduce first, LANCZOS only for the last step
+            img = img.resize(new_size, Image.Resampling.LANCZOS, reducing_gap=3.0)
+        buf = io.BytesIO()
+        if fmt == "WEBP":
+            img.save(buf, format="WEBP", quality=quality, method=4)
+        else:
+            img.save(buf, format="JPEG", quality=quality)
+        span.set(size=f"{img.width}x{img.height}", bytes=buf.tell())
+    return buf.getvalue()
+
+
+def mime_type(data: bytes) -> str:
+    """MIME type of encoded image bytes (JPEG, WebP or PNG)."""
+    if data[:4] == b"RIFF" and data[8:12] == b"WEBP":
+        return "image/webp"
+    if data[:8] == b"\x89PNG\r\n\x1a\n":
+        return "image/png"
+    return "image/jpeg"
+
+
+def cache_key(path: Path, max_size: int, quality: int, fmt: str = "JPEG") -> str:
+    """Cache key for an encoded image: content hash + mtime + encode settings."""
+    mtime_ns = path.stat().st_mtime_ns
+    raw = f"{file_hash(path)}:{mtime_ns}:{max_size}:{quality}:{fmt}:{ENCODER_VERSION}"
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+def remember(path: Path, data: bytes, img: Image.Image | None = None) -> None:
+    """Keep a just-written image in memory for later stages of this process."""
+    with _recent_lock:
+        _recent[str(path)] = (data, img)
+        _recent.move_to_end(str(path))
+        while len(_recent) > RECENT_MAX:
+            _recent.popitem(last=False)
+
+
+def recall(path: Path) -> tuple[bytes, Image.Image | None] | None:
+    with _recent_lock:
+        return _recent.get(str(path))
+
+
+def open_image(path: Path) -> Image.Image:
+    """Image.open, served from memory when the file was just written by us."""
+    from PIL import Image
+
+    recent = recall(path)
+    if recent:
+        data, img = recent
+        return img.copy() if img is not None else Image.open(io.BytesIO(data))
+    return Image.open(str(path))
+
+
+def is_sendable_jpeg(img: Image.Image, max_size: int) -> bool:
+    """True if an opened (not yet decoded) image can be sent as its original bytes."""
+    orientation = img.getexif().get(0x0112, 1)
+    return img.format == "JPEG" and img.mode in ("RGB", "L") and max(img.size) <= max_size and orientation == 1
+
+
+def strip_metadata(data: bytes) -> bytes:
+    """JPEG bytes without APP1 (EXIF, XMP) and APP13 (IPTC) segments.
+
+    Only the header is rewritten; the compressed image data is untouched.
+    Colour profiles (APP2) and the JFIF/Adobe segments are kept.
+    """
+    if data[:2] != b"\xff\xd8":
+        return data
+    kept = [data[:2]]
+    pos = 2
+    while pos + 4 <= len(data) and data[pos] == 0xFF:
+        marker = data[pos + 1]
+        if marker == 0xFF:  # fill byte
+            pos += 1
+            continue
+        if marker in (0xDA, 0xD9):  # start of scan / end of image
+            break
+        end = pos + 2 + int.from_bytes(data[pos + 2:pos + 4], "big")
+        if marker not in (0xE1, 0xED):
+            kept.append(data[pos:end])
+        pos = end
+    kept.append(data[pos:])
+    return b"".join(kept)
+
+
+def save_model_image(data: bytes, mime_type: str, output_path: Path, quality: int = 95) -> Path:
+    """Persist image bytes returned by the model as JPEG.
+
+    JPEG output is written byte-for-byte; other formats are transcoded once.
+    Either way the result stays in memory (see remember()).
+    """
+    from PIL import Image
+
+    with tracing.span("output.save", image=output_path.name, mime_type=mime_type) as span:
+        if mime_type == "image/jpeg":
+            atomic_write_bytes(output_path, data)
+            remember(output_path, data)
+            span.set(bytes=len(data))
+            return output_path
+
+        img = Image.open(io.BytesIO(data))
+        if img.mode != "RGB":
+            img = img.convert("RGB")
+        buf = io.BytesIO()
+        img.save(buf, format="JPEG", quality=quality)
+        jpeg = buf.getvalue()
+        atomic_write_bytes(output_path, jpeg)
+        remember(output_path, jpeg, img)
+        span.set(bytes=len(jpeg))
+    return output_path
+
+
+def encode_image(
+    path: Path,
+    max_size: int = 1500,
+    quality: int = 90,
+    fmt: str = "JPEG",
+    passthrough: bool = True,
+) -> bytes:
+    """Load, resize and encode an image file (JPEG or WEBP), using the on-disk cache.
+
+    With passthrough, a JPEG already within max_size is returned as-is
+    whatever fmt asks for; pass False to force the requested encoding.
+    """
+    with tracing.span("image.prepare", image=path.name, max_size=max_size) as span:
+        data = _encode_image(path, max_size, quality, fmt, passthrough)
+        span.set(bytes=len(data))
+    return data
+
+
+def _encode_image(path: Path, max_size: int, quality: int, fmt: str, passthrough: bool) -> bytes:
+    from PIL import Image
+
+    recent = recall(path)
+    if recent:
+        data, img = recent
+        if img is None:
+            img = Image.open(io.BytesIO(data))  # header only, no pixel decode
+            if passthrough and is_sendable_jpeg(img, max_size):
+                return data
+        elif passthrough and max(img.size) <= max_size:
+            return data
+        if img.format == "JPEG":
+            img.draft("RGB", draft_box(img.size, max_size))
+        return image_to_bytes(img.convert("RGB"), max_size=max_size, quality=quality, fmt=fmt)
+
+    if passthrough:
+        with Image.open(str(path)) as img:
+            if is_sendable_jpeg(img, max_size):
+                return strip_metadata(path.read_bytes())
+
+    suffix = ".webp" if fmt == "WEBP" else ".jpg"
+    entry = CACHE_DIR / f"{cache_key(path, max_size, quality, fmt)}{suffix}"
+    try:
+        data = entry.read_bytes()
+        os.utime(entry)  # mark as recently used
+        return data
+    except FileNotFoundError:
+        pass
+
+    data = image_to_bytes(load_image(path, max_size), max_size=max_size, quality=quality, fmt=fmt)
+    atomic_write_bytes(entry, data)
+    evict()
+    return data
+
+
+def cache_entries() -> list[Path]:
+    if not CACHE_DIR.exists():
+        return []
+    return [p for p in CACHE_DIR.iterdir() if p.suffix in (".jpg", ".webp")]
+
+
+def evict(max_bytes: int = CACHE_MAX_BYTES) -> int:
+    """Drop least recently used entries until the cache fits. Returns count removed."""
+    entries = []
+    total = 0
+    for entry in cache_entries():
+        try:
+            stat = entry.stat()
+        except FileNotFoundError:
+            continue
+        entries.append((stat.st_mtime, stat.st_size, entry))
+        total += stat.st_size
+
+    removed = 0
+    for _, size, entry in sorted(entries):
+        if total <= max_bytes:
+            break
+        try:
+            entry.unlink()
+        except FileNotFoundError:
+            pass
+        total -= size
+        removed += 1
+    return removed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Manage the encoded image cache")
+    parser.add_argument("--stats", action="store_true", help="Show cache size")
+    parser.add_argument("--clear", action="store_true", help="Remove all cached images")
+    args = parser.parse_args()
+
+    if args.clear:
+        removed = evict(max_bytes=0)
+        print(f"[OK] Removed {removed} cached images")
+    else:
+        entries = cache_entries()
+        total = sum(e.stat().st_size for e in entries)
+        print(f"  Cache dir: {CACHE_DIR}")
+        print(f"  Entries:   {len(entries)}")
+        print(f"  Size:      {total / 1024 / 1024:.1f} MB / {CACHE_MAX_BYTES / 1024 / 1024:.0f} MB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,362 @@
+"""
+EVELIEN GARDEN - JOB QUEUE
+============================
+
+Durable spool-directory queue for pipeline, annotate and verify work, so a
+week of design variants can be queued once and drained by long-lived
+workers (worker.py) at full rate-limit utilisation. A crash or Ctrl-C loses
+at most the jobs that were running; they go back to the queue.
+
+Layout (generated/queue/, or GARDEN_QUEUE_DIR):
+    pending/<priority>-<created>-<rand>.json    waiting, claimed in name order
+    leased/<id>@<expires>@<owner>.json          running; lease expiry in the name
+    done/<id>.json, failed/<id>.json            finished, with result or errors
+    tmp/                                        private files mid-update
+
+Every state change is a rename, which is atomic on a local disk and on
+shared volumes (NFS, SMB), so several workers - on one machine or several -
+can drain the same spool without a lock server:
+- claim: rename pending -> leased; exactly one worker wins
+- heartbeat: rename the leased file to a later expiry; failing means the
+  lease was reaped and the job belongs to someone else now
+- finish: rename leased -> tmp (taking ownership), write the result, then
+  rename into done/ or failed/
+- reap: a lease past its expiry (dead worker) goes back to pending, or to
+  failed/ after MAX_ATTEMPTS
+
+Delivery is at-least-once: a worker that loses its lease may finish a job
+that another worker then runs again. Lease expiry uses wall-clock time, so
+hosts sharing a spool need roughly synchronised clocks.
+
+Usage:
+    python scripts/jobqueue.py
+    python scripts/jobqueue.py --retry-failed
+    python scripts/jobqueue.py --purge-done
+"""
+
+import argparse
+import json
+import os
+import secrets
+import socket
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+
+from fileio import atomic_write_bytes
+
+PROJECT_ROOT = Path(__file__).parent.parent
+
+KINDS = ["annotate", "zone", "verify"]
+PRIORITY = {"annotate": 1, "verify": 4, "zone": 5}  # lower runs first
+
+DEFAULT_LEASE = 600  # seconds; renewed every lease/3 while a job runs
+MAX_ATTEMPTS = 3
+
+_tmp_counter = iter(range(1, 1 << 62))
+_tmp_lock = threading.Lock()
+
+
+def queue_dir() -> Path:
+    return Path(os.getenv("GARDEN_QUEUE_DIR") or PROJECT_ROOT / "generated" / "queue")
+
+
+def _dir(state: str) -> Path:
+    path = queue_dir() / state
+    path.mkdir(parents=True, exist_ok=True)
+    return path
+
+
+def worker_id() -> str:
+    """Owner tag for leases: host and process (no '@', which separates name fields)."""
+    host = socket.gethostname().replace("@", "_").replace(".", "_")
+    return f"{host}-{os.getpid()}"
+
+
+def relative(path: Path) -> str:
+    """Path as stored in a job: relative to the project, so hosts may mount it anywhere."""
+    try:
+        return path.resolve().relative_to(PROJECT_ROOT.resolve()).as_posix()
+    except ValueError:
+        return str(path)
+
+
+def resolve(stored: str) -> Path:
+    path = Path(stored)
+    return path if path.is_absolute() else PROJECT_ROOT / path
+
+
+def _read(path: Path) -> dict | None:
+    try:
+        return json.loads(path.read_text(encoding="utf-8"))
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+
+
+def _write(path: Path, job: dict) -> None:
+    atomic_write_bytes(path, json.dumps(job, indent=2, sort_keys=True).encode("utf-8"))
+
+
+def _private(job_id: str) -> Path:
+    """A tmp/ name only this thread will ever use, stamped with when it was taken."""
+    with _tmp_lock:
+        n = next(_tmp_counter)
+    return _dir("tmp") / _lease_name(job_id, time.time(), f"{worker_id()}-{threading.get_ident()}-{n}")
+
+
+def _take(path: Path, job_id: str) -> Path | None:
+    """Rename a job file to a private name. None if someone else moved it first."""
+    private = _private(job_id)
+    try:
+        os.rename(path, private)
+    except FileNotFoundError:
+        return None
+    return private
+
+
+def _lease_name(job_id: str, expires: float, owner: str) -> str:
+    return f"{job_id}@{int(expires)}@{owner}.json"
+
+
+def _parse_lease(path: Path) -> tuple[str, float, str] | None:
+    parts = path.stem.split("@")
+    if len(parts) != 3:
+        return None
+    try:
+        return parts[0], float(parts[1]), parts[2]
+    except ValueError:
+        return None
+
+
+def active_keys() -> set[str]:
+    """Dedupe keys of jobs that are pending or running."""
+    keys = set()
+    for state in ["pending", "leased"]:
+        for path in _dir(state).glob("*.json"):
+            job = _read(path)
+            if job and job.get("key"):
+                keys.add(job["key"])
+    return keys
+
+
+def enqueue(
+    kind: str,
+    args: dict,
+    key: str | None = None,
+    priority: int | None = None,
+    active: set[str] | None = None,
+) -> str | None:
+    """Add a job. Returns its id, or None if a job with the same key is already queued.
+
+    Pass active=active_keys() when enqueueing many jobs, so the spool is
+    scanned once; the new key is added to it.
+    """
+    if kind not in KINDS:
+        raise ValueError(f"Unknown job kind: {kind}")
+    if key is not None:
+        active = active_keys() if active is None else active
+        if key in active:
+            return None
+        active.add(key)
+    priority = PRIORITY[kind] if priority is None else priority
+    job_id = f"{priority}-{time.time_ns():020d}-{secrets.token_hex(3)}"
+    job = {
+        "id": job_id,
+        "kind": kind,
+        "args": args,
+        "key": key,
+        "priority": priority,
+        "created": datetime.now().isoformat(),
+        "attempts": 0,
+        "errors": [],
+    }
+    _write(_dir("pending") / f"{job_id}.json", job)
+    return job_id
+
+
+def claim(lease: float = DEFAULT_LEASE, kinds: list[str] | None = None) -> tuple[dict, Path] | None:
+    """Lease the first pending job. Returns (job, lease path) or None if none is free."""
+    leased_dir = _dir("leased")
+    for path in sorted(_dir("pending").glob("*.json")):
+        job = _read(path)
+        if job is None or (kinds and job["kind"] not in kinds):
+            continue
+        target = leased_dir / _lease_name(path.stem, time.time() + lease, worker_id())
+        try:
+            os.rename(path, target)
+        except FileNotFoundError:
+            continue  # another worker got it
+        return job, target
+    return None
+
+
+def renew(lease_path: Path, lease: float = DEFAULT_LEASE) -> Path | None:
+    """Extend a lease. Returns the new lease path, or None if the lease was lost."""
+    job_id, _, owner = _parse_lease(lease_path)
+    target = lease_path.with_name(_lease_name(job_id, time.time() + lease, owner))
+    try:
+        os.rename(lease_path, target)
+    except FileNotFoundError:
+        return None
+    return target
+
+
+def _settle(private: Path, job: dict, state: str) -> None:
+    _write(private, job)
+    os.rename(private, _dir(state) / f"{job['id']}.json")
+
+
+def _reclaim(lease_path: Path, job_id: str) -> Path | None:
+    """Own a job again for finishing it: from our lease, or from pending if it was reaped meanwhile."""
+    private = _take(lease_path, job_id)
+    if private is None:
+        private = _take(_dir("pending") / f"{job_id}.json", job_id)
+    return private
+
+
+def complete(lease_path: Path, job: dict, result: dict) -> bool:
+    """Record a finished job. False if the lease was lost and the job already ran elsewhere."""
+    private = _reclaim(lease_path, job["id"])
+    if private is None:
+        return False
+    job = _read(private) or job
+    job["attempts"] += 1
+    job["result"] = result
+    job["finished"] = datetime.now().isoformat()
+    job["worker"] = worker_id()
+    _settle(private, job, "done")
+    return True
+
+
+def fail(lease_path: Path, job: dict, error: str, max_attempts: int = MAX_ATTEMPTS) -> str | None:
+    """Record a failed attempt. Returns "pending" (will retry), "failed", or None if the lease was lost."""
+    private = _reclaim(lease_path, job["id"])
+    if private is None:
+        return None
+    job = _read(private) or job
+    job["attempts"] += 1
+    job["errors"].append({"at": datetime.now().isoformat(), "worker": worker_id(), "error": error})
+    state = "pending" if job["attempts"] < max_attempts else "failed"
+    _settle(private, job, state)
+    return state
+
+
+def release(lease_path: Path, job: dict) -> bool:
+    """Give a job back unfinished (e.g. on Ctrl-C) without counting an attempt."""
+    private = _take(lease_path, job["id"])
+    if private is None:
+        return False
+    os.rename(private, _dir("pending") / f"{job['id']}.json")
+    return True
+
+
+def reap(max_attempts: int = MAX_ATTEMPTS, lease: float = DEFAULT_LEASE) -> int:
+    """Return jobs whose lease expired (their worker died) to the queue. Returns count."""
+    now = time.time()
+    reaped = 0
+    for path in _dir("leased").glob("*.json"):
+        parsed = _parse_lease(path)
+        if parsed is None or parsed[1] > now:
+            continue
+        job_id, _, owner = parsed
+        private = _take(path, job_id)
+        if private is None:
+            continue  # renewed, finished or reaped by someone else
+        job = _read(private)
+        if job is None:
+            os.rename(private, _dir("failed") / f"{job_id}.json")
+            continue
+        job["attempts"] += 1
+        job["errors"].append({"at": datetime.now().isoformat(), "worker": owner, "error": "lease expired"})
+        _settle(private, job, "pending" if job["attempts"] < max_attempts else "failed")
+        reaped += 1
+
+    # A worker that died between taking and settling a job leaves it in tmp/
+    for path in _dir("tmp").glob("*.json"):
+        parsed = _parse_lease(path)
+        if parsed is None or now - parsed[1] < lease:
+            continue
+        private = _take(path, parsed[0])
+        if private is not None:
+            os.rename(private, _dir("pending") / f"{parsed[0]}.json")
+            reaped += 1
+    return reaped
+
+
+def counts() -> dict[str, int]:
+    return {state: len(list(_dir(state).glob("*.json"))) for state in ["pending", "leased", "done", "failed"]}
+
+
+def jobs(state: str) -> list[dict]:
+    return [job for job in (_read(p) for p in sorted(_dir(state).glob("*.json"))) if job]
+
+
+def retry_failed() -> int:
+    """Move failed jobs back to pending with a fresh attempt count."""
+    moved = 0
+    for path in sorted(_dir("failed").glob("*.json")):
+        private = _take(path, path.stem)
+        if private is None:
+            continue
+        job = _read(private)
+        job["attempts"] = 0
+        _settle(private, job, "pending")
+        moved += 1
+    return moved
+
+
+def purge_done() -> int:
+    removed = 0
+    for path in _dir("done").glob("*.json"):
+        path.unlink(missing_ok=True)
+        removed += 1
+    return removed
+
+
+def describe(job: dict) -> str:
+    args = job["args"]
+    target = args.get("zone") or Path(args.get("photo") or args.get("image") or "").name
+    return f"{job['kind']:<9} {target:<24}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Inspect and manage the job queue")
+    parser.add_argument("--retry-failed", action="store_true", help="Requeue failed jobs")
+    parser.add_argument("--purge-done", action="store_true", help="Delete finished job records")
+    args = parser.parse_args()
+
+    if args.retry_failed:
+        print(f"[OK] Requeued {retry_failed()} failed jobs")
+    if args.purge_done:
+        print(f"[OK] Removed {purge_done()} finished jobs")
+
+    reaped = reap()
+    if reaped:
+        print(f"[WARN] Requeued {reaped} jobs whose worker stopped renewing its lease")
+
+    total = counts()
+    print(f"\n{'='*60}")
+    print(f"  JOB QUEUE - {queue_dir()}")
+    print(f"{'='*60}")
+    print(f"  Pending: {total['pending']}   Running: {total['leased']}   Done: {total['done']}   Failed: {total['failed']}")
+
+    now = time.time()
+    leased = sorted(_dir("leased").glob("*.json"))
+    if leased:
+        print(f"\n  Running:")
+        for path in leased:
+            job, parsed = _read(path), _parse_lease(path)
+            if job and parsed:
+                print(f"    {describe(job)} {parsed[2]:<24} lease {parsed[1] - now:>5.0f}s")
+    failed = jobs("failed")
+    if failed:
+        print(f"\n  Failed:")
+        for job in failed:
+            last = job["errors"][-1]["error"] if job["errors"] else "-"
+            print(f"    {describe(job)} {job['attempts']} attempts: {last[:60]}")
+    print()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+"""
+EVELIEN GARDEN - REQUEST PAYLOAD BUDGET
+=========================================
+
+Picks size, quality and format for every image in a request from its role
+and a per-request byte budget, instead of one fixed JPEG setting for all.
+
+Roles, in order of how much they matter:
+- space / candidate / annotate: the real garden and the image being judged;
+  authoritative, so they get the largest share and the most resolution
+- layout: line drawings, compress well as WebP
+- inspiration: style hints only, kept to a single 768px tile
+
+Sizes are aligned to Gemini's 768px image tiles (each tile is ~258 input
+tokens), so an image never pays for a tile it barely uses. Each image gets
+a share of the budget proportional to its role weight; if it encodes
+larger than its share, quality and then size are stepped down until it
+fits or reaches the role's floor.
+
+Budget (per request): GARDEN_PAYLOAD_KB, default 6000.
+generate.py --dry-run shows the bytes and estimated tokens per image.
+"""
+
+import io
+import math
+import os
+from pathlib import Path
+
+from core import genai_types
+from images import encode_image, mime_type
+
+TILE = 768
+TOKENS_PER_TILE = 258
+SMALL_IMAGE = 384  # both sides at most this: a single tile
+
+# role -> weight (budget share), max/min long side, start/min quality, format
+ROLES = {
+    "space":       {"weight": 3, "max_size": 1536, "min_size": 768, "quality": 90, "min_quality": 75, "format": "JPEG"},
+    "candidate":   {"weight": 3, "max_size": 1536, "min_size": 768, "quality": 90, "min_quality": 75, "format": "JPEG"},
+    "annotate":    {"weight": 3, "max_size": 1536, "min_size": 768, "quality": 90, "min_quality": 80, "format": "JPEG"},
+    "layout":      {"weight": 2, "max_size": 1536, "min_size": 768, "quality": 85, "min_quality": 70, "format": "WEBP"},
+    "inspiration": {"weight": 1, "max_size": 768, "min_size": 512, "quality": 80, "min_quality": 60, "format": "WEBP"},
+}
+
+QUALITY_STEP = 10
+SIZE_STEP = 0.75
+
+
+def budget_bytes() -> int:
+    return int(float(os.getenv("GARDEN_PAYLOAD_KB", "6000")) * 1024)
+
+
+def estimate_tokens(width: int, height: int) -> int:
+    """Approximate Gemini input tokens for an image of this size."""
+    if width <= SMALL_IMAGE and height <= SMALL_IMAGE:
+        return TOKENS_PER_TILE
+    return math.ceil(width / TILE) * math.ceil(height / TILE) * TOKENS_PER_TILE
+
+
+def encode_for_role(path: Path, role: str, max_bytes: int) -> dict:
+    """Encode one image for its role within max_bytes (best effort)."""
+    from PIL import Image, features
+
+    spec = ROLES[role]
+    size, quality, fmt = spec["max_size"], spec["quality"], spec["format"]
+    if fmt == "WEBP" and not features.check("webp"):
+        fmt = "JPEG"
+    data = encode_image(path, max_size=size, quality=quality, fmt=fmt)
+    while len(data) > max_bytes:
+        if quality - QUALITY_STEP >= spec["min_quality"]:
+            quality -= QUALITY_STEP
+        elif int(size * SIZE_STEP) >= spec["min_size"]:
+            size = int(size * SIZE_STEP)
+            quality = spec["quality"]
+        else:
+            break
+        data = encode_image(path, max_size=size, quality=quality, fmt=fmt, passthrough=False)
+
+    img = Image.open(io.BytesIO(data))  # header only
+    return {
+        "path": path,
+        "role": role,
+        "data": data,
+        "mime_type": mime_type(data),
+        "width": img.width,
+        "height": img.height,
+        "quality": quality,
+        "bytes": len(data),
+        "tokens": estimate_tokens(img.width, img.height),
+    }
+
+
+def shares(roles: list[str], budget: int | None = None) -> list[int]:
+    """Bytes each image of a request may use, by role weight."""
+    budget = budget or budget_bytes()
+    total_weight = sum(ROLES[role]["weight"] for role in roles) or 1
+    return [budget * ROLES[role]["weight"] // total_weight for role in roles]
+
+
+def encode_request(items: list[tuple[Path, str]], budget: int | None = None) -> list[dict]:
+    """Encode (path, role) pairs so the request stays within budget bytes."""
+    limits = shares([role for _, role in items], budget)
+    return [encode_for_role(path, role, limit) for (path, role), limit in zip(items, limits)]
+
+
+def inline_part(encoded: dict):
+    return genai_types().Part.from_bytes(data=encoded["data"], mime_type=encoded["mime_type"])
+
+
+def describe(encoded: list[dict]) -> list[str]:
+    """Table lines of bytes and estimated tokens per image, for --dry-run."""
+    lines = [f"    {'image':<28} {'role':<12} {'size':>10} {'format':>9} {'KB':>7} {'~tokens':>8}"]
+    for e in encoded:
+        fmt = e["mime_type"].split("/")[1]
+        lines.append(
+            f"    {e['path'].name[:28]:<28} {e['role']:<12} {e['width']:>4}x{e['height']:<5} "
+            f"{fmt:>5} q{e['quality']:<2} {e['bytes'] / 1024:>7.0f} {e['tokens']:>8}"
+        )
+    total_bytes = sum(e["bytes"] for e in encoded)
+    total_tokens = sum(e["tokens"] for e in encoded)
+    lines.append(f"    {'total':<28} {'':<12} {'':>10} {'':>9} {total_bytes / 1024:>7.0f} {total_tokens:>8}")
+    lines.append(f"    budget {budget_bytes() / 1024:.0f} KB")
+    return lines
@@ -0,0 +1,183 @@
+"""
+EVELIEN GARDEN - PERCEPTUAL HASH INDEX
+========================================
+
+dHash (64-bit difference hash) of every saved visual, kept in
+generated/phash_index.json together with the verdict each image received.
+Near-duplicates of an already-judged image in the same zone can reuse that
+verdict instead of paying for another verify call, and status.py reports
+duplicate clusters per zone among the visuals still in generated/visuals
+(hashing any that were saved before the index existed).
+
+Enable verdict reuse with --dedupe [DISTANCE] on verify.py or pipeline.py.
+"""
+
+import hashlib
+import json
+from pathlib import Path
+
+from fileio import atomic_write_bytes, file_lock
+from images import open_image
+from zones import ZONES, zone_of
+
+PROJECT_ROOT = Path(__file__).parent.parent
+VISUALS_DIR = PROJECT_ROOT / "generated" / "visuals"
+INDEX_PATH = PROJECT_ROOT / "generated" / "phash_index.json"
+LOCK_PATH = PROJECT_ROOT / "generated" / ".phash_index.lock"
+CLUSTERS_PATH = PROJECT_ROOT / "generated" / "cache" / "phash_clusters.json"
+
+DEFAULT_DISTANCE = 5  # max differing bits (of 64) to count as a duplicate
+
+# Set by enable(); None means verdicts are never reused
+MAX_DISTANCE: int | None = None
+
+VERDICT_FIELDS = ["verdict", "total", "feedback", "issues", "prompt_adjustments", "scores", "local"]
+
+
+def enable(max_distance: int = DEFAULT_DISTANCE) -> None:
+    global MAX_DISTANCE
+    MAX_DISTANCE = max_distance
+
+
+def dhash(path: Path) -> str:
+    """64-bit difference hash as 16 hex chars."""
+    from PIL import Image
+
+    with open_image(path) as img:
+        img.draft("L", (64, 64))
+        small = img.convert("L").resize((9, 8), Image.Resampling.LANCZOS)
+    pixels = list(small.getdata())
+    bits = 0
+    for row in range(8):
+        for col in range(8):
+            left = pixels[row * 9 + col]
+            right = pixels[row * 9 + col + 1]
+            bits = (bits << 1) | (left > right)
+    return f"{bits:016x}"
+
+
+def distance(a: str, b: str) -> int:
+    return bin(int(a, 16) ^ int(b, 16)).count("1")
+
+
+def load_index() -> dict:
+    if not INDEX_PATH.exists():
+        return {}
+    try:
+        return json.loads(INDEX_PATH.read_text(encoding="utf-8"))
+    except (json.JSONDecodeError, OSError):
+        return {}
+
+
+def _update(name: str, fields: dict) -> None:
+    _update_many({name: fields})
+
+
+def _update_many(updates: dict[str, dict]) -> None:
+    with file_lock(LOCK_PATH):
+        index = load_index()
+        for name, fields in updates.items():
+            index.setdefault(name, {}).update(fields)
+        atomic_write_bytes(INDEX_PATH, json.dumps(index, indent=1, sort_keys=True).encode("utf-8"))
+
+
+def add(image_path: Path) -> str:
+    """Hash a visual and store it in the index. Returns the hash."""
+    digest = dhash(image_path)
+    _update(image_path.name, {"hash": digest, "zone": zone_of(image_path.name)})
+    return digest
+
+
+def record_verdict(image_name: str, result: dict) -> None:
+    """Remember the verdict an indexed image received, for reuse by duplicates."""
+    if result.get("verdict") in (None, "UNKNOWN"):
+        return
+    _update(image_name, {"result": {k: result[k] for k in VERDICT_FIELDS if k in result}})
+
+
+def find_duplicate(image_path: Path) -> tuple[str, dict, int] | None:
+    """Closest already-judged image of the same zone within MAX_DISTANCE.
+
+    Returns (name, result, distance), or None if reuse is disabled or there
+    is no near-duplicate.
+    """
+    if MAX_DISTANCE is None:
+        return None
+    index = load_index()
+    entry = index.get(image_path.name)
+    digest = entry["hash"] if entry and "hash" in entry else add(image_path)
+    zone = zone_of(image_path.name)
+
+    best = None
+    for name, other in index.items():
+        if name == image_path.name or "result" not in other or other.get("zone") != zone:
+            continue
+        d = distance(digest, other["hash"])
+        if d <= MAX_DISTANCE and (best is None or d < best[2]):
+            best = (name, other["result"], d)
+    return best
+
+
+def index_visuals() -> set[str]:
+    """Hash visuals in VISUALS_DIR that are not in the index yet. Returns the names present."""
+    present = {p.name for p in VISUALS_DIR.glob("*.jpg") if zone_of(p.name)}
+    index = load_index()
+    missing = sorted(name for name in present if "hash" not in index.get(name, {}))
+    if missing:
+        print(f"[*] Hashing {len(missing)} visuals for duplicate detection")
+        updates = {}
+        for name in missing:
+            try:
+                updates[name] = {"hash": dhash(VISUALS_DIR / name), "zone": zone_of(name)}
+            except OSError as e:  # unreadable or vanished since the listing
+                print(f"[WARN] Cannot hash {name}: {e}")
+        _update_many(updates)
+    return present
+
+
+def clusters(max_distance: int = DEFAULT_DISTANCE) -> dict[str, list[list[str]]]:
+    """Groups of near-identical visuals per zone (only groups of 2+).
+
+    Only visuals still in VISUALS_DIR count (rejected or deleted ones keep
+    their index entry, for verdict reuse, but are left out here).
+
+    Comparing every pair is quadratic in the number of visuals, so the
+    result is cached in generated/cache/phash_clusters.json and only
+    recomputed when the set of hashed images (or max_distance) changes -
+    recording verdicts does not invalidate it.
+    """
+    present = index_visuals()
+    index = {name: entry for name, entry in load_index().items() if name in present and "hash" in entry}
+    hashes = sorted((n, e["hash"]) for n, e in index.items())
+    key = hashlib.sha256(json.dumps([max_distance, hashes]).encode("utf-8")).hexdigest()
+    try:
+        cached = json.loads(CLUSTERS_PATH.read_text(encoding="utf-8"))
+        if cached.get("key") == key:
+            return cached["clusters"]
+    except (FileNotFoundError, json.JSONDecodeError, OSError):
+        pass
+
+    result = {}
+    for zone in ZONES:
+        names = sorted(n for n, e in index.items() if e.get("zone") == zone and "hash" in e)
+        parent = {n: n for n in names}
+
+        def find(n: str) -> str:
+            while parent[n] != n:
+                parent[n] = parent[parent[n]]
+                n = parent[n]
+            return n
+
+        for i, a in enumerate(names):
+            for b in names[i + 1:]:
+                if distance(index[a]["hash"], index[b]["hash"]) <= max_distance:
+                    parent[find(a)] = find(b)
+
+        groups = {}
+        for n in names:
+            groups.setdefault(find(n), []).append(n)
+        dupes = [g for g in groups.values() if len(g) > 1]
+        if dupes:
+            result[zone] = dupes
+    atomic_write_bytes(CLUSTERS_PATH, json.dumps({"key": key, "clusters": result}).encode("utf-8"))
+    return result
@@ -3,218 +3,841 @@ EVELIEN GARDEN - FULL PIPELINE
 ================================
 
 Orchestrates the complete flow:
-  1. Annotate space photos (if not already done)
-  2. Generate design for a zone
+  1. Annotate new or changed space photos
+  2. Generate design for one or more zones (run concurrently)
   3. Verify against space photos
   4. If rejected, retry with feedback adjustments (self-healing loop)
 
+Every run is checkpointed per zone after each generation and verdict in
+generated/feedback/pipeline_runs/<run id>.json: attempts, scores, verdicts
+and the accumulated feedback. --resume continues the latest unfinished run
+(or the given run id) from its last completed step - an image that was
+generated but not yet verified is verified rather than generated again.
+
+--budget N replaces --max-retries with one budget of N generations for the
+whole run: each attempt goes to the zone most likely to PASS next, and
+zones whose scores plateau are stopped early (see scheduler.py).
+
+--enqueue [N] queues N runs per zone (plus annotation of new photos) as
+jobs instead of running them here; worker.py drains the queue (see
+jobqueue.py).
+
 Usage:
     python scripts/pipeline.py --zone shade
     python scripts/pipeline.py --zone shade --max-retries 3
     python scripts/pipeline.py --zone full --skip-annotate
+    python scripts/pipeline.py --zone all --concurrency 5
+    python scripts/pipeline.py --zone all --budget 12
+    python scripts/pipeline.py --zone shade,seating
+    python scripts/pipeline.py --zone shade --candidates 3
+    python scripts/pipeline.py --zone shade --overlap
+    python scripts/pipeline.py --zone shade --gate
+    python scripts/pipeline.py --zone all --upload-refs
+    python scripts/pipeline.py --zone shade --judges 5
+    python scripts/pipeline.py --zone shade --seed 42
+    python scripts/pipeline.py --zone all --enqueue 20
+    python scripts/pipeline.py --resume
+    python scripts/pipeline.py --resume 20250614-201530
+    python scripts/pipeline.py --zone shade --trace --profile
 """
 
+from __future__ import annotations
+
 import argparse
+import json
 import sys
+import threading
 import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from datetime import datetime
 from pathlib import Path
+from typing import TYPE_CHECKING
 
 # Add scripts dir to path for imports
 sys.path.insert(0, str(Path(__file__).parent))
 
-from annotate import annotate_photo, load_image, SPACE_DIR, ANNOTATED_DIR
-from generate import generate, ZONES, VISUALS_DIR
-from verify import verify_image, handle_verdict
+if TYPE_CHECKING:
+    from google import genai
 
-import os
-from google import genai
+from core import get_client, load_env
+from fileio import atomic_write_bytes
+from generate import build_generation_context, generate, VISUALS_DIR
+import jobqueue
+import pregate
+import scheduler
+import tracing
+import uploads
+from verify import (
+    add_verify_arguments, apply_verify_arguments, build_verify_context, handle_verdict,
+    verify_arguments_given, verify_image,
+)
+from zones import ZONES
 
-PROJECT_ROOT = Path(__file__).parent.parent
-
-try:
-    from dotenv import load_dotenv
-    load_dotenv(PROJECT_ROOT / ".env", override=True)
-except ImportError:
-    pass
 
-API_KEY = os.getenv("GEMINI_API_KEY")
-if not API_KEY:
-    raise ValueError(
-        "GEMINI_API_KEY not set. Copy .env.example to .env and add your key."
-    )
+PROJECT_ROOT = Path(__file__).parent.parent
+RUNS_DIR = PROJECT_ROOT / "generated" / "feedback" / "pipeline_runs"
 
+# Settings a resumed run takes from its checkpoint rather than the command line
+RUN_SETTINGS = ["max_retries", "candidates", "overlap", "seed", "budget"]
 
-def has_annotated_photos() -> bool:
-    """Check if we already have annotated photos."""
-    if not ANNOTATED_DIR.exists():
-        return False
-    annotated = (
-        list(ANNOTATED_DIR.glob("*_annotated.jpg"))
-        + list(ANNOTATED_DIR.glob("*_notes.md"))
-    )
-    return len(annotated) > 0
+_run_lock = threading.Lock()
 
+load_env()
 
 def run_annotation(client: genai.Client) -> int:
-    """Annotate all space photos. Returns count of annotated."""
-    if not SPACE_DIR.exists():
+    """Annotate new or changed space photos. Returns count of annotated."""
+    from annotate import annotate_all, find_space_photos
+
+    photos = find_space_photos()
+    if not photos:
         print("[ERROR] No space photos in ref/space/")
         print("Add garden photos first, then run the pipeline.")
         return 0
 
-    photos = (
-        list(SPACE_DIR.glob("*.jpg"))
-        + list(SPACE_DIR.glob("*.jpeg"))
-        + list(SPACE_DIR.glob("*.png"))
-    )
+    return len(annotate_all(client, photos))
 
-    if not photos:
-        print("[ERROR] No photos found in ref/space/")
-        return 0
 
-    count = 0
-    for photo in sorted(photos):
-        result = annotate_photo(client, photo)
-        if result:
-            count += 1
+def parse_zones(value: str) -> list[str]:
+    """Parse --zone: a single zone, a comma-separated list, or "all"."""
+    if value == "all":
+        return list(ZONES)
+    zones = []
+    for zone in value.split(","):
+        zone = zone.strip()
+        if zone not in ZONES:
+            raise argparse.ArgumentTypeError(
+                f"unknown zone '{zone}' (choose from {', '.join(ZONES)}, or 'all')"
+            )
+        if zone not in zones:
+            zones.append(zone)
+    if not zones:
+        raise argparse.ArgumentTypeError("no zones given")
+    return zones
 
-    return count
 
+def build_feedback(verdict: dict) -> str:
+    """Turn a verification result into feedback for the next generation."""
+    feedback_parts = []
+    if verdict.get("prompt_adjustments"):
+        feedback_parts.extend(verdict["prompt_adjustments"])
+    if verdict.get("issues"):
+        feedback_parts.append("Issues to fix: " + "; ".join(verdict["issues"]))
+    if verdict.get("feedback") and not verdict.get("prompt_adjustments"):
+        feedback_parts.append(verdict["feedback"])
+    return "\n".join(feedback_parts) if feedback_parts else verdict.get("feedback", "")
 
-def main():
-    parser = argparse.ArgumentParser(description="Full garden design pipeline")
-    parser.add_argument(
-        "--zone",
-        required=True,
-        choices=ZONES,
-        help="Zone to generate",
-    )
-    parser.add_argument(
-        "--max-retries",
-        type=int,
-        default=3,
-        help="Max retries on verification failure (default: 3)",
-    )
-    parser.add_argument(
-        "--skip-annotate",
-        action="store_true",
-        help="Skip annotation step (if already done)",
-    )
-    parser.add_argument("--dry-run", action="store_true", help="Show what would be sent without calling API")
-    args = parser.parse_args()
 
-    client = genai.Client(api_key=API_KEY)
+# Verdicts settled without a judge call; their totals are not the judge's
+LOCAL_MODELS = ("local-gate", "phash-duplicate")
 
-    # Step 1: Annotate (if needed)
-    if not args.skip_annotate and not has_annotated_photos():
-        print("\n" + "=" * 60)
-        print("  STEP 1: ANNOTATING SPACE PHOTOS")
-        print("=" * 60)
-        count = run_annotation(client)
-        if count == 0:
-            print("\n[WARN] No photos annotated. Continuing with raw photos...")
-    elif has_annotated_photos():
-        print("[OK] Annotated photos already exist, skipping annotation")
-    else:
-        print("[OK] Skipping annotation (--skip-annotate)")
 
-    # Step 2 + 3: Generate + Verify loop with feedback passthrough
-    attempts = []  # [(path, score, verdict), ...]
-    feedback = ""
+def is_judged(verdict: dict) -> bool:
+    return verdict.get("model") not in LOCAL_MODELS and not verdict.get("local")
 
-    for attempt in range(1, args.max_retries + 1):
+
+def judged_scores(attempts: list[tuple[Path, int, str, bool]]) -> list[int]:
+    """Scores of the attempts a judge scored, oldest first - a zone's trajectory."""
+    return [score for _, score, _, judged in attempts if judged]
+
+
+def has_converged(zone: str, attempts: list[tuple[Path, int, str, bool]]) -> bool:
+    """True once the judged score has failed to improve for 2 consecutive attempts."""
+    scores = judged_scores(attempts)
+    if len(scores) < 3:
+        return False
+    prev_prev_score, prev_score, score = scores[-3:]
+    if score <= prev_score <= prev_prev_score:
+        print(f"\n[CONVERGED] {zone}: score not improving: {prev_prev_score} -> {prev_score} -> {score}")
+        print(f"Stopping early.")
+        return True
+    return False
+
+
+def new_run(zones: list[str], settings: dict, run_id: str | None = None) -> dict:
+    """A fresh run checkpoint (not yet written)."""
+    if run_id is None:
+        run_id = stamp = datetime.now().strftime("%Y%m%d-%H%M%S")
+        n = 1
+        while (RUNS_DIR / f"{run_id}.json").exists():
+            n += 1
+            run_id = f"{stamp}-{n}"
+    return {
+        "run_id": run_id,
+        "created": datetime.now().isoformat(),
+        "zones": zones,
+        "settings": settings,
+        "state": {},
+        "finished": False,
+    }
+
+
+def load_run(run_id: str | None = None) -> dict | None:
+    """A run checkpoint by id, or the most recent unfinished one."""
+    if run_id:
+        path = RUNS_DIR / f"{run_id}.json"
+        return json.loads(path.read_text(encoding="utf-8")) if path.exists() else None
+    for path in sorted(RUNS_DIR.glob("*.json"), key=lambda p: p.stat().st_mtime, reverse=True):
+        try:
+            run = json.loads(path.read_text(encoding="utf-8"))
+        except (json.JSONDecodeError, OSError):
+            continue
+        if not run.get("finished"):
+            return run
+    return None
+
+
+def save_run(run: dict) -> None:
+    data = json.dumps(run, indent=2, sort_keys=True)
+    atomic_write_bytes(RUNS_DIR / f"{run['run_id']}.json", data.encode("utf-8"))
+
+
+def checkpoint(run: dict | None, zone: str, **fields) -> None:
+    """Update a zone's checkpoint and write the run. No-op without a run."""
+    if run is None:
+        return
+    with _run_lock:
+        state = run["state"].setdefault(zone, {"rounds": 0, "attempts": [], "feedback": "", "pending": [], "status": None})
+        state.update(fields)
+        run["finished"] = all(run["state"].get(z, {}).get("status") for z in run["zones"])
+        save_run(run)
+
+
+def restore_zone(run: dict | None, zone: str) -> tuple[int, list[tuple[Path, int, str, bool]], str, list[Path]]:
+    """(rounds done, attempts, feedback, generated-but-unverified images) from a checkpoint."""
+    state = (run or {}).get("state", {}).get(zone)
+    if not state:
+        return 0, [], "", []
+    attempts = [(VISUALS_DIR / a["image"], a["score"], a["verdict"], a.get("judged", True)) for a in state["attempts"]]
+    pending = [VISUALS_DIR / name for name in state["pending"] if (VISUALS_DIR / name).exists()]
+    return state["rounds"], attempts, state["feedback"], pending
+
+
+def attempt_records(attempts: list[tuple[Path, int, str, bool]]) -> list[dict]:
+    return [
+        {"image": p.name, "score": score, "verdict": verdict, "judged": judged}
+        for p, score, verdict, judged in attempts
+    ]
+
+
+def verify_and_handle(client: genai.Client, result_path: Path, ctx: dict) -> tuple[Path, dict, str]:
+    verdict = verify_image(client, result_path, shared=ctx["verify"])
+    final_verdict = handle_verdict(result_path, verdict)
+    return result_path, verdict, final_verdict
+
+
+def generate_and_verify(client: genai.Client, zone: str, feedback: str, ctx: dict, on_generated=None) -> tuple[Path, dict, str] | None:
+    """One candidate: generate, verify, handle the verdict.
+
+    on_generated(path) is called between the two steps (for checkpointing).
+    """
+    result_path = generate(client, zone, feedback=feedback, context=ctx["generate"])
+    if not result_path:
+        return None
+    if on_generated:
+        on_generated(result_path)
+    return verify_and_handle(client, result_path, ctx)
+
+
+def run_round(
+    client: genai.Client,
+    zone: str,
+    feedback: str,
+    ctx: dict,
+    candidates: int = 1,
+    on_generated=None,
+    generated: list[Path] | None = None,
+) -> list[tuple[Path, dict, str]]:
+    """Generate and verify `candidates` variations concurrently.
+
+    Images in `generated` (from an interrupted round) are verified in place
+    of that many new generations.
+
+    Returns [(path, verdict, final_verdict), ...] for the candidates that
+    produced an image.
+    """
+    generated = list(generated or [])[:max(1, candidates)]
+    fresh = max(1, candidates) - len(generated)
+    if len(generated) + fresh <= 1:
+        if generated:
+            return [verify_and_handle(client, generated[0], ctx)]
+        result = generate_and_verify(client, zone, feedback, ctx, on_generated)
+        return [result] if result else []
+
+    print(f"  [*] Drawing {candidates} candidates concurrently")
+    with ThreadPoolExecutor(max_workers=candidates) as pool:
+        futures = [pool.submit(verify_and_handle, client, path, ctx) for path in generated]
+        futures += [pool.submit(generate_and_verify, client, zone, feedback, ctx, on_generated) for _ in range(fresh)]
+        results = [future.result() for future in futures]
+    return [r for r in results if r]
+
+
+def best_of_round(results: list[tuple[Path, dict, str]]) -> tuple[Path, dict, str]:
+    """The round's candidate carried forward: a PASS, else the highest score."""
+    best = max(results, key=lambda r: (r[2] == "PASS", r[1].get("total", 0)))
+    if len(results) > 1:
+        scores = ", ".join(f"{p.name}={v.get('total', 0)}" for p, v, _ in results)
+        print(f"\n  [BEST] {best[0].name} ({best[1].get('total', 0)}/50) from {scores}")
+    return best
+
+
+def print_pass(zone: str, result_path: Path, score: int) -> None:
+    print(f"\n{'='*60}")
+    print(f"  PIPELINE COMPLETE - {zone}")
+    print(f"  Result: {result_path.name}")
+    print(f"  Score: {score}/50")
+    print(f"{'='*60}")
+
+
+def run_zone_overlapped(client: genai.Client, zone: str, max_retries: int, ctx: dict, run: dict | None = None) -> dict:
+    """Streaming variant of run_zone: generate attempt k+1 while verifying k.
+
+    Each generation uses the feedback from the most recent verdict that had
+    finished when it started. Once a PASS lands, a generation still in
+    flight is cancelled: its result is discarded without being saved.
+
+    Every finished generation is checkpointed before it is verified, and
+    images a resumed run left unverified are verified before new ones.
+    """
+    rounds, attempts, feedback, to_verify = restore_zone(run, zone)
+    summary = {"zone": zone, "attempts": attempts, "status": "FAILED"}
+    if (rounds >= max_retries and not to_verify) or has_converged(zone, attempts):
+        return finish_zone(run, summary)
+
+    pending = [p.name for p in to_verify]
+    started = rounds + len(to_verify)  # generations made so far
+    pool = ThreadPoolExecutor(max_workers=1)
+    cancelled = threading.Event()
+    print(f"\n  [*] {zone}: overlapping generation and verification")
+    gen_future = None
+    if started < max_retries:
+        started += 1
+        print(f"\n  --- GENERATE {started}/{max_retries} - {zone} (overlapped) ---")
+        gen_future = pool.submit(generate, client, zone, feedback, False, ctx["generate"], cancelled)
+    try:
+        while to_verify or gen_future is not None:
+            if not to_verify:
+                result_path = gen_future.result()
+                gen_future = None
+                if result_path:
+                    pending.append(result_path.name)
+                    checkpoint(run, zone, pending=list(pending))
+                    to_verify.append(result_path)
+                else:
+                    print(f"[ERROR] Generation failed ({zone})")
+                    rounds += 1
+                    checkpoint(run, zone, rounds=rounds)
+
+                # Start the next generation right away with the latest feedback
+                if started < max_retries:
+                    started += 1
+                    print(f"\n  --- GENERATE {started}/{max_retries} - {zone} (overlapped) ---")
+                    gen_future = pool.submit(generate, client, zone, feedback, False, ctx["generate"], cancelled)
+                continue
+
+            result_path, verdict, final_verdict = verify_and_handle(client, to_verify.pop(0), ctx)
+            pending.remove(result_path.name)
+            score = verdict.get("total", 0)
+            attempts.append((result_path, score, final_verdict, is_judged(verdict)))
+            rounds += 1
+
+            if final_verdict == "PASS":
+                if gen_future is not None:
+                    print(f"  [DROP] {zone}: cancelling the in-flight generation after PASS")
+                print_pass(zone, result_path, score)
+                summary["status"] = "PASS"
+                return finish_zone(run, summary, rounds)
+
+            feedback = build_feedback(verdict)
+            checkpoint(run, zone, rounds=rounds, attempts=attempt_records(attempts), feedback=feedback, pending=list(pending))
+            print(f"\n[{final_verdict}] {zone}: {result_path.name} scored {score}/50")
+
+            if has_converged(zone, attempts):
+                break
+    finally:
+        cancelled.set()
+        pool.shutdown(wait=False, cancel_futures=True)
+
+    return finish_zone(run, summary, rounds)
+
+
+def finish_zone(run: dict | None, summary: dict, rounds: int | None = None) -> dict:
+    """Settle a zone's status from its best attempt and close its checkpoint."""
+    attempts = summary["attempts"]
+    if attempts and summary["status"] != "PASS":
+        summary["status"] = max(attempts, key=lambda x: x[1])[2]
+    fields = {"attempts": attempt_records(attempts), "pending": [], "status": summary["status"]}
+    if rounds is not None:
+        fields["rounds"] = rounds
+    checkpoint(run, summary["zone"], **fields)
+    return summary
+
+
+@tracing.traced("zone", "zone")
+def run_zone(
+    client: genai.Client,
+    zone: str,
+    max_retries: int,
+    dry_run: bool = False,
+    candidates: int = 1,
+    overlap: bool = False,
+    seed: int | None = None,
+    run: dict | None = None,
+) -> dict:
+    """Run the generate -> verify -> retry loop for one zone.
+
+    With candidates > 1 each attempt draws several variations concurrently
+    and carries the best-scoring one (and its feedback) into the next round.
+
+    With overlap, hands off to run_zone_overlapped().
+
+    References and prompt are chosen and encoded once for the zone (seeded
+    by seed), and every verification judges against the same space photos,
+    so attempts only differ in their feedback.
+
+    With a run checkpoint (see load_run), progress is saved after every
+    generation and verdict, and a zone that already has rounds in the
+    checkpoint continues after them with the same attempts and feedback.
+
+    Returns a summary dict: zone, attempts [(path, score, verdict), ...] with
+    the best candidate of each round, status.
+    """
+    rounds, attempts, feedback, pending = restore_zone(run, zone)
+    summary = {"zone": zone, "attempts": attempts, "status": "FAILED"}
+    state = (run or {}).get("state", {}).get(zone) or {}
+    if state.get("status"):
+        print(f"\n[RESUME] {zone}: already finished ({state['status']})")
+        summary["status"] = state["status"]
+        return summary
+    if rounds or pending:
+        print(f"\n[RESUME] {zone}: {rounds} rounds done, best {max((a[1] for a in attempts), default=0)}/50"
+              + (f", verifying {len(pending)} unverified images" if pending else ""))
+
+    generation_context = build_generation_context(None if dry_run else client, zone, seed=seed)
+    if generation_context is None:
+        return summary
+    ctx = {"generate": generation_context, "verify": None if dry_run else build_verify_context(client, generation_context)}
+
+    if overlap and not dry_run:
+        return run_zone_overlapped(client, zone, max_retries, ctx, run)
+
+    if has_converged(zone, attempts):
+        return finish_zone(run, summary)
+
+    def on_generated(path: Path) -> None:
+        with _run_lock:
+            generated.append(path.name)
+        checkpoint(run, zone, pending=list(generated))
+
+    for attempt in range(rounds + 1, max_retries + 1):
         print(f"\n{'='*60}")
-        print(f"  ATTEMPT {attempt}/{args.max_retries} - {args.zone}")
+        print(f"  ATTEMPT {attempt}/{max_retries} - {zone}")
         print(f"{'='*60}")
 
         if feedback:
             print(f"  [FEEDBACK] Injecting corrections from previous attempt")
 
-        # Generate
-        print(f"\n  --- GENERATE ---")
-        result_path = generate(client, args.zone, feedback=feedback, dry_run=args.dry_run)
-
-        if args.dry_run:
-            print("\n[DRY RUN] Pipeline would continue with verify step")
-            return
-
-        if not result_path:
-            print(f"[ERROR] Generation failed on attempt {attempt}")
-            if attempt < args.max_retries:
-                time.sleep(2)
+        if dry_run:
+            print(f"\n  --- GENERATE ---")
+            generate(client, zone, feedback=feedback, dry_run=True, context=ctx["generate"])
+            print(f"\n[DRY RUN] Pipeline would continue with verify step ({zone})")
+            summary["status"] = "DRY RUN"
+            return summary
+
+        # Generate + Verify
+        print(f"\n  --- GENERATE + VERIFY ---")
+        generated = [p.name for p in pending]
+        results = run_round(client, zone, feedback, ctx, candidates, on_generated, pending)
+        pending = []
+
+        if not results:
+            checkpoint(run, zone, rounds=attempt, pending=[])
+            print(f"[ERROR] Generation failed on attempt {attempt} ({zone})")
+            if attempt < max_retries:
                 continue
             else:
                 print("Max retries reached. Check your prompts and references.")
                 break
 
-        # Verify
-        print(f"\n  --- VERIFY ---")
-        verdict = verify_image(client, result_path)
-        final_verdict = handle_verdict(result_path, verdict)
+        result_path, verdict, final_verdict = best_of_round(results)
         score = verdict.get("total", 0)
-        attempts.append((result_path, score, final_verdict))
+        attempts.append((result_path, score, final_verdict, is_judged(verdict)))
 
         if final_verdict == "PASS":
-            print(f"\n{'='*60}")
-            print(f"  PIPELINE COMPLETE - {args.zone}")
-            print(f"  Result: {result_path.name}")
-            print(f"  Score: {score}/50")
-            print(f"{'='*60}")
-            return
+            print_pass(zone, result_path, score)
+            summary["status"] = "PASS"
+            return finish_zone(run, summary, attempt)
 
         # Build feedback for next attempt from verification
-        feedback_parts = []
-        if verdict.get("prompt_adjustments"):
-            feedback_parts.extend(verdict["prompt_adjustments"])
-        if verdict.get("issues"):
-            feedback_parts.append("Issues to fix: " + "; ".join(verdict["issues"]))
-        if verdict.get("feedback") and not verdict.get("prompt_adjustments"):
-            feedback_parts.append(verdict["feedback"])
-        feedback = "\n".join(feedback_parts) if feedback_parts else verdict.get("feedback", "")
+        feedback = build_feedback(verdict)
+        checkpoint(run, zone, rounds=attempt, attempts=attempt_records(attempts), feedback=feedback, pending=[])
 
         # Convergence detection: if score hasn't improved for 2 consecutive attempts
-        if len(attempts) >= 2:
-            prev_score = attempts[-2][1]
-            if score <= prev_score:
-                # Check if 2 consecutive non-improvements
-                if len(attempts) >= 3:
-                    prev_prev_score = attempts[-3][1]
-                    if prev_score <= prev_prev_score:
-                        print(f"\n[CONVERGED] Score not improving: {prev_prev_score} -> {prev_score} -> {score}")
-                        print(f"Stopping early.")
-                        break
+        if has_converged(zone, attempts):
+            break
 
         if final_verdict == "MARGINAL":
             print(f"\n[WARN] Marginal result ({score}/50)")
-            if attempt < args.max_retries:
+            if attempt < max_retries:
                 print(f"Trying for better with feedback injection...")
-                time.sleep(2)
                 continue
             # Last attempt - will fall through to summary
 
         if final_verdict == "REJECT":
             print(f"\n[REJECT] Score {score}/50")
-            if attempt < args.max_retries:
+            if attempt < max_retries:
                 print(f"Retrying with feedback...")
-                time.sleep(2)
             else:
-                print(f"\nAll {args.max_retries} attempts exhausted.")
+                print(f"\nAll {max_retries} attempts exhausted.")
+
+    return finish_zone(run, summary)
+
+
+@tracing.traced("budget")
+def run_budget(
+    client: genai.Client,
+    zones: list[str],
+    budget: int,
+    concurrency: int,
+    candidates: int = 1,
+    seed: int | None = None,
+    run: dict | None = None,
+) -> list[dict]:
+    """Spend `budget` generations across zones, most promising zone first.
+
+    Each free slot (up to `concurrency`, one attempt in flight per zone) goes
+    to the zone scheduler.pick() rates most likely to PASS next; zones that
+    pass or that scheduler.retire_reason() gives up on stop taking attempts.
+    An attempt that returns no image still counts as one for the zone.
+    Generations already made in a resumed run count against the budget, and
+    the last attempt draws fewer candidates if that is all the budget has left.
+
+    Returns a summary dict per zone, as run_zone() does.
+    """
+    candidates = max(1, candidates)
+    summaries, active = {}, {}
+    spent = 0
+    for zone in zones:
+        rounds, attempts, feedback, pending = restore_zone(run, zone)
+        summaries[zone] = {"zone": zone, "attempts": attempts, "status": "FAILED"}
+        spent += rounds * candidates
+        state = (run or {}).get("state", {}).get(zone) or {}
+        if state.get("status"):
+            print(f"\n[RESUME] {zone}: already finished ({state['status']})")
+            summaries[zone]["status"] = state["status"]
+            continue
+        generation_context = build_generation_context(client, zone, seed=seed)
+        if generation_context is None:
+            continue
+        active[zone] = {
+            "rounds": rounds, "feedback": feedback, "pending": pending,
+            "ctx": {"generate": generation_context, "verify": build_verify_context(client, generation_context)},
+        }
+    if spent:
+        print(f"\n[RESUME] {spent}/{budget} generations already spent")
+
+    def on_generated_for(zone: str, generated: list[str]):
+        def on_generated(path: Path) -> None:
+            with _run_lock:
+                generated.append(path.name)
+            checkpoint(run, zone, pending=list(generated))
+        return on_generated
+
+    in_flight = {}  # future -> zone
+    with ThreadPoolExecutor(max_workers=max(1, concurrency)) as pool:
+        while True:
+            while len(in_flight) < concurrency and spent < budget:
+                idle = [z for z in active if z not in in_flight.values()]
+                picked = scheduler.pick(
+                    {z: judged_scores(summaries[z]["attempts"]) for z in idle},
+                    {z: active[z]["rounds"] for z in idle},
+                )
+                if picked is None:
+                    break
+                zone, chance = picked
+                state = active[zone]
+                state["rounds"] += 1
+                drawn = min(candidates, budget - spent)
+                spent += drawn
+                print(f"\n  [BUDGET] {spent}/{budget} - {zone} attempt {state['rounds']} (pass chance {chance:.0%})")
+                if state["feedback"]:
+                    print(f"  [FEEDBACK] Injecting corrections from previous attempt")
+                generated = [p.name for p in state["pending"]]
+                future = pool.submit(
+                    run_round, client, zone, state["feedback"], state["ctx"], drawn,
+                    on_generated_for(zone, generated), state["pending"],
+                )
+                state["pending"] = []
+                in_flight[future] = zone
+            if not in_flight:
+                break
 
-    # Summary: report best version
-    if attempts:
-        best = max(attempts, key=lambda x: x[1])
-        best_path, best_score, best_verdict = best
-        print(f"\n{'='*60}")
-        print(f"  PIPELINE SUMMARY - {args.zone}")
-        print(f"  Attempts: {len(attempts)}")
-        for i, (p, s, v) in enumerate(attempts, 1):
-            marker = " <-- BEST" if (p, s, v) == best else ""
-            name = p.name if p.exists() else f"{p.name} (moved to rejected)"
-            print(f"    #{i}: {name} - {s}/50 [{v}]{marker}")
-        print(f"  Best: {best_path.name} ({best_score}/50)")
-        print(f"{'='*60}")
+            done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in done:
+                zone = in_flight.pop(future)
+                state, summary = active[zone], summaries[zone]
+                results = future.result()
+                if not results:
+                    checkpoint(run, zone, rounds=state["rounds"], pending=[])
+                    print(f"[ERROR] Generation failed on attempt {state['rounds']} ({zone})")
+                    reason = scheduler.retire_reason(
+                        judged_scores(summary["attempts"]), state["rounds"] - len(judged_scores(summary["attempts"])),
+                    )
+                    if reason:
+                        print(f"\n[RETIRED] {zone}: {reason}")
+                        finish_zone(run, summary)
+                        del active[zone]
+                    continue
+
+                result_path, verdict, final_verdict = best_of_round(results)
+                score = verdict.get("total", 0)
+                summary["attempts"].append((result_path, score, final_verdict, is_judged(verdict)))
+                if final_verdict == "PASS":
+                    print_pass(zone, result_path, score)
+                    summary["status"] = "PASS"
+                    finish_zone(run, summary, state["rounds"])
+                    del active[zone]
+                    continue
+
+                state["feedback"] = build_feedback(verdict)
+                checkpoint(
+                    run, zone, rounds=state["rounds"], attempts=attempt_records(summary["attempts"]),
+                    feedback=state["feedback"], pending=[],
+                )
+                print(f"\n[{final_verdict}] {zone}: {result_path.name} scored {score}/50")
+                reason = scheduler.retire_reason(
+                    judged_scores(summary["attempts"]), state["rounds"] - len(judged_scores(summary["attempts"])),
+                )
+                if reason:
+                    print(f"\n[RETIRED] {zone}: {reason}")
+                    finish_zone(run, summary)
+                    del active[zone]
+
+    # Budget spent: the zones still in the running keep their best attempt
+    for zone in active:
+        finish_zone(run, summaries[zone])
+    passes = sum(s["status"] == "PASS" for s in summaries.values())
+    per_pass = f", {spent / passes:.1f} per PASS" if passes else ""
+    print(f"\n[BUDGET] {spent}/{budget} generations spent, {passes}/{len(zones)} zones passed{per_pass}")
+    return [summaries[zone] for zone in zones]
+
+
+def print_zone_summary(summary: dict) -> None:
+    """Report every attempt for a zone and mark the best version."""
+    zone, attempts = summary["zone"], summary["attempts"]
+    if not attempts:
+        if summary["status"] != "DRY RUN":
+            print(f"\n[ERROR] {zone}: no successful generations. Check prompts and references.")
+        return
+
+    best = max(attempts, key=lambda x: x[1])
+    best_path, best_score, _, _ = best
+    print(f"\n{'='*60}")
+    print(f"  PIPELINE SUMMARY - {zone}")
+    print(f"  Attempts: {len(attempts)}")
+    for i, attempt in enumerate(attempts, 1):
+        p, s, v, judged = attempt
+        marker = " <-- BEST" if attempt == best else ""
+        name = p.name if p.exists() else f"{p.name} (moved to rejected)"
+        local = "" if judged else " (local)"
+        print(f"    #{i}: {name} - {s}/50 [{v}]{local}{marker}")
+    print(f"  Best: {best_path.name} ({best_score}/50)")
+    print(f"{'='*60}")
+
+
+def print_combined_summary(summaries: list[dict], elapsed: float) -> None:
+    """One table across all zones of a multi-zone run."""
+    print(f"\n{'='*60}")
+    print(f"  ALL ZONES - {elapsed:.0f}s wall-clock")
+    print(f"{'='*60}")
+    print(f"  {'Zone':<12} {'Attempts':>8} {'Best':>8}  {'Status':<10} Result")
+    print(f"  {'-'*12} {'-'*8} {'-'*8}  {'-'*10} {'-'*16}")
+    for summary in summaries:
+        attempts = summary["attempts"]
+        if attempts:
+            best_path, best_score, _, _ = max(attempts, key=lambda x: x[1])
+            best_str, result = f"{best_score}/50", best_path.name
+        else:
+            best_str, result = "-", "-"
+        print(f"  {summary['zone']:<12} {len(attempts):>8} {best_str:>8}  {summary['status']:<10} {result}")
+    print(f"{'='*60}")
+
+
+def enqueue_zones(zones: list[str], runs: int, args: argparse.Namespace) -> int:
+    """Queue `runs` pipeline runs per zone for worker.py. Returns jobs added.
+
+    Each job gets its own run id, so a job retried after a worker died
+    resumes from its checkpoint.
+    """
+    stamp = datetime.now().strftime("%Y%m%d-%H%M%S")
+    added = 0
+    for i in range(runs):
+        for zone in zones:
+            jobqueue.enqueue("zone", {
+                "run_id": f"queued-{stamp}-{i + 1:03d}-{zone}",
+                "zone": zone,
+                "max_retries": args.max_retries,
+                "candidates": args.candidates,
+                "overlap": args.overlap,
+                "seed": args.seed,
+            })
+            added += 1
+    return added
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Full garden design pipeline")
+    parser.add_argument(
+        "--zone",
+        type=parse_zones,
+        help=f"Zone to generate: one of {', '.join(ZONES)}, a comma list, or 'all'",
+    )
+    parser.add_argument(
+        "--max-retries",
+        type=int,
+        default=3,
+        help="Max retries on verification failure (default: 3)",
+    )
+    parser.add_argument(
+        "--budget",
+        type=int,
+        metavar="N",
+        help="Spend N generations across all zones, most promising zone first, instead of --max-retries per zone",
+    )
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        default=3,
+        help="Max zones run at the same time when several are given (default: 3)",
+    )
+    parser.add_argument(
+        "--candidates",
+        type=int,
+        default=1,
+        help="Variations generated and verified concurrently per attempt; the best is kept (default: 1)",
+    )
+    parser.add_argument(
+        "--overlap",
+        action="store_true",
+        help="Generate the next attempt while the current one is being verified",
+    )
+    parser.add_argument(
+        "--skip-annotate",
+        action="store_true",
+        help="Skip annotation step (if already done)",
+    )
+    add_verify_arguments(parser)
+    parser.add_argument("--seed", type=int, help="Seed for each zone's reference sample, so runs are comparable")
+    parser.add_argument("--dry-run", action="store_true", help="Show what would be sent without calling API")
+    parser.add_argument(
+        "--enqueue",
+        type=int,
+        nargs="?",
+        const=1,
+        metavar="RUNS",
+        help="Queue RUNS pipeline runs per zone for worker.py instead of running now (default: 1)",
+    )
+    parser.add_argument(
+        "--resume",
+        nargs="?",
+        const="",
+        metavar="RUN_ID",
+        help="Continue the latest unfinished run (or RUN_ID) from its checkpoint",
+    )
+    tracing.add_arguments(parser)
+    args = parser.parse_args()
+    tracing.apply(args)
+
+    run = None
+    if args.resume is not None:
+        run = load_run(args.resume or None)
+        if run is None:
+            print(f"[ERROR] No {'run ' + args.resume if args.resume else 'unfinished run'} in {RUNS_DIR}")
+            return
+        args.zone = run["zones"]
+        for name in RUN_SETTINGS:
+            setattr(args, name, run["settings"].get(name))
+        done = [z for z in run["zones"] if run["state"].get(z, {}).get("status")]
+        print(f"[RESUME] Run {run['run_id']}: {', '.join(run['zones'])} ({len(done)} finished)")
+    elif not args.zone:
+        parser.error("--zone is required (or --resume)")
+    if args.overlap and args.candidates > 1:
+        parser.error("--overlap and --candidates are mutually exclusive")
+    if args.budget is not None and (args.overlap or args.enqueue or args.dry_run):
+        parser.error("--budget cannot be combined with --overlap, --enqueue or --dry-run")
+
+    # Annotation is only needed by the runs that do it, not by --help
+    from annotate import enqueue_photos, find_space_photos, load_manifest, pending_photos
+
+    if args.enqueue:
+        if verify_arguments_given(args):
+            print(f"[WARN] {', '.join(verify_arguments_given(args))}: worker settings, ignored here - pass them to worker.py")
+        photos = 0 if args.skip_annotate else enqueue_photos(find_space_photos())
+        runs = enqueue_zones(args.zone, args.enqueue, args)
+        print(f"[OK] Queued {runs} zone runs and {photos} annotate jobs - run: python scripts/worker.py")
+        return
+
+    client = None if args.dry_run else get_client()  # --dry-run needs no API key
+    apply_verify_arguments(args)
+
+    # Step 1: Annotate new or changed photos - once, shared by every zone
+    if args.skip_annotate:
+        print("[OK] Skipping annotation (--skip-annotate)")
+    elif args.dry_run:
+        print("[DRY RUN] Skipping annotation")
+    elif not pending_photos(find_space_photos(), load_manifest()):
+        print("[OK] Annotations up to date, skipping annotation")
+    else:
+        print("\n" + "=" * 60)
+        print("  STEP 1: ANNOTATING SPACE PHOTOS")
+        print("=" * 60)
+        count = run_annotation(client)
+        if count == 0:
+            print("\n[WARN] No photos annotated. Continuing with raw photos...")
+
+    # Step 2 + 3: Generate + Verify loop with feedback passthrough, per zone.
+    # Each zone is judged against the space photos it was generated from.
+    zones = args.zone
+    if run is None and not args.dry_run:
+        run = new_run(zones, {name: getattr(args, name) for name in RUN_SETTINGS})
+        save_run(run)
+        print(f"\n[*] Run {run['run_id']} (continue after an interruption with --resume {run['run_id']})")
+    start = time.monotonic()
+    if args.budget is not None:
+        print(f"\n[*] Spending a budget of {args.budget} generations across {', '.join(zones)}")
+        summaries = run_budget(
+            client, zones, args.budget, args.concurrency,
+            candidates=args.candidates, seed=args.seed, run=run,
+        )
+    elif len(zones) == 1:
+        summaries = [
+            run_zone(
+                client, zones[0], args.max_retries,
+                dry_run=args.dry_run, candidates=args.candidates, overlap=args.overlap,
+                seed=args.seed, run=run,
+            )
+        ]
     else:
-        print("\n[ERROR] No successful generations. Check prompts and references.")
+        workers = max(1, min(args.concurrency, len(zones)))
+        print(f"\n[*] Running {len(zones)} zones ({', '.join(zones)}) with concurrency {workers}")
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            futures = [
+                pool.submit(
+                    run_zone, client, zone, args.max_retries,
+                    args.dry_run, args.candidates, args.overlap,
+                    args.seed, run,
+                )
+                for zone in zones
+            ]
+            summaries = [future.result() for future in futures]
+
+    for summary in summaries:
+        print_zone_summary(summary)
+    if len(summaries) > 1:
+        print_combined_summary(summaries, time.monotonic() - start)
+    if pregate.THRESHOLD is not None:
+        print(f"\n  {pregate.report()}")
+    if uploads.ENABLED:
+        print(f"  {uploads.report()}")
 
 
 if __name__ == "__main__":
@@ -0,0 +1,165 @@
+"""
+EVELIEN GARDEN - LOCAL PRE-VERIFICATION GATE
+==============================================
+
+Cheap NumPy scoring of a generated image against the space photos, run
+before paying for a verify call. Obviously wrong images - blank frames,
+text/diagram artefacts, or a completely different viewpoint and palette -
+are rejected locally with a synthetic verdict; everything else still goes
+to the model. The synthetic verdict's total is the similarity scaled to 50,
+not a judge score, so it carries "local": True and consumers of totals (run
+database best scores, the budget scheduler) leave it out.
+
+The similarity score (0-1) combines:
+- edge-map correlation with the closest space photo (viewpoint/structure)
+- colour histogram intersection with the closest space photo (palette)
+
+NumPy is optional; without it the gate stays disabled.
+
+Enable with --gate [THRESHOLD] on verify.py or pipeline.py.
+"""
+
+import threading
+from pathlib import Path
+
+from images import open_image
+from fileio import file_hash
+
+# NumPy is imported by enable(), so scripts without --gate never load it
+np = None
+
+DEFAULT_THRESHOLD = 0.3
+SIZE = (96, 72)  # compare at this resolution, aspect ratio ignored
+HIST_BINS = 8
+
+# Set by enable(); None means the gate is off
+THRESHOLD: float | None = None
+
+stats = {"checked": 0, "rejected": 0}
+_lock = threading.Lock()
+_ref_features: dict[str, tuple] = {}
+
+
+def enable(threshold: float = DEFAULT_THRESHOLD) -> bool:
+    """Turn the gate on. Returns False (and stays off) if NumPy is missing."""
+    global THRESHOLD, np
+    try:
+        import numpy
+    except ImportError:
+        print("[WARN] numpy not installed - local pre-verification gate disabled")
+        return False
+    np = numpy
+    THRESHOLD = threshold
+    return True
+
+
+def features(path: Path) -> tuple:
+    """(grey, edges, histogram) of an image, downscaled."""
+    from PIL import Image
+
+    with open_image(path) as img:
+        img.draft("RGB", (SIZE[0] * 2, SIZE[1] * 2))
+        rgb = np.asarray(img.convert("RGB").resize(SIZE, Image.Resampling.BILINEAR), dtype=np.float32)
+    grey = rgb @ np.array([0.299, 0.587, 0.114], dtype=np.float32)
+
+    gx = np.zeros_like(grey)
+    gy = np.zeros_like(grey)
+    gx[:, 1:-1] = grey[:, 2:] - grey[:, :-2]
+    gy[1:-1, :] = grey[2:, :] - grey[:-2, :]
+    edges = np.hypot(gx, gy)
+
+    bins = (rgb // (256 // HIST_BINS)).astype(np.int32)
+    index = bins[..., 0] * HIST_BINS * HIST_BINS + bins[..., 1] * HIST_BINS + bins[..., 2]
+    hist = np.bincount(index.ravel(), minlength=HIST_BINS ** 3).astype(np.float32)
+    hist /= hist.sum()
+    return grey, edges, hist
+
+
+def reference_features(path: Path) -> tuple:
+    key = file_hash(path)
+    with _lock:
+        cached = _ref_features.get(key)
+    if cached is None:
+        cached = features(path)
+        with _lock:
+            _ref_features[key] = cached
+    return cached
+
+
+def edge_similarity(a, b) -> float:
+    """Pearson correlation of two edge maps, mapped to 0-1."""
+    a = a - a.mean()
+    b = b - b.mean()
+    denom = float(np.sqrt((a * a).sum() * (b * b).sum()))
+    if denom == 0:
+        return 0.0
+    return max(0.0, float((a * b).sum()) / denom)
+
+
+def score_image(image_path: Path, space_photos: list[Path]) -> tuple[float, list[str], list[str]]:
+    """Similarity 0-1 plus (issues, prompt_adjustments) explaining a low score."""
+    grey, edges, hist = features(image_path)
+
+    if grey.std() < 4:
+        return 0.0, ["Image is blank or a flat colour"], ["Return a complete rendered garden image"]
+
+    near_white = float((grey > 235).mean())
+    if near_white > 0.6:
+        return 0.0, ["Image looks like text or a diagram, not a rendered scene"], [
+            "Render a photographic view of the garden, not text, labels or a diagram"
+        ]
+
+    best_edge = best_hist = 0.0
+    for photo in space_photos:
+        _, ref_edges, ref_hist = reference_features(photo)
+        best_edge = max(best_edge, edge_similarity(edges, ref_edges))
+        best_hist = max(best_hist, float(np.minimum(hist, ref_hist).sum()))
+
+    score = 0.5 * best_edge + 0.5 * best_hist
+    issues, adjustments = [], []
+    if best_edge < 0.2:
+        issues.append(f"Structure/viewpoint does not match the space photos (edge similarity {best_edge:.2f})")
+        adjustments.append("Keep the exact camera viewpoint and existing structures of the space photos")
+    if best_hist < 0.3:
+        issues.append(f"Colours do not match the space photos (histogram overlap {best_hist:.2f})")
+        adjustments.append("Keep the real garden's materials, light and colours")
+    return score, issues, adjustments
+
+
+def check(image_path: Path, space_photos: list[Path]) -> dict | None:
+    """Synthetic REJECT verdict if the image fails the gate, else None.
+
+    Returns None when the gate is disabled or there are no references.
+    """
+    if THRESHOLD is None or not space_photos:
+        return None
+
+    score, issues, adjustments = score_image(image_path, space_photos)
+    with _lock:
+        stats["checked"] += 1
+    print(f"    [GATE] Local similarity {score:.2f} (threshold {THRESHOLD:.2f})")
+    if score >= THRESHOLD:
+        return None
+
+    with _lock:
+        stats["rejected"] += 1
+    feedback = f"Rejected by local pre-check (similarity {score:.2f} < {THRESHOLD:.2f})"
+    return {
+        "verdict": "REJECT",
+        "total": min(29, round(score * 50)),
+        "feedback": feedback,
+        "issues": issues or ["Too dissimilar to the space photos"],
+        "prompt_adjustments": adjustments,
+        "scores": {},
+        "raw": "",
+        "model": "local-gate",
+        "source": "local-gate",
+        "local": True,
+    }
+
+
+def report() -> str:
+    return (
+        f"Local gate: {stats['checked']} checked, {stats['rejected']} auto-rejected "
+        f"({stats['rejected']} API calls saved)"
+    )
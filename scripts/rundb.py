@@ -0,0 +1,377 @@
+"""
+EVELIEN GARDEN - RUN DATABASE
+===============================
+
+Append-only SQLite store (generated/feedback/runs.db) for every generation
+and verdict: zone, image, model, prompt hash, reference set, latency, the
+full raw response and per-criterion scores (for ensemble verdicts the
+means, plus every judge's vote). A zone_stats table is updated in the same
+transaction as each insert, so status.py reads a handful of rows no matter
+how long the history is.
+
+The database runs in WAL mode on a local disk. WAL relies on shared memory
+between every process using the file, which network filesystems (NFS, SMB)
+do not provide, so when generated/ is on one - workers on several hosts
+sharing the volume - it uses SQLite's default rollback journal instead.
+GARDEN_DB_JOURNAL (e.g. DELETE or WAL) overrides the choice.
+
+Replaces generation_log.md and verify_log.md. Existing markdown logs can be
+imported once with --import-logs.
+
+Usage:
+    python scripts/rundb.py --import-logs
+    python scripts/rundb.py --recent 20
+"""
+
+import argparse
+import json
+import os
+import re
+import sqlite3
+import threading
+from contextlib import closing
+from datetime import datetime
+from pathlib import Path
+
+from zones import zone_of
+
+PROJECT_ROOT = Path(__file__).parent.parent
+FEEDBACK_DIR = PROJECT_ROOT / "generated" / "feedback"
+DB_PATH = FEEDBACK_DIR / "runs.db"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS generations (
+    id INTEGER PRIMARY KEY,
+    created TEXT NOT NULL,
+    zone TEXT NOT NULL,
+    version INTEGER,
+    image TEXT NOT NULL,
+    model TEXT,
+    prompt_hash TEXT,
+    refs TEXT,
+    feedback TEXT,
+    latency REAL
+);
+CREATE TABLE IF NOT EXISTS verdicts (
+    id INTEGER PRIMARY KEY,
+    created TEXT NOT NULL,
+    zone TEXT,
+    image TEXT NOT NULL,
+    verdict TEXT NOT NULL,
+    total INTEGER NOT NULL,
+    scores TEXT,
+    issues TEXT,
+    adjustments TEXT,
+    feedback TEXT,
+    raw TEXT,
+    prompt_hash TEXT,
+    refs TEXT,
+    model TEXT,
+    latency REAL,
+    judges INTEGER,
+    votes TEXT
+);
+CREATE INDEX IF NOT EXISTS verdicts_image ON verdicts (image);
+CREATE TABLE IF NOT EXISTS zone_stats (
+    zone TEXT PRIMARY KEY,
+    generated INTEGER NOT NULL DEFAULT 0,
+    verified INTEGER NOT NULL DEFAULT 0,
+    pass INTEGER NOT NULL DEFAULT 0,
+    marginal INTEGER NOT NULL DEFAULT 0,
+    reject INTEGER NOT NULL DEFAULT 0,
+    unknown INTEGER NOT NULL DEFAULT 0,
+    best_score INTEGER,
+    best_image TEXT
+);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+# Columns added after the first release, for databases created before them
+ADDED_COLUMNS = [("verdicts", "judges", "INTEGER"), ("verdicts", "votes", "TEXT")]
+
+
+def _migrate(conn: sqlite3.Connection) -> None:
+    """Add columns missing from a database created by an older version."""
+    for table, column, kind in ADDED_COLUMNS:
+        columns = {row["name"] for row in conn.execute(f"PRAGMA table_info({table})")}
+        if column not in columns:
+            try:
+                conn.execute(f"ALTER TABLE {table} ADD COLUMN {column} {kind}")
+            except sqlite3.OperationalError:
+                pass  # another process added it first
+
+
+NETWORK_FILESYSTEMS = {"nfs", "nfs4", "cifs", "smb3", "smbfs", "9p", "fuse.sshfs", "afs", "ceph", "glusterfs", "lustre"}
+JOURNAL_MODES = {"DELETE", "TRUNCATE", "PERSIST", "WAL"}
+
+
+def filesystem_type(path: Path) -> str | None:
+    """Filesystem type of the mount holding path (Linux only; None elsewhere)."""
+    try:
+        mounts = Path("/proc/mounts").read_text(encoding="utf-8").splitlines()
+    except OSError:
+        return None
+    path = path.resolve()
+    best, fs_type = -1, None
+    for line in mounts:
+        fields = line.split()
+        if len(fields) < 3:
+            continue
+        mount = Path(fields[1].replace("\\040", " "))
+        if (mount == path or mount in path.parents) and len(mount.parts) > best:
+            best, fs_type = len(mount.parts), fields[2]
+    return fs_type
+
+
+def journal_mode(db_path: Path) -> str:
+    """WAL on a local disk, the rollback journal (DELETE) on a network filesystem."""
+    override = os.getenv("GARDEN_DB_JOURNAL", "").upper()
+    if override in JOURNAL_MODES:
+        return override
+    return "DELETE" if filesystem_type(db_path.parent) in NETWORK_FILESYSTEMS else "WAL"
+
+
+# Databases whose schema this process has already created or migrated
+_prepared: set[str] = set()
+_prepare_lock = threading.Lock()
+
+
+def connect(db_path: Path | None = None) -> sqlite3.Connection:
+    """Open the run database; journal mode, schema and migrations are set up once per process."""
+    db_path = db_path or DB_PATH
+    key = str(db_path)
+    fresh = key not in _prepared or not db_path.exists()
+    if fresh:
+        db_path.parent.mkdir(parents=True, exist_ok=True)
+    conn = sqlite3.connect(key, timeout=30)
+    conn.row_factory = sqlite3.Row
+    if fresh:
+        with _prepare_lock:
+            conn.execute(f"PRAGMA journal_mode={journal_mode(db_path)}")
+            conn.executescript(SCHEMA)
+            _migrate(conn)
+            _prepared.add(key)
+    return conn
+
+
+def _bump_generated(conn: sqlite3.Connection, zone: str) -> None:
+    conn.execute("INSERT OR IGNORE INTO zone_stats (zone) VALUES (?)", (zone,))
+    conn.execute("UPDATE zone_stats SET generated = generated + 1 WHERE zone = ?", (zone,))
+
+
+def _bump_verified(conn: sqlite3.Connection, zone: str, verdict: str, total: int, image: str, local: bool = False) -> None:
+    """Count a verdict; local ones (see pregate) have no judge total, so never set best_score."""
+    column = verdict.lower() if verdict in ("PASS", "MARGINAL", "REJECT") else "unknown"
+    conn.execute("INSERT OR IGNORE INTO zone_stats (zone) VALUES (?)", (zone,))
+    conn.execute(
+        f"UPDATE zone_stats SET verified = verified + 1, {column} = {column} + 1 WHERE zone = ?",
+        (zone,),
+    )
+    if local:
+        return
+    conn.execute(
+        "UPDATE zone_stats SET best_score = ?, best_image = ? "
+        "WHERE zone = ? AND (best_score IS NULL OR best_score < ?)",
+        (total, image, zone, total),
+    )
+
+
+def record_generation(
+    zone: str,
+    version: int | None,
+    image: str,
+    model: str | None = None,
+    prompt_hash: str | None = None,
+    refs: list[str] | None = None,
+    feedback: str = "",
+    latency: float | None = None,
+    created: str | None = None,
+) -> None:
+    with closing(connect()) as conn, conn:
+        _insert_generation(conn, zone, version, image, model, prompt_hash, refs, feedback, latency, created)
+
+
+def _insert_generation(
+    conn: sqlite3.Connection,
+    zone: str,
+    version: int | None,
+    image: str,
+    model: str | None = None,
+    prompt_hash: str | None = None,
+    refs: list[str] | None = None,
+    feedback: str = "",
+    latency: float | None = None,
+    created: str | None = None,
+) -> None:
+    conn.execute(
+        "INSERT INTO generations (created, zone, version, image, model, prompt_hash, refs, feedback, latency) "
+        "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+        (
+            created or datetime.now().isoformat(), zone, version, image, model,
+            prompt_hash, json.dumps(refs or []), feedback, latency,
+        ),
+    )
+    _bump_generated(conn, zone)
+
+
+def record_verdict(image: str, result: dict, created: str | None = None) -> None:
+    """Store a verify result dict (as returned by verify_image / parse_verdict)."""
+    with closing(connect()) as conn, conn:
+        _insert_verdict(conn, image, result, created)
+
+
+def _insert_verdict(conn: sqlite3.Connection, image: str, result: dict, created: str | None = None) -> None:
+    zone = zone_of(image)
+    conn.execute(
+        "INSERT INTO verdicts (created, zone, image, verdict, total, scores, issues, adjustments, "
+        "feedback, raw, prompt_hash, refs, model, latency, judges, votes) "
+        "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+        (
+            created or datetime.now().isoformat(), zone, image, result["verdict"], int(result["total"]),
+            json.dumps(result.get("scores", {})),
+            json.dumps(result.get("issues", [])),
+            json.dumps(result.get("prompt_adjustments", [])),
+            result.get("feedback", ""), result.get("raw", ""),
+            result.get("prompt_hash"), json.dumps(result.get("references", [])),
+            result.get("model"), result.get("latency"),
+            result.get("judges", 1), json.dumps(result["votes"]) if "votes" in result else None,
+        ),
+    )
+    if zone:
+        _bump_verified(conn, zone, result["verdict"], int(result["total"]), image, result.get("local", False))
+
+
+def logs_imported() -> bool:
+    """True once import_markdown_logs() has run against this database."""
+    if not DB_PATH.exists():
+        return False
+    with closing(connect()) as conn:
+        return conn.execute("SELECT 1 FROM meta WHERE key = 'markdown_imported'").fetchone() is not None
+
+
+def zone_stats() -> dict[str, dict]:
+    """Per-zone counters and best score, one row per zone."""
+    if not DB_PATH.exists():
+        return {}
+    with closing(connect()) as conn:
+        return {row["zone"]: dict(row) for row in conn.execute("SELECT * FROM zone_stats")}
+
+
+def recent_verdicts(limit: int = 20) -> list[dict]:
+    if not DB_PATH.exists():
+        return []
+    with closing(connect()) as conn:
+        rows = conn.execute(
+            "SELECT created, image, verdict, total, latency, judges FROM verdicts ORDER BY id DESC LIMIT ?",
+            (limit,),
+        )
+        return [dict(row) for row in rows]
+
+
+def parse_verify_log(text: str, default_created: str) -> list[tuple[str, dict, str]]:
+    """Parse legacy verify_log.md entries into (image, result dict, created) triples.
+
+    Entries carry no timestamp unless the header has one
+    (## shade_v1.jpg - PASS - 2025-01-01T12:00:00); the others get
+    default_created.
+    """
+    entries = []
+    # Entries look like: ## shade_v1.jpg - PASS\n- Score: 42/50\n- Issues: a, b\n- Adjustments: ...
+    for block in text.split("\n## ")[1:]:
+        lines = block.strip().split("\n")
+        match = re.match(r"(\S+)\s*-\s*(PASS|MARGINAL|REJECT|UNKNOWN)(?:\s*-\s*(\S+))?", lines[0])
+        if not match:
+            continue
+        result = {"verdict": match.group(2), "total": 0, "feedback": "", "raw": ""}
+        for line in lines[1:]:
+            if m := re.match(r"- Score:\s*(\d+)/50", line):
+                result["total"] = int(m.group(1))
+            elif m := re.match(r"- Issues:\s*(.*)", line):
+                result["issues"] = [item.strip() for item in m.group(1).split(", ") if item.strip()]
+            elif m := re.match(r"- Adjustments:\s*(.*)", line):
+                result["prompt_adjustments"] = [item.strip() for item in m.group(1).split(", ") if item.strip()]
+            elif m := re.match(r"- Feedback:\s*(.*)", line):
+                result["feedback"] = m.group(1)
+        raw = re.search(r"- Raw:\n```\n([\s\S]*?)\n```", block)
+        if raw:
+            result["raw"] = raw.group(1)
+        entries.append((match.group(1), result, match.group(3) or default_created))
+    return entries
+
+
+def parse_generation_log(text: str) -> list[dict]:
+    """Parse legacy generation_log.md entries."""
+    entries = []
+    # Entries look like: ## shade_v3 - 2025-01-01T12:00:00\n- Zone: shade
+    for block in text.split("\n## ")[1:]:
+        header = block.strip().split("\n")[0]
+        match = re.match(r"(\S+)_v(\d+)\s*-\s*(\S+)", header)
+        if match:
+            entries.append({
+                "zone": match.group(1),
+                "version": int(match.group(2)),
+                "image": f"{match.group(1)}_v{match.group(2)}.jpg",
+                "created": match.group(3),
+            })
+    return entries
+
+
+def import_markdown_logs() -> tuple[int, int]:
+    """One-time import of generation_log.md and verify_log.md. Returns counts.
+
+    Everything, including the markdown_imported marker, is written in one
+    transaction, so an import that fails partway leaves nothing behind and
+    can simply be rerun.
+    """
+    generations = []
+    gen_log = FEEDBACK_DIR / "generation_log.md"
+    if gen_log.exists():
+        generations = parse_generation_log(gen_log.read_text(encoding="utf-8"))
+
+    verdicts = []
+    verify_log = FEEDBACK_DIR / "verify_log.md"
+    if verify_log.exists():
+        # The log has no per-entry dates; its last write is the best we have
+        logged = datetime.fromtimestamp(verify_log.stat().st_mtime).isoformat(timespec="seconds")
+        verdicts = parse_verify_log(verify_log.read_text(encoding="utf-8"), logged)
+
+    with closing(connect()) as conn, conn:
+        conn.execute("BEGIN IMMEDIATE")
+        done = conn.execute("SELECT value FROM meta WHERE key = 'markdown_imported'").fetchone()
+        if done:
+            print(f"[OK] Markdown logs already imported ({done['value']})")
+            return 0, 0
+        for entry in generations:
+            _insert_generation(conn, entry["zone"], entry["version"], entry["image"], created=entry["created"])
+        for image, result, created in verdicts:
+            _insert_verdict(conn, image, result, created)
+        conn.execute(
+            "INSERT INTO meta (key, value) VALUES ('markdown_imported', ?)",
+            (datetime.now().isoformat(),),
+        )
+    return len(generations), len(verdicts)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Query or import into the run database")
+    parser.add_argument("--import-logs", action="store_true", help="Import generation_log.md and verify_log.md once")
+    parser.add_argument("--recent", type=int, metavar="N", help="Show the N most recent verdicts")
+    args = parser.parse_args()
+
+    if args.import_logs:
+        generations, verdicts = import_markdown_logs()
+        print(f"[OK] Imported {generations} generations and {verdicts} verdicts into {DB_PATH.name}")
+    elif args.recent:
+        for row in recent_verdicts(args.recent):
+            latency = f"{row['latency']:.1f}s" if row["latency"] is not None else "-"
+            judges = f"{row['judges']} judges" if (row["judges"] or 1) > 1 else ""
+            print(f"  {row['created'][:19]:<19} {row['image']:<24} {row['verdict']:<8} {row['total']:>2}/50 {latency:>6} {judges}")
+    else:
+        parser.print_help()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+"""
+EVELIEN GARDEN - ATTEMPT BUDGET SCHEDULER
+===========================================
+
+With --budget N, pipeline.py spends N generations across all zones of a
+run instead of --max-retries per zone. Each free slot goes to the zone most
+likely to PASS on its next attempt, judged from that zone's score
+trajectory in the run checkpoint:
+
+- the next score is forecast as the last score plus half the recent trend,
+  with a spread taken from how far the zone's scores have moved between
+  attempts (shrunk towards PRIOR_SD while there are few)
+- the pass chance is the forecast's probability of reaching the PASS
+  threshold; zones not tried yet go first, so every zone gets one attempt
+  before the budget concentrates on the promising ones
+
+A zone is retired once its pass chance drops below MIN_PASS_CHANCE, or
+once its trajectory plateaus (no new best in the last PLATEAU_WINDOW - 1
+attempts and a flat or falling trend) - a zone one nudge from PASS keeps
+getting attempts, a hopeless one stops after one or two. Attempts that
+returned no image (a refusal, a text-only reply) or were settled without a
+judge (local gate, reused duplicate verdict - totals on another scale)
+count as tried but add no score; MAX_UNSCORED of them retire the zone.
+"""
+
+import math
+import statistics
+
+from verify import PASS_THRESHOLD
+
+PRIOR_MEAN = 35.0  # forecast for a zone with no attempts yet
+PRIOR_SD = 6.0  # typical attempt-to-attempt score movement
+PRIOR_WEIGHT = 2  # PRIOR_SD counts as this many observed movements
+SD_FLOOR = 2.5
+TREND_DAMPING = 0.5  # share of the recent trend carried into the forecast
+
+MIN_PASS_CHANCE = 0.02
+PLATEAU_WINDOW = 3
+MAX_UNSCORED = 3  # attempts without a judge score before a zone is retired
+
+
+def forecast(scores: list[int]) -> tuple[float, float]:
+    """(mean, sd) of the next attempt's score given a zone's scores so far."""
+    if not scores:
+        return PRIOR_MEAN, PRIOR_SD
+    deltas = [b - a for a, b in zip(scores, scores[1:])]
+    trend = statistics.fmean(deltas[-2:]) if deltas else 0.0
+    mean = scores[-1] + TREND_DAMPING * trend
+    variance = (PRIOR_WEIGHT * PRIOR_SD ** 2 + sum(d * d for d in deltas)) / (PRIOR_WEIGHT + len(deltas))
+    return mean, max(math.sqrt(variance), SD_FLOOR)
+
+
+def pass_chance(scores: list[int]) -> float:
+    """Probability that the next attempt scores PASS_THRESHOLD or more."""
+    mean, sd = forecast(scores)
+    return 1 - statistics.NormalDist(mean, sd).cdf(PASS_THRESHOLD - 0.5)
+
+
+def plateaued(scores: list[int]) -> bool:
+    """No new best in the last PLATEAU_WINDOW - 1 attempts, and no upward trend across the window."""
+    if len(scores) < PLATEAU_WINDOW:
+        return False
+    recent = scores[-(PLATEAU_WINDOW - 1):]
+    earlier_best = max(scores[:-(PLATEAU_WINDOW - 1)])
+    return max(recent) <= earlier_best and scores[-1] <= scores[-PLATEAU_WINDOW]
+
+
+def retire_reason(scores: list[int], unscored: int = 0) -> str | None:
+    """Why a zone should get no more attempts, or None to keep it in the running.
+
+    scores are judge totals only; unscored is how many of the zone's
+    attempts produced none.
+    """
+    if unscored >= MAX_UNSCORED:
+        return f"{unscored} attempts without a judge score (no image, or settled locally)"
+    if not scores:
+        return None
+    chance = pass_chance(scores)
+    if chance < MIN_PASS_CHANCE:
+        return f"pass chance {chance:.1%} after {len(scores)} attempts (best {max(scores)}/50)"
+    if plateaued(scores):
+        return "score plateaued: " + " -> ".join(str(s) for s in scores[-PLATEAU_WINDOW:])
+    return None
+
+
+def pick(histories: dict[str, list[int]], tries: dict[str, int] | None = None) -> tuple[str, float] | None:
+    """(zone, pass chance) that should get the next attempt, from zone -> scores so far.
+
+    tries counts every attempt a zone has had, scored or not (default: its
+    number of scores); a zone counts as untried only with none at all.
+    """
+    if not histories:
+        return None
+    tries = {zone: (tries or {}).get(zone, len(scores)) for zone, scores in histories.items()}
+    untried = [zone for zone in histories if not tries[zone]]
+    if untried:
+        return untried[0], pass_chance([])
+    zone = max(histories, key=lambda z: (pass_chance(histories[z]), -tries[z]))
+    return zone, pass_chance(histories[zone])
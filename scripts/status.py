@@ -6,14 +6,21 @@ Scans generated/ directories and reports pipeline status:
 - Space photo counts
 - Annotated photo counts
 - Per-zone: generated versions, best scores, rejected count
+- Near-duplicate clusters of generated visuals (perceptual hash)
+
+Scores come from the run database (generated/feedback/runs.db), whose
+per-zone summary rows make this report constant-time in history size.
 
 Usage:
     python scripts/status.py
 """
 
-import re
 from pathlib import Path
 
+import phash
+from rundb import logs_imported, zone_stats
+from zones import ZONES
+
 PROJECT_ROOT = Path(__file__).parent.parent
 
 REF_SPACE = PROJECT_ROOT / "ref" / "space"
@@ -24,8 +31,6 @@ VISUALS_DIR = PROJECT_ROOT / "generated" / "visuals"
 REJECTED_DIR = PROJECT_ROOT / "generated" / "rejected"
 FEEDBACK_DIR = PROJECT_ROOT / "generated" / "feedback"
 
-ZONES = ["shade", "seating", "plants", "play-area", "full"]
-
 IMAGE_GLOBS = ["*.jpg", "*.jpeg", "*.png"]
 
 
@@ -47,53 +52,6 @@ def get_zone_images(directory: Path, zone: str) -> list[Path]:
     return sorted(images)
 
 
-def parse_verify_log() -> dict[str, list[dict]]:
-    """Parse verify_log.md to extract scores per image."""
-    log_path = FEEDBACK_DIR / "verify_log.md"
-    if not log_path.exists():
-        return {}
-
-    results = {}
-    text = log_path.read_text(encoding="utf-8")
-
-    # Parse entries like: ## shade_v1.jpg - PASS\n- Score: 42/50
-    for block in text.split("\n## ")[1:]:
-        lines = block.strip().split("\n")
-        if not lines:
-            continue
-        header = lines[0]
-        # Extract filename and verdict
-        match = re.match(r"(\S+)\s*-\s*(PASS|MARGINAL|REJECT|UNKNOWN)", header)
-        if not match:
-            continue
-        filename = match.group(1)
-        verdict = match.group(2)
-
-        # Extract score
-        score = 0
-        for line in lines[1:]:
-            score_match = re.search(r"Score:\s*(\d+)/50", line)
-            if score_match:
-                score = int(score_match.group(1))
-                break
-
-        # Determine zone from filename
-        zone = None
-        for z in ZONES:
-            if filename.startswith(z + "_"):
-                zone = z
-                break
-
-        if zone:
-            results.setdefault(zone, []).append({
-                "filename": filename,
-                "score": score,
-                "verdict": verdict,
-            })
-
-    return results
-
-
 def main():
     # Counts
     space_count = count_images(REF_SPACE)
@@ -110,8 +68,8 @@ def main():
         else:
             inspiration_counts[zone] = count_images(REF_INSPIRATION / zone)
 
-    # Verify log data
-    verify_data = parse_verify_log()
+    # Per-zone scores from the run database
+    stats = zone_stats()
 
     # Print report
     print(f"\n{'='*55}")
@@ -132,16 +90,20 @@ def main():
         rejected = get_zone_images(REJECTED_DIR, zone)
         inspo = inspiration_counts.get(zone, 0)
 
-        # Best score from verify log
-        zone_results = verify_data.get(zone, [])
-        if zone_results:
-            best = max(zone_results, key=lambda x: x["score"])
-            best_str = f"{best['score']}/50"
-        else:
-            best_str = "-"
+        # Best score from the run database
+        best_score = stats.get(zone, {}).get("best_score")
+        best_str = f"{best_score}/50" if best_score is not None else "-"
 
         print(f"  {zone:<12} {inspo:>5} {len(generated):>10} {best_str:>11} {len(rejected):>9}")
 
+    # Near-duplicate clusters from the perceptual hash index
+    duplicate_clusters = phash.clusters()
+    if duplicate_clusters:
+        print(f"\n  Near-duplicate clusters:")
+        for zone, groups in duplicate_clusters.items():
+            for group in groups:
+                print(f"    {zone:<12} {len(group)}x: {', '.join(group)}")
+
     print(f"\n{'='*55}")
 
     # Readiness check
@@ -155,6 +117,9 @@ def main():
     if total_inspiration == 0:
         issues.append("No inspiration images in ref/inspiration/")
 
+    if (FEEDBACK_DIR / "verify_log.md").exists() and not logs_imported():
+        issues.append("verify_log.md not in the run database, best scores missing (run: python scripts/rundb.py --import-logs)")
+
     if issues:
         print(f"\n  Readiness issues:")
         for issue in issues:
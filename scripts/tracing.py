@@ -0,0 +1,355 @@
+"""
+EVELIEN GARDEN - TRACING AND PROFILING
+========================================
+
+Span-based timing of every pipeline stage, so it is visible where time
+goes: image load, resize/encode, model calls (with bytes sent and received
+and token usage from usage_metadata), output saves and verdict parsing,
+nested under the generate / verify / annotate / zone stage they belong to.
+
+Off by default; span() is then a no-op. Enable with:
+    --trace            append spans to generated/feedback/traces.jsonl and
+                       print a per-stage summary at exit
+    --metrics [PATH]   also write a Prometheus text file (default
+                       generated/feedback/metrics.prom), refreshed while
+                       running - point node_exporter's textfile collector
+                       at it for long-running workers
+    --profile [PATH]   cProfile every thread and print the hottest functions
+                       in scripts/ at exit (stats saved to PATH, default
+                       generated/feedback/profile-<script>-<time>.prof)
+
+on pipeline.py, generate.py, verify.py, annotate.py and worker.py.
+"""
+
+import atexit
+import functools
+import io
+import json
+import os
+import re
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+
+from fileio import atomic_write_bytes, locked_append
+
+PROJECT_ROOT = Path(__file__).parent.parent
+SCRIPTS_DIR = Path(__file__).parent
+FEEDBACK_DIR = PROJECT_ROOT / "generated" / "feedback"
+TRACE_PATH = FEEDBACK_DIR / "traces.jsonl"
+METRICS_PATH = FEEDBACK_DIR / "metrics.prom"
+
+# Span attributes summed into counters (and exported as garden_<attr>_total)
+COUNTED = ["bytes_sent", "bytes_received", "prompt_tokens", "output_tokens", "total_tokens", "retries"]
+BUCKETS = [0.005, 0.025, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120]  # seconds
+METRICS_INTERVAL = 15.0  # seconds between metrics file refreshes
+PROFILE_TOP = 25
+
+# Set by enable(); False makes span() a no-op
+ENABLED = False
+_metrics_path: Path | None = None
+_trace_id = ""
+
+_local = threading.local()
+_lock = threading.Lock()
+_stats: dict[str, dict] = {}  # span name -> count, seconds, max, buckets, counters
+_span_ids = iter(range(1, 1 << 62))
+_metrics_written = 0.0
+_profiles: list = []  # cProfile.Profile instances; cProfile is imported by profile()
+
+
+class _NoSpan:
+    def set(self, **attrs) -> None:
+        pass
+
+
+_NO_SPAN = _NoSpan()
+
+
+class Span:
+    def __init__(self, name: str, attrs: dict, parent: "Span | None"):
+        self.name = name
+        self.attrs = attrs
+        self.parent = parent
+        with _lock:
+            self.id = next(_span_ids)
+
+    def set(self, **attrs) -> None:
+        """Set attributes; numeric COUNTED ones accumulate."""
+        for key, value in attrs.items():
+            if key in COUNTED and value is not None:
+                self.attrs[key] = self.attrs.get(key, 0) + value
+            else:
+                self.attrs[key] = value
+
+
+def enable(metrics_path: Path | None = None) -> None:
+    """Turn tracing on for this process; spans are written as they end, the summary at exit."""
+    global ENABLED, _metrics_path, _trace_id
+    ENABLED = True
+    _metrics_path = metrics_path
+    _trace_id = f"{Path(sys.argv[0]).stem}-{datetime.now():%Y%m%d-%H%M%S}-{os.getpid()}"
+    atexit.register(_finish)
+
+
+def _stack() -> list:
+    if not hasattr(_local, "stack"):
+        _local.stack = []
+    return _local.stack
+
+
+@contextmanager
+def span(name: str, **attrs):
+    """Time a block. Yields an object whose set(**attrs) adds attributes."""
+    if not ENABLED:
+        yield _NO_SPAN
+        return
+    stack = _stack()
+    current = Span(name, attrs, stack[-1] if stack else None)
+    stack.append(current)
+    started_wall = time.time()
+    started = time.perf_counter()
+    try:
+        yield current
+    except BaseException as e:
+        current.attrs["error"] = type(e).__name__
+        raise
+    finally:
+        seconds = time.perf_counter() - started
+        stack.pop()
+        _record(current, started_wall, seconds)
+
+
+def traced(name: str, arg: str | None = None):
+    """Decorator: run the function in a span, recording parameter `arg` (a Path as its name)."""
+    def wrap(fn):
+        signature = None  # inspected on the first traced call; inspect is slow to import
+
+        @functools.wraps(fn)
+        def inner(*args, **kwargs):
+            nonlocal signature
+            if not ENABLED:
+                return fn(*args, **kwargs)
+            attrs = {}
+            if arg:
+                if signature is None:
+                    import inspect
+                    signature = inspect.signature(fn)
+                value = signature.bind_partial(*args, **kwargs).arguments.get(arg)
+                attrs[arg] = value.name if isinstance(value, Path) else value
+            with span(name, **attrs):
+                return fn(*args, **kwargs)
+        return inner
+    return wrap
+
+
+def add(**attrs) -> None:
+    """Add attributes to the innermost open span of this thread (if any)."""
+    if ENABLED and _stack():
+        _stack()[-1].set(**attrs)
+
+
+def _record(current: Span, started: float, seconds: float) -> None:
+    global _metrics_written
+    record = {
+        "trace": _trace_id,
+        "span": current.id,
+        "parent": current.parent.id if current.parent else None,
+        "name": current.name,
+        "start": round(started, 6),
+        "ms": round(seconds * 1000, 3),
+        "thread": threading.current_thread().name,
+        **current.attrs,
+    }
+    locked_append(TRACE_PATH, json.dumps(record, default=str) + "\n")
+
+    with _lock:
+        stats = _stats.setdefault(current.name, {
+            "count": 0, "seconds": 0.0, "max": 0.0, "errors": 0,
+            "buckets": [0] * len(BUCKETS), "counters": {},
+        })
+        stats["count"] += 1
+        stats["seconds"] += seconds
+        stats["max"] = max(stats["max"], seconds)
+        stats["errors"] += "error" in current.attrs
+        for i, bound in enumerate(BUCKETS):
+            if seconds <= bound:
+                stats["buckets"][i] += 1
+        for key in COUNTED:
+            if key in current.attrs:
+                stats["counters"][key] = stats["counters"].get(key, 0) + current.attrs[key]
+        due = _metrics_path is not None and time.monotonic() - _metrics_written > METRICS_INTERVAL
+        if due:
+            _metrics_written = time.monotonic()
+    if due:
+        write_metrics(_metrics_path)
+
+
+def request_bytes(contents: list) -> int:
+    """Bytes of text and inline image data in a request (URI references count 0)."""
+    size = 0
+    for item in contents:
+        if isinstance(item, str):
+            size += len(item.encode("utf-8"))
+        else:
+            inline = getattr(item, "inline_data", None)
+            size += len(inline.data) if inline and inline.data else 0
+    return size
+
+
+def response_attrs(response) -> dict:
+    """bytes_received and token counts (from usage_metadata) of a model response."""
+    received = 0
+    for candidate in getattr(response, "candidates", None) or []:
+        content = getattr(candidate, "content", None)
+        for part in getattr(content, "parts", None) or []:
+            if getattr(part, "text", None):
+                received += len(part.text.encode("utf-8"))
+            inline = getattr(part, "inline_data", None)
+            if inline and inline.data:
+                received += len(inline.data)
+    attrs = {"bytes_received": received}
+    usage = getattr(response, "usage_metadata", None)
+    if usage is not None:
+        for attr, field in [("prompt_tokens", "prompt_token_count"), ("output_tokens", "candidates_token_count"), ("total_tokens", "total_token_count")]:
+            value = getattr(usage, field, None)
+            if value is not None:
+                attrs[attr] = value
+    return attrs
+
+
+def summary() -> list[str]:
+    """Per-span table: count, total and mean time, max, and counters."""
+    with _lock:
+        items = sorted(_stats.items(), key=lambda kv: kv[1]["seconds"], reverse=True)
+    lines = [f"    {'span':<16} {'count':>6} {'total s':>9} {'mean ms':>9} {'max ms':>9}  counters"]
+    for name, stats in items:
+        counters = ", ".join(f"{k}={v:,}" for k, v in stats["counters"].items())
+        lines.append(
+            f"    {name:<16} {stats['count']:>6} {stats['seconds']:>9.2f} "
+            f"{stats['seconds'] / stats['count'] * 1000:>9.1f} {stats['max'] * 1000:>9.1f}  {counters}"
+        )
+    return lines
+
+
+def write_metrics(path: Path) -> None:
+    """Write span timings and counters in Prometheus text exposition format."""
+    lines = [
+        "# HELP garden_span_seconds Time spent in each pipeline stage.",
+        "# TYPE garden_span_seconds histogram",
+    ]
+    with _lock:
+        items = sorted(_stats.items())
+        lines += _metric_lines(items)
+    atomic_write_bytes(path, ("\n".join(lines) + "\n").encode("utf-8"))
+
+
+def _metric_lines(items: list[tuple[str, dict]]) -> list[str]:
+    lines = []
+    for name, stats in items:
+        for bound, count in zip(BUCKETS, stats["buckets"]):
+            lines.append(f'garden_span_seconds_bucket{{span="{name}",le="{bound}"}} {count}')
+        lines.append(f'garden_span_seconds_bucket{{span="{name}",le="+Inf"}} {stats["count"]}')
+        lines.append(f'garden_span_seconds_sum{{span="{name}"}} {stats["seconds"]:.6f}')
+        lines.append(f'garden_span_seconds_count{{span="{name}"}} {stats["count"]}')
+    lines += ["# HELP garden_span_errors_total Spans that ended with an exception.", "# TYPE garden_span_errors_total counter"]
+    lines += [f'garden_span_errors_total{{span="{name}"}} {stats["errors"]}' for name, stats in items]
+    for key in COUNTED:
+        rows = [(name, stats["counters"][key]) for name, stats in items if key in stats["counters"]]
+        if rows:
+            lines += [f"# TYPE garden_{key}_total counter"]
+            lines += [f'garden_{key}_total{{span="{name}"}} {value}' for name, value in rows]
+    return lines
+
+
+def _finish() -> None:
+    if not _stats:
+        return
+    print(f"\n  TRACE SUMMARY ({_trace_id})")
+    for line in summary():
+        print(line)
+    print(f"    spans: {TRACE_PATH}")
+    if _metrics_path is not None:
+        write_metrics(_metrics_path)
+        print(f"    metrics: {_metrics_path}")
+
+
+def _profile_thread(frame, event, arg) -> None:
+    """threading.setprofile() hook: give each new thread its own profiler (Python < 3.12)."""
+    import cProfile
+
+    profile = cProfile.Profile()
+    with _lock:
+        _profiles.append(profile)
+    profile.enable()  # replaces this hook for the thread
+
+
+def profile(path: Path | None = None) -> None:
+    """cProfile this process (all threads); stats are saved and summarised at exit.
+
+    From Python 3.12 cProfile runs on sys.monitoring, which sees every
+    thread and allows only one active profiler, so a single one is used.
+    Before 3.12 a profiler only sees its own thread, so each new thread
+    gets one.
+    """
+    import cProfile
+    import pstats
+
+    path = path or FEEDBACK_DIR / f"profile-{Path(sys.argv[0]).stem}-{datetime.now():%Y%m%d-%H%M%S}.prof"
+    per_thread = sys.version_info < (3, 12)
+    main = cProfile.Profile()
+    _profiles.append(main)
+    if per_thread:
+        threading.setprofile(_profile_thread)
+    main.enable()
+
+    def finish() -> None:
+        main.disable()
+        if per_thread:
+            threading.setprofile(None)
+        with _lock:
+            # Threads that never ran Python code leave an empty profiler, which pstats rejects
+            profiles = [p for p in _profiles if p.getstats()]
+        if not profiles:
+            return
+        stats = pstats.Stats(*profiles, stream=io.StringIO())
+        path.parent.mkdir(parents=True, exist_ok=True)
+        stats.dump_stats(str(path))
+
+        out = io.StringIO()
+        stats.stream = out
+        local = re.escape(str(SCRIPTS_DIR.resolve()))
+        stats.sort_stats("cumulative").print_stats(local, PROFILE_TOP)
+        threads = f"{len(profiles)} threads" if per_thread else "all threads"
+        print(f"\n  PROFILE - hottest functions in scripts/ (by cumulative time, {threads})")
+        for line in out.getvalue().splitlines():
+            if line.strip() and not line.lstrip().startswith(("Ordered by", "List reduced")):
+                print(f"  {line}")
+        print(f"    stats: {path} (python -m pstats {path.name})")
+
+    atexit.register(finish)
+
+
+def add_arguments(parser) -> None:
+    """--trace, --metrics and --profile, for a script's argparse parser."""
+    parser.add_argument("--trace", action="store_true", help="Record timing spans to generated/feedback/traces.jsonl and print a summary")
+    parser.add_argument(
+        "--metrics",
+        type=Path,
+        nargs="?",
+        const=METRICS_PATH,
+        metavar="PATH",
+        help="Also write span metrics as a Prometheus text file (default: generated/feedback/metrics.prom)",
+    )
+    parser.add_argument("--profile", nargs="?", const="", metavar="PATH", help="cProfile the run and print the hottest local functions")
+
+
+def apply(args) -> None:
+    """Turn on what add_arguments() flags asked for."""
+    if args.trace or args.metrics:
+        enable(metrics_path=args.metrics)
+    if args.profile is not None:
+        profile(Path(args.profile) if args.profile else None)
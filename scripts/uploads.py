@@ -0,0 +1,140 @@
+"""
+EVELIEN GARDEN - REFERENCE UPLOADS
+====================================
+
+Space photos, inspiration images and layout drawings are the same on every
+generate and verify call. With uploads enabled they are sent to the Gemini
+Files API once and later calls reference them by URI instead of carrying
+the encoded bytes inline, which cuts request payload and upload time on
+every retry and every zone.
+
+Uploaded files are recorded in generated/cache/uploads.json, keyed by the
+encoded bytes, and reused across runs until shortly before they expire
+(Gemini keeps files for 48 hours); an expired or missing file is uploaded
+again. Generated images being verified are still sent inline - they are
+only ever sent once.
+
+Enable with --upload-refs on generate.py, verify.py or pipeline.py.
+"""
+
+import hashlib
+import io
+import json
+import threading
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+from apicall import call_with_retries
+from core import genai_types
+from fileio import atomic_write_bytes, file_lock
+from payload import inline_part
+import tracing
+
+PROJECT_ROOT = Path(__file__).parent.parent
+REGISTRY_PATH = PROJECT_ROOT / "generated" / "cache" / "uploads.json"
+LOCK_PATH = PROJECT_ROOT / "generated" / "cache" / ".uploads.lock"
+
+FILE_TTL = timedelta(hours=48)  # Files API retention
+EXPIRY_MARGIN = timedelta(hours=1)  # never hand out a file this close to expiry
+
+# Set by enable(); False means every image is sent inline
+ENABLED = False
+
+stats = {"uploaded": 0, "reused": 0}
+_lock = threading.Lock()
+_key_locks: dict[str, threading.Lock] = {}
+
+
+def enable() -> None:
+    global ENABLED
+    ENABLED = True
+
+
+def load_registry() -> dict:
+    if not REGISTRY_PATH.exists():
+        return {}
+    try:
+        return json.loads(REGISTRY_PATH.read_text(encoding="utf-8"))
+    except (json.JSONDecodeError, OSError):
+        return {}
+
+
+def _store(key: str, entry: dict | None) -> None:
+    with file_lock(LOCK_PATH):
+        registry = load_registry()
+        if entry is None:
+            registry.pop(key, None)
+        else:
+            registry[key] = entry
+        atomic_write_bytes(REGISTRY_PATH, json.dumps(registry, indent=1, sort_keys=True).encode("utf-8"))
+
+
+def is_fresh(entry: dict) -> bool:
+    return usable_until(datetime.fromisoformat(entry["expires"])) > datetime.now(timezone.utc)
+
+
+def usable_until(expires: datetime) -> datetime:
+    """When a file expiring at `expires` stops being handed out."""
+    return expires - EXPIRY_MARGIN
+
+
+def parts_expiry(parts: list) -> datetime | None:
+    """Earliest expiry of the uploaded files referenced by parts; None if all are inline."""
+    uris = {p.file_data.file_uri for p in parts if getattr(p, "file_data", None)}
+    if not uris:
+        return None
+    expiries = [datetime.fromisoformat(e["expires"]) for e in load_registry().values() if e["uri"] in uris]
+    return min(expiries) if expiries else None
+
+
+@tracing.traced("upload", "display_name")
+def upload(client, data: bytes, mime: str, display_name: str) -> dict:
+    """Upload encoded image bytes to the Files API. Returns the registry entry."""
+    uploaded = call_with_retries(
+        client.files.upload,
+        file=io.BytesIO(data),
+        config={"mime_type": mime, "display_name": display_name},
+    )
+    expires = getattr(uploaded, "expiration_time", None) or datetime.now(timezone.utc) + FILE_TTL
+    with _lock:
+        stats["uploaded"] += 1
+    return {
+        "name": uploaded.name,
+        "uri": uploaded.uri,
+        "mime_type": getattr(uploaded, "mime_type", None) or mime,
+        "expires": expires.isoformat(),
+        "source": display_name,
+    }
+
+
+def reference_part(client, encoded: dict):
+    """An encoded reference image (see payload.py) as a Part.
+
+    By Files API URI when uploads are enabled, else inline. Pass
+    client=None to always send inline (e.g. for --dry-run).
+    """
+    if not ENABLED or client is None:
+        return inline_part(encoded)
+
+    data = encoded["data"]
+    # Keyed by backend too, so stand-in uploads are never handed to Gemini
+    backend = type(client).__name__
+    key = hashlib.sha256(backend.encode("utf-8") + b":" + data).hexdigest()
+    with _lock:
+        key_lock = _key_locks.setdefault(key, threading.Lock())
+
+    # One upload per image even when several zones ask at once
+    with key_lock:
+        entry = load_registry().get(key)
+        if entry and is_fresh(entry):
+            with _lock:
+                stats["reused"] += 1
+        else:
+            entry = upload(client, data, encoded["mime_type"], encoded["path"].name)
+            _store(key, entry)
+
+    return genai_types().Part.from_uri(file_uri=entry["uri"], mime_type=entry["mime_type"])
+
+
+def report() -> str:
+    return f"Reference uploads: {stats['uploaded']} uploaded, {stats['reused']} reused by URI"
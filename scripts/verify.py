@@ -6,37 +6,73 @@ Compares generated design images against original space photos to check
 that the design actually matches the real garden. Rejects images that
 don't respect the space dimensions, existing features, or proportions.
 
+--all verifies in parallel and keeps a progress checkpoint in
+generated/feedback/verify_progress.json, so an interrupted run resumes where
+it stopped. The checkpoint is tied to the verify context - the verify
+prompt, the reference photos and the judge count - so editing
+verify_prompt.md, changing the photos or --judges starts a fresh pass.
+
+Verdicts are also cached in generated/cache/verdicts, keyed by the image,
+the reference photos, the verify prompt, model and temperature, so
+re-verifying unchanged images costs no API calls. --refresh bypasses it.
+
+--all --batch settles cached, duplicate and gated images locally and sends
+the rest as a Gemini Batch API job (see batch.py) - for overnight runs where
+latency does not matter.
+
+--judges [N] asks up to N judges per image, but only borderline scores get
+more than one (see ensemble.py); the verdict is their aggregate.
+
+--all --enqueue (or --image ... --enqueue) adds verify jobs to the job
+queue instead of running them here; worker.py drains it (see jobqueue.py).
+
 Usage:
     python scripts/verify.py --image generated/visuals/shade_v1.jpg
     python scripts/verify.py --all
+    python scripts/verify.py --all --workers 8
+    python scripts/verify.py --all --batch
+    python scripts/verify.py --all --upload-refs
+    python scripts/verify.py --all --restart
+    python scripts/verify.py --all --restart --refresh
+    python scripts/verify.py --all --gate 0.3
+    python scripts/verify.py --all --dedupe
+    python scripts/verify.py --all --judges 5
+    python scripts/verify.py --all --enqueue
+    python scripts/verify.py --all --trace --metrics
 """
 
+from __future__ import annotations
+
 import argparse
-import io
+import hashlib
 import json
-import os
 import re
-import shutil
+import threading
 import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from pathlib import Path
-
-from google import genai
-from google.genai import types
-from PIL import Image
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from google import genai
+    from google.genai import types
+
+from core import genai_types, get_client, load_env
+from apicall import generate_content
+from batch import BatchError, run_batch
+import ensemble
+from fileio import atomic_write_bytes, file_hash, move_unique
+import jobqueue
+import phash
+import pregate
+import tracing
+from payload import encode_for_role, inline_part, shares
+import uploads
+from uploads import reference_part
 
 PROJECT_ROOT = Path(__file__).parent.parent
 
-try:
-    from dotenv import load_dotenv
-    load_dotenv(PROJECT_ROOT / ".env", override=True)
-except ImportError:
-    pass
-
-API_KEY = os.getenv("GEMINI_API_KEY")
-if not API_KEY:
-    raise ValueError(
-        "GEMINI_API_KEY not set. Copy .env.example to .env and add your key."
-    )
+load_env()
 
 MODEL = "nano-banana-pro-preview"
 
@@ -47,25 +83,18 @@ REJECTED_DIR = PROJECT_ROOT / "generated" / "rejected"
 FEEDBACK_DIR = PROJECT_ROOT / "generated" / "feedback"
 PROMPTS_DIR = PROJECT_ROOT / "generated" / "prompts"
 
-PASS_THRESHOLD = 40  # out of 50
-MARGINAL_THRESHOLD = 30
+PROGRESS_PATH = FEEDBACK_DIR / "verify_progress.json"
 
+VERDICT_CACHE_DIR = PROJECT_ROOT / "generated" / "cache" / "verdicts"
 
-def load_image(path: Path) -> Image.Image:
-    img = Image.open(str(path))
-    if img.mode in ("RGBA", "P"):
-        img = img.convert("RGB")
-    return img
+VERIFY_TEMPERATURE = 0.3  # Low temp for consistent scoring
 
+PASS_THRESHOLD = 40  # out of 50
+MARGINAL_THRESHOLD = 30
+
+DEFAULT_WORKERS = 4
 
-def image_to_bytes(img: Image.Image, max_size: int = 1500) -> bytes:
-    if max(img.size) > max_size:
-        ratio = max_size / max(img.size)
-        new_size = (int(img.width * ratio), int(img.height * ratio))
-        img = img.resize(new_size, Image.Resampling.LANCZOS)
-    buf = io.BytesIO()
-    img.save(buf, format="JPEG", quality=90)
-    return buf.getvalue()
+_progress_lock = threading.Lock()
 
 
 def get_images(directory: Path, max_count: int = 3) -> list[Path]:
@@ -79,9 +108,20 @@ def get_images(directory: Path, max_count: int = 3) -> list[Path]:
     return sorted(images)[:max_count]
 
 
+def feedback_text(issues: list[str], adjustments: list[str]) -> str:
+    """Build feedback from issues + adjustments."""
+    parts = []
+    if issues:
+        parts.append("Issues: " + "; ".join(issues))
+    if adjustments:
+        parts.append("Adjustments: " + "; ".join(adjustments))
+    return " | ".join(parts) if parts else ""
+
+
+@tracing.traced("verdict.parse")
 def parse_verdict(text: str) -> dict:
     """Parse verification response. Tries JSON first, falls back to regex."""
-    result = {"verdict": "UNKNOWN", "total": 0, "feedback": "", "issues": [], "prompt_adjustments": [], "raw": text}
+    result = {"verdict": "UNKNOWN", "total": 0, "feedback": "", "issues": [], "prompt_adjustments": [], "scores": {}, "raw": text}
 
     # Try JSON parsing first
     json_match = re.search(r'\{[\s\S]*"total"[\s\S]*\}', text)
@@ -94,13 +134,11 @@ def parse_verdict(text: str) -> dict:
                 result["verdict"] = verdict
             result["issues"] = data.get("issues", [])
             result["prompt_adjustments"] = data.get("prompt_adjustments", [])
-            # Build feedback from issues + adjustments
-            parts = []
-            if result["issues"]:
-                parts.append("Issues: " + "; ".join(result["issues"]))
-            if result["prompt_adjustments"]:
-                parts.append("Adjustments: " + "; ".join(result["prompt_adjustments"]))
-            result["feedback"] = " | ".join(parts) if parts else ""
+            result["scores"] = {
+                name: value["score"] for name, value in data.items()
+                if isinstance(value, dict) and "score" in value
+            }
+            result["feedback"] = feedback_text(result["issues"], result["prompt_adjustments"])
             # Derive verdict from score if not explicit
             if result["verdict"] == "UNKNOWN" and result["total"] > 0:
                 if result["total"] >= PASS_THRESHOLD:
@@ -135,124 +173,501 @@ def parse_verdict(text: str) -> dict:
     return result
 
 
-def verify_image(client: genai.Client, image_path: Path) -> dict:
-    """Verify a generated image against space photos."""
-    print(f"\n[*] Verifying: {image_path.name}")
+def verdict_cache_key(image_path: Path, space_photos: list[Path], prompt_hash: str) -> str:
+    """Key over everything that determines a verdict: images, prompt, model, temperature."""
+    parts = [
+        file_hash(image_path),
+        *(file_hash(p) for p in space_photos),
+        prompt_hash,
+        MODEL,
+        str(VERIFY_TEMPERATURE),
+    ]
+    # Ensemble verdicts are cached apart from single-judge ones
+    if ensemble.MAX_JUDGES:
+        parts.append(f"judges={ensemble.MAX_JUDGES}")
+    return hashlib.sha256("|".join(parts).encode("utf-8")).hexdigest()
 
-    # Load the generated image
-    gen_img = load_image(image_path)
 
-    # Load space reference photos (annotated preferred, raw fallback)
+def load_cached_verdict(key: str) -> dict | None:
+    path = VERDICT_CACHE_DIR / f"{key}.json"
+    try:
+        return json.loads(path.read_text(encoding="utf-8"))
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+
+
+def save_cached_verdict(key: str, result: dict) -> None:
+    data = json.dumps(result, indent=2)
+    atomic_write_bytes(VERDICT_CACHE_DIR / f"{key}.json", data.encode("utf-8"))
+
+
+def verify_references() -> list[Path]:
+    """Space photos to verify against (annotated preferred, raw fallback)."""
     space_photos = get_images(ANNOTATED_DIR, max_count=2)
     if not space_photos:
         space_photos = get_images(REF_SPACE, max_count=2)
+    return space_photos
+
+
+def local_verdict(image_path: Path, space_photos: list[Path], context: dict, cache_key: str, refresh: bool) -> dict | None:
+    """A verdict that needs no model call: cached, near-duplicate or locally gated."""
+    if not refresh:
+        cached = load_cached_verdict(cache_key)
+        if cached:
+            cached["cached"] = True
+            print(f"    [CACHED] {cached['verdict']} {cached['total']}/50 (unchanged image, references and prompt)")
+            return cached
+
+    # Near-duplicate of an image already judged? Reuse its verdict
+    duplicate = phash.find_duplicate(image_path)
+    if duplicate:
+        name, previous, dist = duplicate
+        result = {"feedback": "", "issues": [], "prompt_adjustments": [], **context, **previous}
+        result.update({"raw": "", "model": "phash-duplicate", "duplicate_of": name})
+        print(f"    [DUPLICATE] Near-identical to {name} (distance {dist}/64), reusing its verdict: "
+              f"{result['verdict']} {result['total']}/50")
+        return result
 
-    if not space_photos:
-        print("[WARN] No space photos to verify against - skipping verification")
-        return {"verdict": "PASS", "total": 50, "feedback": "No reference to verify against", "raw": ""}
+    # Cheap local check first - obviously wrong images never reach the model
+    gated = pregate.check(image_path, space_photos)
+    if gated:
+        result = {**context, **gated}
+        print(f"\n    [FAIL] Score: {result['total']}/50 - REJECT (local pre-check, no API call)")
+        print(f"    Feedback: {'; '.join(result['issues'])[:200]}")
+        return result
 
-    # Load verify prompt
-    verify_prompt = (PROMPTS_DIR / "verify_prompt.md").read_text(encoding="utf-8") if (PROMPTS_DIR / "verify_prompt.md").exists() else ""
+    return None
 
-    # Build contents: space photos first, then generated image, then prompt
-    contents = []
 
-    for photo in space_photos:
-        img = load_image(photo)
-        contents.append(
-            types.Part.from_bytes(
-                data=image_to_bytes(img, max_size=1200),
-                mime_type="image/jpeg",
-            )
-        )
-        print(f"    [REF] {photo.name}")
+def build_verify_context(client: genai.Client, generation: dict | None = None) -> dict | None:
+    """References, their encoded parts and the verify prompt, built once.
 
-    # Generated image
-    contents.append(
-        types.Part.from_bytes(
-            data=image_to_bytes(gen_img, max_size=1200),
-            mime_type="image/jpeg",
-        )
-    )
-    print(f"    [GEN] {image_path.name}")
+    Shared by every image verified in a run (pipeline attempts, --all);
+    only the candidate image changes per call. Given a zone's generation
+    context (see generate.build_generation_context), the judge compares
+    against the same space photos the generator was shown, reusing their
+    encoded parts; otherwise against verify_references(). "expires" is when
+    the uploaded references in it expire (None if they are inline). None if
+    there are no space photos to verify against.
+    """
+    if generation is not None:
+        space = [(e["path"], part) for e, part in zip(generation["encoded"], generation["parts"]) if e["role"] == "space"]
+        space_photos = [path for path, _ in space]
+    else:
+        space_photos = verify_references()
+    if not space_photos:
+        return None
 
+    verify_prompt = (PROMPTS_DIR / "verify_prompt.md").read_text(encoding="utf-8") if (PROMPTS_DIR / "verify_prompt.md").exists() else ""
     prompt = (
         "The first image(s) are PHOTOS of the actual garden space. "
         "The last image is a GENERATED design for this garden. "
         "Compare them and evaluate:\n\n" + verify_prompt
     )
-    contents.append(prompt)
 
+    roles = ["space"] * len(space_photos) + ["candidate"]
+    limits = shares(roles)
+    if generation is not None:
+        parts = [part for _, part in space]
+    else:
+        encoded = [encode_for_role(p, "space", limit) for p, limit in zip(space_photos, limits)]
+        parts = [reference_part(client, e) for e in encoded]
+    return {
+        "space_photos": space_photos,
+        "parts": parts,
+        "expires": uploads.parts_expiry(parts),
+        "candidate_bytes": limits[-1],
+        "prompt": prompt,
+        "prompt_hash": verify_prompt_hash(),
+    }
+
+
+def verify_request(image_path: Path, shared: dict) -> tuple[list, types.GenerateContentConfig]:
+    """(contents, config) for the verify call: space photos, generated image, prompt."""
+    for photo in shared["space_photos"]:
+        print(f"    [REF] {photo.name}")
+
+    # Generated image - sent once, so always inline
+    candidate = encode_for_role(image_path, "candidate", shared["candidate_bytes"])
+    print(f"    [GEN] {image_path.name}")
+
+    contents = [*shared["parts"], inline_part(candidate), shared["prompt"]]
+    config = genai_types().GenerateContentConfig(
+        response_modalities=["TEXT"],
+        temperature=VERIFY_TEMPERATURE,
+    )
+    return contents, config
+
+
+def judge_response(response) -> dict:
+    """Parse one verify response into a verdict (UNKNOWN if the model returned nothing usable)."""
+    # Safe access to response
     try:
-        response = client.models.generate_content(
-            model=MODEL,
-            contents=contents,
-            config=types.GenerateContentConfig(
-                response_modalities=["TEXT"],
-                temperature=0.3,  # Low temp for consistent scoring
-            ),
-        )
+        parts = response.candidates[0].content.parts
+    except (IndexError, AttributeError):
+        text = getattr(response, 'text', '') or str(response)
+        print(f"[WARN] No valid response from Gemini: {text[:200]}")
+        return {"verdict": "UNKNOWN", "total": 0, "feedback": "No valid response from Gemini", "issues": [], "prompt_adjustments": [], "raw": text}
+
+    response_text = ""
+    for part in parts:
+        if part.text:
+            response_text += part.text
+    return parse_verdict(response_text)
+
+
+def settle_verdict(result: dict, context: dict, cache_key: str) -> dict:
+    """Attach provenance to a verdict, cache it and print it."""
+    result.update(context)
+    if result["verdict"] != "UNKNOWN":
+        save_cached_verdict(cache_key, result)
+
+    # Print result
+    verdict_emoji = {"PASS": "[PASS]", "MARGINAL": "[WARN]", "REJECT": "[FAIL]"}
+    judges = f" ({result['judges']} judges: {', '.join(str(v['total']) for v in result['votes'])})" if "judges" in result else ""
+    print(f"\n    {verdict_emoji.get(result['verdict'], '[???]')} Score: {result['total']}/50 - {result['verdict']}{judges}")
+    if result["feedback"]:
+        print(f"    Feedback: {result['feedback'][:200]}")
 
-        # Safe access to response
-        try:
-            parts = response.candidates[0].content.parts
-        except (IndexError, AttributeError):
-            text = getattr(response, 'text', '') or str(response)
-            print(f"[WARN] No valid response from Gemini: {text[:200]}")
-            return {"verdict": "UNKNOWN", "total": 0, "feedback": "No valid response from Gemini", "issues": [], "prompt_adjustments": [], "raw": text}
+    return result
 
-        response_text = ""
-        for part in parts:
-            if part.text:
-                response_text += part.text
 
-        result = parse_verdict(response_text)
+def read_verdict(response, context: dict, cache_key: str) -> dict:
+    """Parse a verify response into a result dict and cache it."""
+    return settle_verdict(judge_response(response), context, cache_key)
 
-        # Print result
-        verdict_emoji = {"PASS": "[PASS]", "MARGINAL": "[WARN]", "REJECT": "[FAIL]"}
-        print(f"\n    {verdict_emoji.get(result['verdict'], '[???]')} Score: {result['total']}/50 - {result['verdict']}")
-        if result["feedback"]:
-            print(f"    Feedback: {result['feedback'][:200]}")
 
-        return result
+def ensemble_verdict(client: genai.Client, contents: list, config: types.GenerateContentConfig, context: dict, cache_key: str) -> dict:
+    """Ask judges until the verdict is settled (see ensemble.py) and cache the aggregate."""
+    def one_judge() -> dict:
+        return judge_response(generate_content(client, model=MODEL, contents=contents, config=config))
+
+    try:
+        started = time.monotonic()
+        votes = ensemble.judge(one_judge, (MARGINAL_THRESHOLD, PASS_THRESHOLD))
+        if not votes:
+            return unknown_verdict(RuntimeError("no judge returned a verdict"), context)
+        context["latency"] = time.monotonic() - started
+        result = ensemble.aggregate(votes, (MARGINAL_THRESHOLD, PASS_THRESHOLD))
+        result["feedback"] = feedback_text(result["issues"], result["prompt_adjustments"])
+        return settle_verdict(result, context, cache_key)
 
     except Exception as e:
-        print(f"[ERROR] Verification failed: {e}")
-        return {"verdict": "UNKNOWN", "total": 0, "feedback": str(e), "issues": [], "prompt_adjustments": [], "raw": ""}
+        return unknown_verdict(e, context)
+
+
+def unknown_verdict(error: Exception, context: dict) -> dict:
+    print(f"[ERROR] Verification failed: {error}")
+    return {"verdict": "UNKNOWN", "total": 0, "feedback": str(error), "issues": [], "prompt_adjustments": [], "raw": "", **context}
+
+
+@tracing.traced("verify", "image_path")
+def verify_image(client: genai.Client, image_path: Path, refresh: bool = False, shared: dict | None = None) -> dict:
+    """Verify a generated image against space photos.
+
+    Verdicts are cached by image, references, verify prompt, model and
+    temperature; refresh=True ignores the cache and re-asks the model.
+    With ensemble.enable() several judges vote on borderline images.
+    Pass shared (from build_verify_context) to reuse references across calls.
+    """
+    print(f"\n[*] Verifying: {image_path.name}")
+
+    shared = shared or build_verify_context(client)
+    if not shared:
+        print("[WARN] No space photos to verify against - skipping verification")
+        return {"verdict": "PASS", "total": 50, "feedback": "No reference to verify against", "raw": ""}
+
+    context = provenance(shared)
+    cache_key = verdict_cache_key(image_path, shared["space_photos"], context["prompt_hash"])
+
+    local = local_verdict(image_path, shared["space_photos"], context, cache_key, refresh)
+    if local:
+        return local
+
+    contents, config = verify_request(image_path, shared)
+    if ensemble.MAX_JUDGES:
+        return ensemble_verdict(client, contents, config, context, cache_key)
+
+    try:
+        started = time.monotonic()
+        response = generate_content(client, model=MODEL, contents=contents, config=config)
+        context["latency"] = time.monotonic() - started
+        return read_verdict(response, context, cache_key)
+
+    except Exception as e:
+        return unknown_verdict(e, context)
+
+
+def provenance(shared: dict) -> dict:
+    """What a verdict was made with, recorded alongside it in the run database."""
+    return {
+        "references": [p.name for p in shared["space_photos"]],
+        "prompt_hash": shared["prompt_hash"],
+        "model": MODEL,
+    }
 
 
 def handle_verdict(image_path: Path, result: dict) -> str:
-    """Move rejected images and log feedback."""
+    """Move rejected images and record the verdict in the run database."""
     if result["verdict"] == "REJECT":
-        REJECTED_DIR.mkdir(parents=True, exist_ok=True)
-        rejected_path = REJECTED_DIR / image_path.name
-        shutil.move(str(image_path), str(rejected_path))
-        print(f"    [MOVED] {image_path.name} -> rejected/")
-
-    # Log feedback
-    FEEDBACK_DIR.mkdir(parents=True, exist_ok=True)
-    log_path = FEEDBACK_DIR / "verify_log.md"
-    with open(log_path, "a", encoding="utf-8") as f:
-        f.write(f"\n## {image_path.name} - {result['verdict']}\n")
-        f.write(f"- Score: {result['total']}/50\n")
-        if result.get("issues"):
-            f.write(f"- Issues: {', '.join(result['issues'])}\n")
-        if result.get("prompt_adjustments"):
-            f.write(f"- Adjustments: {', '.join(result['prompt_adjustments'])}\n")
-        if result["feedback"]:
-            f.write(f"- Feedback: {result['feedback']}\n")
-        f.write(f"- Raw:\n```\n{result['raw'][:500]}\n```\n")
+        rejected_path = move_unique(image_path, REJECTED_DIR)
+        print(f"    [MOVED] {image_path.name} -> rejected/{rejected_path.name}")
+
+    phash.record_verdict(image_path.name, result)
+
+    # A cached verdict is already in the run database from when it was made
+    if not result.get("cached"):
+        from rundb import record_verdict
+
+        record_verdict(image_path.name, result)
 
     return result["verdict"]
 
 
+def verify_prompt_hash() -> str:
+    path = PROMPTS_DIR / "verify_prompt.md"
+    data = path.read_bytes() if path.exists() else b""
+    return hashlib.sha256(data).hexdigest()
+
+
+def verify_context_hash(space_photos: list[Path]) -> str:
+    """Hash of what a checkpointed verdict depends on besides the image.
+
+    Covers the verify prompt, the reference photos (by content) and the
+    judge count.
+    """
+    parts = [verify_prompt_hash(), *(file_hash(p) for p in space_photos), f"judges={ensemble.MAX_JUDGES or 1}"]
+    return hashlib.sha256("|".join(parts).encode("utf-8")).hexdigest()
+
+
+def load_progress(context_hash: str) -> dict:
+    """Checkpoint of images already judged with the current verify context."""
+    if PROGRESS_PATH.exists():
+        try:
+            progress = json.loads(PROGRESS_PATH.read_text(encoding="utf-8"))
+            if progress.get("context_hash") == context_hash:
+                return progress
+            print("[*] Verify prompt, references or judges changed since last run, starting a fresh pass")
+        except (json.JSONDecodeError, OSError):
+            print(f"[WARN] Unreadable {PROGRESS_PATH.name}, starting a fresh pass")
+    return {"context_hash": context_hash, "images": {}}
+
+
+def save_progress(progress: dict) -> None:
+    data = json.dumps(progress, indent=2, sort_keys=True)
+    atomic_write_bytes(PROGRESS_PATH, data.encode("utf-8"))
+
+
+def verify_batch(
+    client: genai.Client,
+    images: list[Path],
+    workers: int = DEFAULT_WORKERS,
+    restart: bool = False,
+    refresh: bool = False,
+    batch: bool = False,
+) -> dict[str, int]:
+    """Verify images concurrently (or as a batch job), checkpointing each verdict as it lands.
+
+    Images already judged (same name and content) with the current verify
+    prompt, references and judge count are skipped. Returns verdict counts
+    for this run.
+    """
+    context_hash = verify_context_hash(verify_references())
+    progress = {"context_hash": context_hash, "images": {}} if restart else load_progress(context_hash)
+
+    todo = []
+    for img_path in images:
+        entry = progress["images"].get(img_path.name)
+        if entry and entry["hash"] == file_hash(img_path):
+            continue
+        todo.append(img_path)
+
+    skipped = len(images) - len(todo)
+    if skipped:
+        print(f"[OK] {skipped} images already judged (checkpoint), {len(todo)} to go")
+
+    stats = {"PASS": 0, "MARGINAL": 0, "REJECT": 0, "UNKNOWN": 0}
+    if not todo:
+        return stats
+
+    def finish(done: int, img_path: Path, digest: str, result: dict) -> None:
+        verdict = handle_verdict(img_path, result)
+        stats[verdict] = stats.get(verdict, 0) + 1
+        print(f"    [{done}/{len(todo)}] {img_path.name}: {verdict} ({result['total']}/50)")
+
+        # Unknown verdicts (API errors) are left out so a rerun retries them
+        if verdict != "UNKNOWN":
+            with _progress_lock:
+                progress["images"][img_path.name] = {
+                    "hash": digest,
+                    "verdict": verdict,
+                    "total": result["total"],
+                }
+                save_progress(progress)
+
+    shared = build_verify_context(client)
+    if batch:
+        verify_via_batch(client, todo, refresh, finish, shared)
+        return stats
+
+    def work(img_path: Path) -> tuple[Path, str, dict]:
+        digest = file_hash(img_path)
+        result = verify_image(client, img_path, refresh=refresh, shared=shared)
+        return img_path, digest, result
+
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        futures = [pool.submit(work, img_path) for img_path in todo]
+        for done, future in enumerate(as_completed(futures), 1):
+            finish(done, *future.result())
+
+    return stats
+
+
+def verify_via_batch(client: genai.Client, images: list[Path], refresh: bool, finish, shared: dict | None) -> None:
+    """Verify images through the Batch API.
+
+    Cached, duplicate and gated verdicts are settled locally first; only
+    the rest go into the batch job. finish(n, path, digest, result) is
+    called for every image.
+    """
+    done = 0
+    requests, pending = [], {}
+    for img_path in images:
+        print(f"\n[*] Verifying: {img_path.name}")
+        digest = file_hash(img_path)
+        if not shared:
+            done += 1
+            finish(done, img_path, digest, {"verdict": "PASS", "total": 50, "feedback": "No reference to verify against", "raw": ""})
+            continue
+        context = provenance(shared)
+        cache_key = verdict_cache_key(img_path, shared["space_photos"], context["prompt_hash"])
+        local = local_verdict(img_path, shared["space_photos"], context, cache_key, refresh)
+        if local:
+            done += 1
+            finish(done, img_path, digest, local)
+            continue
+        requests.append((img_path.name, *verify_request(img_path, shared)))
+        pending[img_path.name] = (img_path, digest, cache_key)
+
+    if not requests:
+        return
+
+    print(f"\n[*] Verifying {len(requests)} images as a batch job")
+    responses = run_batch(client, MODEL, requests, label="verify")
+    for name, (img_path, digest, cache_key) in pending.items():
+        response = responses[name]
+        print(f"\n[*] Verdict for: {name}")
+        if isinstance(response, BatchError):
+            result = unknown_verdict(response, provenance(shared))
+        else:
+            result = read_verdict(response, provenance(shared), cache_key)
+        done += 1
+        finish(done, img_path, digest, result)
+
+
+def enqueue_images(images: list[Path], refresh: bool = False) -> int:
+    """Queue a verify job per image for worker.py. Returns jobs added (queued duplicates are skipped)."""
+    active = jobqueue.active_keys()
+    added = 0
+    for img_path in images:
+        key = f"verify:{img_path.name}:{file_hash(img_path)[:16]}"
+        args = {"image": jobqueue.relative(img_path), "refresh": refresh}
+        added += jobqueue.enqueue("verify", args, key=key, active=active) is not None
+    return added
+
+
+def add_verify_arguments(parser: argparse.ArgumentParser) -> None:
+    """--gate, --dedupe, --upload-refs and --judges, shared by verify.py, pipeline.py and worker.py."""
+    parser.add_argument(
+        "--gate",
+        type=float,
+        nargs="?",
+        const=pregate.DEFAULT_THRESHOLD,
+        metavar="THRESHOLD",
+        help=f"Reject images locally below this similarity (0-1) before calling the model (default: {pregate.DEFAULT_THRESHOLD})",
+    )
+    parser.add_argument(
+        "--dedupe",
+        type=int,
+        nargs="?",
+        const=phash.DEFAULT_DISTANCE,
+        metavar="DISTANCE",
+        help=f"Reuse the verdict of a judged near-duplicate within DISTANCE bits of dHash (default: {phash.DEFAULT_DISTANCE})",
+    )
+    parser.add_argument("--upload-refs", action="store_true", help="Send reference images once via the Files API, then by URI")
+    parser.add_argument(
+        "--judges",
+        type=int,
+        nargs="?",
+        const=ensemble.DEFAULT_MAX_JUDGES,
+        metavar="N",
+        help=f"Up to N judges per image, stopping once the verdict is settled (default: {ensemble.DEFAULT_MAX_JUDGES})",
+    )
+
+
+def verify_arguments_given(args: argparse.Namespace) -> list[str]:
+    """The add_verify_arguments() flags set on the command line."""
+    given = [
+        ("--gate", args.gate is not None),
+        ("--dedupe", args.dedupe is not None),
+        ("--upload-refs", args.upload_refs),
+        ("--judges", args.judges is not None),
+    ]
+    return [flag for flag, is_set in given if is_set]
+
+
+def apply_verify_arguments(args: argparse.Namespace) -> None:
+    """Enable what the add_verify_arguments() flags asked for."""
+    if args.gate is not None:
+        pregate.enable(args.gate)
+    if args.dedupe is not None:
+        phash.enable(args.dedupe)
+    if args.upload_refs:
+        uploads.enable()
+    if args.judges is not None:
+        ensemble.enable(args.judges)
+
+
 def main():
     parser = argparse.ArgumentParser(description="Verify generated designs against space photos")
     parser.add_argument("--image", type=str, help="Specific image to verify")
     parser.add_argument("--all", action="store_true", help="Verify all generated visuals")
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=DEFAULT_WORKERS,
+        help=f"Images verified concurrently with --all (default: {DEFAULT_WORKERS})",
+    )
+    parser.add_argument("--restart", action="store_true", help="Ignore the --all progress checkpoint")
+    parser.add_argument("--refresh", action="store_true", help="Ignore cached verdicts and ask the model again")
+    parser.add_argument("--batch", action="store_true", help="With --all: submit uncached images as one Batch API job (slower, cheaper)")
+    parser.add_argument("--enqueue", action="store_true", help="Queue verify jobs for worker.py instead of running them now")
+    add_verify_arguments(parser)
+    tracing.add_arguments(parser)
     args = parser.parse_args()
+    tracing.apply(args)
+
+    if args.enqueue:
+        if args.image:
+            images = [Path(args.image) if Path(args.image).is_absolute() else PROJECT_ROOT / args.image]
+        elif args.all:
+            images = get_images(VISUALS_DIR, max_count=100)
+        else:
+            print("Specify --image <path> or --all")
+            return
+        images = [p for p in images if p.exists()]
+        if verify_arguments_given(args):
+            print(f"[WARN] {', '.join(verify_arguments_given(args))}: worker settings, ignored here - pass them to worker.py")
+        added = enqueue_images(images, refresh=args.refresh)
+        print(f"[OK] Queued {added} verify jobs ({len(images) - added} already queued) - run: python scripts/worker.py")
+        return
 
-    client = genai.Client(api_key=API_KEY)
+    if args.batch and args.judges is not None:
+        print("[WARN] --judges does not apply to --batch (one verdict per image in a batch job)")
+        args.judges = None
+    apply_verify_arguments(args)
+
+    client = get_client()
 
     if args.image:
         image_path = Path(args.image)
@@ -261,7 +676,7 @@ def main():
         if not image_path.exists():
             print(f"[ERROR] Image not found: {image_path}")
             return
-        result = verify_image(client, image_path)
+        result = verify_image(client, image_path, refresh=args.refresh)
         handle_verdict(image_path, result)
 
     elif args.all:
@@ -270,17 +685,17 @@ def main():
             print("[ERROR] No images in generated/visuals/")
             return
 
-        stats = {"PASS": 0, "MARGINAL": 0, "REJECT": 0, "UNKNOWN": 0}
-        for img_path in images:
-            result = verify_image(client, img_path)
-            verdict = handle_verdict(img_path, result)
-            stats[verdict] = stats.get(verdict, 0) + 1
+        stats = verify_batch(
+            client, images, workers=args.workers, restart=args.restart, refresh=args.refresh, batch=args.batch,
+        )
 
         print(f"\n{'='*50}")
         print(f"Verification complete:")
         for k, v in stats.items():
             if v > 0:
                 print(f"  {k}: {v}")
+        if pregate.THRESHOLD is not None:
+            print(f"  {pregate.report()}")
 
     else:
         print("Specify --image <path> or --all")
@@ -0,0 +1,293 @@
+"""
+EVELIEN GARDEN - QUEUE WORKER
+===============================
+
+Long-lived worker that drains the job queue (see jobqueue.py) with N
+concurrent slots, keeping one warm client for every job it runs and one
+verify context for its verify jobs (zone jobs judge against the references
+their generation used). Start one per machine that shares the generated/ volume; each
+holds file leases on the jobs it runs, so workers never run the same job
+twice while alive, and jobs of a crashed worker are picked up once its
+leases expire. On a shared volume the run database drops WAL for SQLite's
+rollback journal (see rundb.py).
+
+Jobs are enqueued with --enqueue on pipeline.py, annotate.py and
+verify.py --all. Local gate, dedupe, upload and judge settings belong to
+the worker, not the job.
+
+Ctrl-C hands running jobs back to the queue unfinished.
+
+Usage:
+    python scripts/worker.py
+    python scripts/worker.py --workers 8
+    python scripts/worker.py --drain
+    python scripts/worker.py --kinds verify --upload-refs
+    python scripts/worker.py --judges 5
+"""
+
+from __future__ import annotations
+
+import argparse
+import sys
+import threading
+import time
+import traceback
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+# Add scripts dir to path for imports
+sys.path.insert(0, str(Path(__file__).parent))
+
+if TYPE_CHECKING:
+    from google import genai
+
+from core import get_client, load_env
+from annotate import MANIFEST_PATH, annotate_photo, load_manifest, record_annotation
+from fileio import file_hash, file_lock
+import jobqueue
+import pregate
+import tracing
+import uploads
+from verify import (
+    add_verify_arguments, apply_verify_arguments, build_verify_context, handle_verdict,
+    verify_image, verify_references,
+)
+from pipeline import RUN_SETTINGS, load_run, new_run, run_zone
+
+load_env()
+
+DEFAULT_WORKERS = 4
+DEFAULT_POLL = 5.0  # seconds between queue scans when idle
+
+MANIFEST_LOCK = MANIFEST_PATH.with_name(".manifest.lock")
+
+
+class JobError(RuntimeError):
+    """A job ran but did not produce a result; it is retried up to MAX_ATTEMPTS."""
+
+
+class VerifyContext:
+    """The verify context, rebuilt only when the reference photos change or its uploads near expiry."""
+
+    def __init__(self, client: genai.Client):
+        self.client = client
+        self._lock = threading.Lock()
+        self._stamp = None
+        self._context = None
+
+    def get(self) -> dict | None:
+        refs = verify_references()
+        stamp = tuple((p.name, p.stat().st_mtime_ns) for p in refs)
+        with self._lock:
+            if stamp != self._stamp or self._expiring():
+                self._context = build_verify_context(self.client)
+                self._stamp = stamp
+            return self._context
+
+    def _expiring(self) -> bool:
+        expires = (self._context or {}).get("expires")
+        return expires is not None and uploads.usable_until(expires) <= datetime.now(timezone.utc)
+
+
+def run_zone_job(client: genai.Client, args: dict, verify_context: VerifyContext) -> dict:
+    # A retried job (its worker died) continues from the run checkpoint
+    run = None
+    if args.get("run_id"):
+        run = load_run(args["run_id"]) or new_run([args["zone"]], {name: args.get(name) for name in RUN_SETTINGS}, args["run_id"])
+    summary = run_zone(
+        client, args["zone"], args.get("max_retries", 3),
+        candidates=args.get("candidates", 1), overlap=args.get("overlap", False),
+        seed=args.get("seed"), run=run,
+    )
+    if not summary["attempts"]:
+        raise JobError(f"{args['zone']}: no successful generations")
+    best_path, best_score, *_ = max(summary["attempts"], key=lambda x: x[1])
+    return {"status": summary["status"], "best": best_path.name, "score": best_score, "attempts": len(summary["attempts"])}
+
+
+def run_annotate_job(client: genai.Client, args: dict, verify_context: VerifyContext) -> dict:
+    photo = jobqueue.resolve(args["photo"])
+    if not photo.exists():
+        return {"skipped": "photo no longer exists"}
+    digest = file_hash(photo)
+    if annotate_photo(client, photo) is None:
+        raise JobError(f"{photo.name}: annotation failed")
+    # Workers on other machines record into the same manifest
+    with file_lock(MANIFEST_LOCK):
+        if not record_annotation(load_manifest(), photo, digest):
+            raise JobError(f"{photo.name}: no annotation outputs")
+    return {"photo": photo.name}
+
+
+def run_verify_job(client: genai.Client, args: dict, verify_context: VerifyContext) -> dict:
+    image = jobqueue.resolve(args["image"])
+    if not image.exists():
+        return {"skipped": "image moved or deleted"}
+    result = verify_image(client, image, refresh=args.get("refresh", False), shared=verify_context.get())
+    if result["verdict"] == "UNKNOWN":
+        raise JobError(f"{image.name}: {result.get('feedback', 'no verdict')}")
+    verdict = handle_verdict(image, result)
+    return {"image": image.name, "verdict": verdict, "total": result["total"]}
+
+
+HANDLERS = {"annotate": run_annotate_job, "zone": run_zone_job, "verify": run_verify_job}
+
+
+class Worker:
+    """N slots claiming and running jobs, plus one heartbeat renewing their leases."""
+
+    def __init__(self, client: genai.Client, slots: int, lease: float, poll: float, drain: bool, kinds: list[str] | None):
+        self.client = client
+        self.slots = slots
+        self.lease = lease
+        self.poll = poll
+        self.drain = drain
+        self.kinds = kinds
+        self.verify_context = VerifyContext(client)
+        # job id -> (job, current lease path, lock held while the lease file is renamed)
+        self.held: dict[str, tuple[dict, Path, threading.Lock]] = {}
+        self.lost: set[str] = set()
+        self.lock = threading.Lock()
+        self.stop = threading.Event()
+        self.stats = {"done": 0, "retry": 0, "failed": 0, "lost": 0}
+
+    def heartbeat(self) -> None:
+        while not self.stop.wait(self.lease / 3):
+            with self.lock:
+                held = list(self.held.items())
+            for job_id, (job, _, job_lock) in held:
+                if job_id in self.lost:
+                    continue
+                # Renewing under the job lock means finishing the job always sees the current lease path
+                with job_lock:
+                    with self.lock:
+                        entry = self.held.get(job_id)
+                    if entry is None:
+                        continue  # finished or handed back meanwhile
+                    renewed = jobqueue.renew(entry[1], self.lease)
+                    with self.lock:
+                        if renewed is None:
+                            print(f"[WARN] Lost lease on {job_id}; another worker may rerun it")
+                            self.lost.add(job_id)
+                        else:
+                            self.held[job_id] = (job, renewed, job_lock)
+
+    def run_one(self, job: dict, lease_path: Path) -> None:
+        job_id = job["id"]
+        job_lock = threading.Lock()
+        with self.lock:
+            self.held[job_id] = (job, lease_path, job_lock)
+        print(f"\n[*] Job {job_id}: {jobqueue.describe(job).strip()} (attempt {job['attempts'] + 1})")
+        started = time.monotonic()
+        try:
+            result = HANDLERS[job["kind"]](self.client, job["args"], self.verify_context)
+            error = None
+        except Exception as e:
+            result, error = None, f"{type(e).__name__}: {e}"
+            if not isinstance(e, JobError):
+                traceback.print_exc()
+        elapsed = time.monotonic() - started
+        with job_lock:
+            with self.lock:
+                held = self.held.pop(job_id, None)
+                self.lost.discard(job_id)
+            if held is None:
+                return  # handed back by release_all()
+            lease_path = held[1]
+
+            if error is None:
+                result["seconds"] = round(elapsed, 1)
+                key = "done" if jobqueue.complete(lease_path, job, result) else "lost"
+            else:
+                state = jobqueue.fail(lease_path, job, error)
+                key = {"pending": "retry", "failed": "failed", None: "lost"}[state]
+        if error is None:
+            print(f"[OK] Job {job_id} done in {elapsed:.0f}s: {result}")
+        else:
+            print(f"[ERROR] Job {job_id} failed ({error}); {'will retry' if state == 'pending' else state or 'lease lost'}")
+        with self.lock:
+            self.stats[key] += 1
+
+    def slot(self) -> None:
+        while not self.stop.is_set():
+            jobqueue.reap(lease=self.lease)
+            claimed = jobqueue.claim(self.lease, self.kinds)
+            if claimed:
+                self.run_one(*claimed)
+                continue
+            if self.drain:
+                counts = jobqueue.counts()
+                if counts["pending"] == 0 and counts["leased"] == 0:
+                    return
+            self.stop.wait(self.poll)
+
+    def release_all(self) -> int:
+        with self.lock:
+            held = list(self.held.items())
+        released = 0
+        for job_id, (job, _, job_lock) in held:
+            with job_lock:
+                with self.lock:
+                    entry = self.held.pop(job_id, None)
+                if entry is not None:
+                    released += jobqueue.release(entry[1], job)
+        return released
+
+    def run(self) -> None:
+        threading.Thread(target=self.heartbeat, daemon=True).start()
+        threads = [threading.Thread(target=self.slot, daemon=True) for _ in range(self.slots)]
+        for thread in threads:
+            thread.start()
+        try:
+            for thread in threads:
+                while thread.is_alive():
+                    thread.join(0.5)
+        except KeyboardInterrupt:
+            self.stop.set()
+            print(f"\n[WARN] Interrupted, returned {self.release_all()} running jobs to the queue")
+        self.stop.set()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Drain the job queue")
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=DEFAULT_WORKERS,
+        help=f"Jobs run at the same time (default: {DEFAULT_WORKERS})",
+    )
+    parser.add_argument(
+        "--lease",
+        type=float,
+        default=jobqueue.DEFAULT_LEASE,
+        help=f"Seconds a job stays leased without a heartbeat (default: {jobqueue.DEFAULT_LEASE})",
+    )
+    parser.add_argument("--poll", type=float, default=DEFAULT_POLL, help=f"Seconds between scans of an empty queue (default: {DEFAULT_POLL})")
+    parser.add_argument("--drain", action="store_true", help="Exit once the queue is empty instead of waiting for more jobs")
+    parser.add_argument("--kinds", type=lambda v: v.split(","), help=f"Only run these job kinds (comma list of {', '.join(jobqueue.KINDS)})")
+    add_verify_arguments(parser)
+    tracing.add_arguments(parser)
+    args = parser.parse_args()
+    tracing.apply(args)
+
+    apply_verify_arguments(args)
+
+    client = get_client()
+    print(f"[*] Worker {jobqueue.worker_id()}: {args.workers} slots on {jobqueue.queue_dir()}")
+    worker = Worker(client, max(1, args.workers), args.lease, args.poll, args.drain, args.kinds)
+    start = time.monotonic()
+    worker.run()
+
+    stats = worker.stats
+    print(f"\n{'='*50}")
+    print(f"Worker finished after {time.monotonic() - start:.0f}s")
+    print(f"  Done: {stats['done']}  Retrying: {stats['retry']}  Failed: {stats['failed']}  Lost lease: {stats['lost']}")
+    if pregate.THRESHOLD is not None:
+        print(f"  {pregate.report()}")
+    if uploads.ENABLED:
+        print(f"  {uploads.report()}")
+
+
+if __name__ == "__main__":
+    main()
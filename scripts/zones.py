@@ -0,0 +1,17 @@
+"""
+EVELIEN GARDEN - ZONES
+========================
+
+The garden zones every script works with, and how a visual's file name
+maps back to its zone (<zone>_v<N>.jpg).
+"""
+
+ZONES = ["shade", "seating", "plants", "play-area", "full"]
+
+
+def zone_of(image_name: str) -> str | None:
+    """Zone from a visual's file name, e.g. play-area_v3.jpg -> play-area."""
+    for zone in ZONES:
+        if image_name.startswith(zone + "_"):
+            return zone
+    return None
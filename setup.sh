@@ -20,7 +20,7 @@ source venv/bin/activate
 
 # 2. Dependencies
 echo "[*] Installing dependencies..."
-pip install -q google-genai pillow python-dotenv
+pip install -q google-genai pillow python-dotenv numpy
 
 # 3. .env file
 if [ ! -f ".env" ]; then